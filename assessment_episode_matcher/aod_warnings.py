@@ -0,0 +1,97 @@
+"""
+  Columnar collector for the AOD (drug) warnings of the NADA prep.
+  A run can raise tens of thousands of them (unmapped substances, missing units ...):
+  they are kept as one list per field rather than one AODWarning object each, so they
+  go to a DataFrame/Arrow table, a CSV or a summary in one call.
+"""
+import csv
+from typing import Iterable, Iterator, Optional
+import pandas as pd
+import pyarrow as pa
+
+from assessment_episode_matcher.mytypes import AODWarning
+
+warning_fields = ["SLK", "RowKey", "drug_name", "field_name", "field_value"]
+
+
+class AODWarnings(object):
+  """
+    Append-only warnings, one list per AODWarning field.
+    Iterating still gives AODWarning objects (for code that reads them one by one).
+  """
+
+  def __init__(self, warnings:Optional[Iterable[AODWarning]]=None) -> None:
+    self.columns:dict[str, list] = {f: [] for f in warning_fields}
+    if warnings is not None:
+      self.extend(warnings)
+
+  def add(self, SLK:str, RowKey:str, drug_name:str, field_name:str
+          , field_value:Optional[str]=""):
+    for name, value in zip(warning_fields, (SLK, RowKey, drug_name, field_name, field_value)):
+      self.columns[name].append(value)
+
+  def append(self, warning:AODWarning):
+    self.add(warning.SLK, warning.RowKey, warning.drug_name
+             , warning.field_name, warning.field_value)
+
+  def extend(self, warnings:Iterable[AODWarning]):
+    if isinstance(warnings, AODWarnings):
+      for name in warning_fields:
+        self.columns[name].extend(warnings.columns[name])
+      return
+    for w in warnings:
+      self.append(w)
+
+  def extend_masked(self, df:pd.DataFrame, mask:pd.Series, field_name:str
+                    , drug_name:str|pd.Series="", field_value:str|pd.Series=""):
+    """
+      One warning for each row of df selected by mask.
+      drug_name/field_value: the same for all the rows, or a Series aligned with df.
+    """
+    selected = df[mask]
+    n = len(selected)
+    if not n:
+      return
+
+    def values(value) -> list:
+      if isinstance(value, pd.Series):
+        return value[mask].tolist()
+      return [value] * n
+
+    def key_values(col:str) -> list:
+      return selected[col].tolist() if col in selected.columns else [''] * n
+
+    for name, vals in zip(warning_fields
+                          , (key_values('SLK'), key_values('RowKey'), values(drug_name)
+                             , [field_name] * n, values(field_value))):
+      self.columns[name].extend(vals)
+
+  def __len__(self) -> int:
+    return len(self.columns['SLK'])
+
+  def __iter__(self) -> Iterator[AODWarning]:
+    for values in zip(*(self.columns[f] for f in warning_fields)):
+      yield AODWarning(*values)
+
+  def to_frame(self) -> pd.DataFrame:
+    return pd.DataFrame(self.columns, columns=warning_fields)
+
+  def to_arrow(self) -> pa.Table:
+    return pa.table({f: pa.array([v if v is None or isinstance(v, str) else str(v)
+                                  for v in self.columns[f]], type=pa.string())
+                     for f in warning_fields})
+
+  def to_csv(self) -> str:
+    """
+      Same CSV the per-row writer (azutil.file_types.BlobCSVFilePrepper) gives: all fields quoted.
+    """
+    return self.to_frame().to_csv(index=False, quoting=csv.QUOTE_ALL, lineterminator="\r\n")
+
+  def summary(self) -> pd.DataFrame:
+    """
+      Number of warnings by drug_name and field_name, most frequent first.
+    """
+    counts = self.to_frame().fillna({'drug_name': ''}) \
+                .groupby(['drug_name', 'field_name'], sort=False).size()
+    return counts.rename('count').reset_index() \
+                 .sort_values('count', ascending=False, kind='stable').reset_index(drop=True)
@@ -4,7 +4,7 @@ import logging
 from typing import Any
 from io import BytesIO
 import pandas as pd
-from azure.storage.blob import BlobServiceClient #, BlobClient, ContainerClient
+from azure.storage.blob import BlobServiceClient, BlobBlock #, BlobClient, ContainerClient
 from assessment_episode_matcher.mytypes import CSVTypeObject
 from assessment_episode_matcher.utils.environment import ConfigKeys
 import assessment_episode_matcher.azutil.file_types as AzUtilFtypes
@@ -13,6 +13,36 @@ import assessment_episode_matcher.azutil.file_types as AzUtilFtypes
 # logging = mylogging.get('azure.storage')
 
 
+class BlockBlobWriter(object):
+  """
+    Uploads a blob as a sequence of staged blocks.
+    Nothing is visible in the container until commit() is called.
+  """
+
+  def __init__(self, blob_client) -> None:
+    self.blob_client = blob_client
+    self.block_ids:list[str] = []
+    self.num_bytes = 0
+
+  def write(self, data:str|bytes):
+    if not data:
+      return
+    if isinstance(data, str):
+      data = data.encode('utf-8')
+    # ids must all be the same length within a blob
+    block_id = f"{len(self.block_ids):08d}"
+    self.blob_client.stage_block(block_id=block_id, data=data)
+    self.block_ids.append(block_id)
+    self.num_bytes += len(data)
+    logging.debug(f"Staged block {block_id} ({len(data)}) for {self.blob_client.blob_name}")
+
+  def commit(self) -> dict[str, Any]:
+    blocks = [BlobBlock(block_id=b) for b in self.block_ids]
+    result_dict = self.blob_client.commit_block_list(blocks)
+    logging.info(f"Committed {len(blocks)} blocks to {self.blob_client.blob_name}")
+    return result_dict
+
+
 class AzureBlobQuery(object):
   _instance = None
 
@@ -65,24 +95,45 @@ class AzureBlobQuery(object):
         return None       
 
 
-  def write_dataframe(self, container_name:str, blob_url:str
-                 , data:pd.DataFrame) -> dict[str, Any]:
-    
-    blob_client = self.blob_service_client.get_blob_client(container=container_name
-                                                      , blob=blob_url)
+  def get_etag(self, container_name:str, blob_url:str) -> str|None:
+      try:
+        blob_client = self.blob_service_client\
+                          .get_blob_client(container=container_name
+                                           , blob=blob_url)
+        return blob_client.get_blob_properties().etag
+      except Exception as e:
+        logging.info(f"No ETag for {container_name}/{blob_url}: {str(e)}")
+        return None
+
+
+  def serialize_dataframe(self, blob_url:str, data:pd.DataFrame) -> str|bytes:
     if blob_url[-3:] =='csv':
       p = AzUtilFtypes.BlobDataFrameCSVFilePrepper()    
     else:
       p = AzUtilFtypes.BlobDataFrameParquetFilePrepper()
-      
-    file = p.get_file_for_blob(data)
-       
-    result_dict = blob_client.upload_blob(file, overwrite=True)
+    return p.get_file_for_blob(data)
 
-    return result_dict
+
+  def upload_data(self, container_name:str, blob_url:str
+                  , data:str|bytes) -> dict[str, Any]:
+    blob_client = self.blob_service_client.get_blob_client(container=container_name
+                                                      , blob=blob_url)
+    return blob_client.upload_blob(data, overwrite=True)
+
+
+  def write_dataframe(self, container_name:str, blob_url:str
+                 , data:pd.DataFrame) -> dict[str, Any]:
+    file = self.serialize_dataframe(blob_url, data)
+    return self.upload_data(container_name, blob_url, file)
   
 
 
+  def open_block_writer(self, container_name:str, blob_url:str) -> BlockBlobWriter:
+    blob_client = self.blob_service_client.get_blob_client(container=container_name
+                                                      , blob=blob_url)
+    return BlockBlobWriter(blob_client)
+
+
   def write_csv(self, container_name:str, blob_url:str
                  , data:CSVTypeObject) -> dict[str, Any]:
     
@@ -70,7 +70,7 @@ class SampleTablesQuery(object):
             group_dict = [{str(k): v for k, v in entity.items()} for entity in group_dict]
             transaction_actions = [("create", TableEntity(**entity)) for entity in group_dict]
 
-            logging.debug(f"Transaction actions: {transaction_actions}")
+            logging.debug("Transaction actions: %s", transaction_actions)
 
             response = table_client.submit_transaction(transaction_actions)
             logging.info(f"Batch data with PartitionKey {partition_key} successfully inserted into table {self.table_name}. Response: {response}")
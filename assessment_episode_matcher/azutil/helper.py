@@ -1,3 +1,5 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
 # from utils.environment import MyEnvironmentConfig
 # from azure.data.tables import  TableEntity
 # from azure.data.tables import  EntityProperty
@@ -52,8 +54,35 @@ def get_filter_list_clause(key_name:str, filter_items:list[str]) -> str:
   progs_filter_str = f'({  " or ".join(prog_filter_list)  })'
   return progs_filter_str
 
-def get_results(table:str, start_date:int, end_date:int, filters:dict|None={}) -> list[dict]:
-    
+# above this many clients, one range scan (filtered here) instead of a query per client.
+# Each partition query is a round trip of its own, so their cost grows with the number of clients,
+# while the scan's is set by the width of the key range (a full extract's worth for a spread of SLKs).
+# 500 keeps the incremental runs (tens to a few hundred changed clients) on partition queries and
+# sends anything near a full refresh to the scan; get_results' max_partition_queries overrides it.
+MAX_PARTITION_QUERIES = 500
+
+
+def get_partition_query_filters(base_filter:str, partition_keys:list[str]) -> list[str]:
+  """
+    One filter per PartitionKey (a partition query per client), instead of OR-ing every key
+    into one filter (URL/filter length limits, cross-partition scan).
+  """
+  return [f"{get_filter_list_clause('PartitionKey', [key])} and {base_filter}"
+          for key in partition_keys]
+
+
+def get_partition_range_filter(base_filter:str, partition_keys:list[str]) -> str:
+  return f"PartitionKey ge '{min(partition_keys)}' and PartitionKey le '{max(partition_keys)}'" \
+         f" and {base_filter}"
+
+
+def get_results(table:str, start_date:int, end_date:int, filters:dict|None={}
+                , max_workers:int=8, max_partition_queries:int=MAX_PARTITION_QUERIES) -> list[dict]:
+    """
+      filters['lists']['PartitionKey'] (only some clients): the clients' partitions are queried
+      concurrently (max_workers), or, for more than max_partition_queries clients, their
+      PartitionKey range is scanned once and the other clients' entities dropped.
+    """
     stq = SampleTablesQuery(table)    
     
     tconfig = table_config.get(table, {})
@@ -75,6 +104,7 @@ def get_results(table:str, start_date:int, end_date:int, filters:dict|None={}) -
     # Add AssessmentType filter
     all_filters = f"{all_filters} and AssessmentType ne 'ClinicalAssessment'"
     
+    partition_keys:list[str] = []
     if filters:
       if 'Timestamp' in filters:        
         all_filters = f"{all_filters} and Timestamp gt datetime'{filters['Timestamp']}'"
@@ -85,15 +115,31 @@ def get_results(table:str, start_date:int, end_date:int, filters:dict|None={}) -
         #  and IsActive eq 1
       if 'lists' in filters:
         for k, v in filters['lists'].items():
+          if k == 'PartitionKey' and assessment_commencement_date_limits:
+            partition_keys = list(dict.fromkeys(v))
+            continue
           progs_filter_str = get_filter_list_clause(key_name=k, filter_items=v)
           all_filters = f"{all_filters} and {progs_filter_str}"
 
-    results = [
-         dict(json_data)
-         for json_data in 
-         stq.query_table(fields, filter_template=all_filters, query_params=assessment_commencement_date_limits)
-         ]
-    return results
+    def query(query_filter:str) -> list[dict]:
+      return [dict(json_data)
+              for json_data in 
+              stq.query_table(fields, filter_template=query_filter
+                              , query_params=assessment_commencement_date_limits)]
+
+    if not partition_keys:
+      return query(all_filters)
+
+    if len(partition_keys) > max_partition_queries:
+      logging.info(f"{len(partition_keys)} clients: scanning their PartitionKey range of {table}")
+      wanted = set(partition_keys)
+      return [r for r in query(get_partition_range_filter(all_filters, partition_keys))
+              if r.get('PartitionKey') in wanted]
+
+    logging.info(f"Querying the partitions of {len(partition_keys)} clients in {table}")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+      per_partition = list(executor.map(query, get_partition_query_filters(all_filters, partition_keys)))
+    return [r for results in per_partition for r in results]
 
 
 # def get_fresh_data_only():
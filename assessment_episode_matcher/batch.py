@@ -0,0 +1,116 @@
+"""
+  Multi-period batch mode: regenerate several reporting periods (e.g. every quarter of the
+  last two years) in one go.
+  Episodes and ATOMs are imported (and prepared) once, for the window covering all the periods.
+  Each period is then matched and exported from that shared data, as the pipeline
+  would for the period on its own: get_data_for_matching2 picks each period's
+  episodes/ATOMs (incl. the earlier ATOMs of its episodes, which set the Stage numbering)
+  from the loaded data the same way it does from a single period's import.
+  Periods run in parallel threads; each gets its own audit folder and survey.txt.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Callable, Optional
+import pandas as pd
+
+from assessment_episode_matcher.configs.matcher_config import MatcherConfig
+from assessment_episode_matcher.dataset_cache import DatasetCache, dataset_cache as host_dataset_cache
+from assessment_episode_matcher.exporters.main import DataExporter, AzureBlobExporter
+from assessment_episode_matcher.importers.main import FileSource, BlobFileSource
+from assessment_episode_matcher.pipeline import Pipeline, Stage, StageCache, matching_stages \
+                                                , output_stages
+from assessment_episode_matcher.source_loader import load_sources
+from assessment_episode_matcher.utils.base import get_period_range
+
+Period = tuple[date, date]
+
+
+def get_period_str(period:Period) -> str:
+  start_str, end_str = get_period_range(*period)
+  return f"{start_str}-{end_str}"
+
+
+def get_covering_period(periods:list[Period]) -> Period:
+  return min(p[0] for p in periods), max(p[1] for p in periods)
+
+
+def load_covering_data(periods:list[Period], config:MatcherConfig
+                       , ep_file_source:FileSource, atom_file_source:FileSource
+                       , source_cache_exporter:Optional[DataExporter]=None
+                       , ep_prefix:str="MDS", atom_prefix:str="ATOM"
+                       , dataset_cache:Optional[DatasetCache]=None) \
+                        -> tuple[pd.DataFrame, pd.DataFrame]:
+  start, end = get_covering_period(periods)
+  _, episodes, atoms = load_sources(start, end, ep_file_source, atom_file_source, lambda: config
+                                    , source_cache_exporter, ep_prefix, atom_prefix, dataset_cache)
+  logging.info(f"Batch: loaded {len(episodes)} episodes, {len(atoms)} ATOMs for {start} - {end}")
+  return episodes, atoms
+
+
+def run_period(period:Period, episodes:pd.DataFrame, atoms:pd.DataFrame
+               , config:MatcherConfig, slack_for_matching:int
+               , out_exporter:DataExporter, audit_exporter:DataExporter, out_suffix:str=""
+               , cache:Optional[StageCache]=None, targets:Optional[list[str]]=None
+               , handoff_exporter:Optional[DataExporter]=None, handoff_suffix:str="") \
+                -> dict[str, pd.DataFrame]:
+  stages = [
+    Stage('episodes', lambda: {'episodes': episodes}, outputs=['episodes'], cache=False),
+    Stage('atoms', lambda: {'atoms': atoms}, outputs=['atoms'], cache=False),
+    *matching_stages(config),
+    *output_stages(config, out_exporter, audit_exporter, out_suffix
+                   , handoff_exporter, handoff_suffix),
+  ]
+  params = {'reporting_start': period[0], 'reporting_end': period[1]
+            , 'slack_for_matching': slack_for_matching}
+  return Pipeline(stages, cache, config, profile_exporter=audit_exporter).run(params, targets)
+
+
+def run_periods(periods:list[Period], episodes:pd.DataFrame, atoms:pd.DataFrame
+                , config:MatcherConfig, slack_for_matching:int
+                , out_exporter:DataExporter, get_audit_exporter:Callable[[str], DataExporter]
+                , out_suffix:str="", cache:Optional[StageCache]=None
+                , targets:Optional[list[str]]=None, max_workers:int=4
+                , handoff_exporter:Optional[DataExporter]=None, handoff_suffix:str="") \
+                  -> dict[str, dict[str, pd.DataFrame]]:
+  """
+    get_audit_exporter: period string (yyyymmdd-yyyymmdd) -> the exporter for its audit folder
+    handoff_exporter: see pipeline.get_nada_pipeline
+    Returns each period's pipeline outputs, by period string (in the order of periods).
+  """
+  def run(period:Period) -> dict[str, pd.DataFrame]:
+    p_str = get_period_str(period)
+    logging.info(f"Batch: running {p_str}")
+    return run_period(period, episodes, atoms, config, slack_for_matching
+                      , out_exporter, get_audit_exporter(p_str), out_suffix, cache, targets
+                      , handoff_exporter, handoff_suffix)
+
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    results = list(executor.map(run, periods))
+  return {get_period_str(period): result for period, result in zip(periods, results)}
+
+
+def generate_periods_save(periods:list[Period], config:MatcherConfig, container:str
+                          , slack_for_matching:int=7, max_workers:int=4
+                          , cache:Optional[StageCache]=None) -> dict[str, dict[str, pd.DataFrame]]:
+  """
+    Blob version of test_surveytxt_local.main3 + nada.generate_nada_save for several periods:
+      errors_warnings/<period>/ : audit files
+      NADA/<period>_reindexed.parquet (+ .manifest.json), <period>/surveytxt_<period>.csv
+  """
+  episodes, atoms = load_covering_data(
+                      periods, config
+                      , BlobFileSource(container_name=container, folder_path="MDS")
+                      , BlobFileSource(container_name=container, folder_path="ATOM")
+                      , source_cache_exporter=AzureBlobExporter(container_name=container)
+                      , dataset_cache=host_dataset_cache)
+
+  def get_audit_exporter(p_str:str) -> DataExporter:
+    return AzureBlobExporter(container_name=container
+                             , config={'location': f"errors_warnings/{p_str}"})
+
+  exporter = AzureBlobExporter(container_name=container)
+  return run_periods(periods, episodes, atoms, config, slack_for_matching
+                     , exporter, get_audit_exporter
+                     , out_suffix=".csv", cache=cache, max_workers=max_workers
+                     , handoff_exporter=exporter, handoff_suffix=".parquet")
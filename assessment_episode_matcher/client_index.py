@@ -0,0 +1,223 @@
+"""
+  Per-client (SLK) index of a run's outputs, for triaging an audit row:
+  lookup_client(slk) gives that client's episodes, ATOMs, matches and issues without
+  loading the full period datasets.
+
+  Each artifact is split into num_partitions parquet files by a hash of the SLK, sorted by
+  SLK within a file: {prefix}{artifact}_p{partition}. A small index file ({prefix}index)
+  has each client's (artifact, partition, first_row, num_rows), so a lookup reads only
+  the one partition file per artifact the client is in. The index also records the run's
+  reporting period and config version, for lookups that stand in for an import (lookup_for_period).
+
+  Another run may rewrite the files while a store is in use: the index and the partitions are
+  cached by file version, and each run's id is in the index and its partitions, so an index is
+  never applied to another run's partition files (the index is re-read, once, if it is stale).
+"""
+import logging
+import uuid
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+from assessment_episode_matcher.dataset_cache import DatasetCache, load_versioned
+from assessment_episode_matcher.exporters.main import DataExporter, ParquetExporter, AzureBlobExporter
+from assessment_episode_matcher.importers.main import FileSource, LocalFileSource, BlobFileSource
+from assessment_episode_matcher.survey_store import get_mixed_json_columns, encode_for_store \
+                                                  , decode_from_store
+from assessment_episode_matcher.setup.log_management import lazy
+import assessment_episode_matcher.utils.df_ops_base as utdf
+
+DEFAULT_NUM_PARTITIONS = 16
+row_index_column = '_row_index'
+index_columns = ['SLK', 'artifact', 'partition', 'first_row', 'num_rows']
+
+
+def client_partition(slks:pd.Series, num_partitions:int) -> np.ndarray:
+  # (hash_array's default key is fixed: the same SLK goes to the same partition in every run)
+  hashes = pd.util.hash_array(slks.astype(str).to_numpy(dtype=object))
+  return (hashes % np.uint64(num_partitions)).astype(np.int64)
+
+
+class ClientIndexStore(object):
+  """
+    load_prefix: path prefix for file_source, export_prefix/export_suffix: data_name parts for exporter
+    Loaded partition files are kept in memory (partition_cache, by file version) for repeated lookups.
+  """
+
+  def __init__(self, file_source:FileSource, exporter:DataExporter
+               , load_prefix:str, export_prefix:str, export_suffix:str=""
+               , num_partitions:int=DEFAULT_NUM_PARTITIONS
+               , partition_cache:Optional[DatasetCache]=None) -> None:
+    self.file_source = file_source
+    self.exporter = exporter
+    self.load_prefix = load_prefix
+    self.export_prefix = export_prefix
+    self.export_suffix = export_suffix
+    self.num_partitions = num_partitions
+    self.partition_cache = partition_cache if partition_cache is not None \
+                             else DatasetCache(max_bytes=256 * 1024 * 1024, ttl_seconds=15 * 60)
+    self._index:Optional[pd.DataFrame] = None
+    self._index_version:Optional[str] = None
+
+  def _partition_name(self, artifact:str, partition:int) -> str:
+    return f"{artifact}_p{partition:03d}"
+
+  def write(self, artifacts:dict[str, pd.DataFrame]
+            , period:Optional[tuple[str, str]]=None, config_version:Optional[str]=None) -> pd.DataFrame:
+    """
+      Writes the partition files and the index. Artifacts without an SLK column are skipped.
+      period: the run's reporting period (yyyymmdd, yyyymmdd) the artifacts were imported for
+      Returns the index.
+    """
+    run_id = uuid.uuid4().hex
+    entries = []
+    for artifact, df in artifacts.items():
+      if not utdf.has_data(df) or 'SLK' not in df.columns:
+        logging.debug(f"Client index: no SLK rows in {artifact}, not indexed.")
+        continue
+      df = df[df['SLK'].notna()]
+      partitions = client_partition(df['SLK'], self.num_partitions)
+      order = np.lexsort((df['SLK'].astype(str).to_numpy(), partitions))
+      df, partitions = df.iloc[order], partitions[order]
+
+      stored = encode_for_store(df, get_mixed_json_columns(df))
+      stored.insert(0, row_index_column, df.index)
+      stored.attrs['index_name'] = df.index.name
+      stored.attrs['run_id'] = run_id
+      bounds = np.flatnonzero(np.diff(partitions)) + 1
+      for start, end in zip([0, *bounds], [*bounds, len(df)]):
+        partition = int(partitions[start])
+        part = stored.iloc[start:end].reset_index(drop=True)
+        self.exporter.export_dataframe(
+            data_name=f"{self.export_prefix}{self._partition_name(artifact, partition)}{self.export_suffix}"
+            , data=part)
+        rows = pd.Series(np.arange(len(part))).groupby(part['SLK'].to_numpy(), sort=False) \
+                 .agg(['first', 'size'])
+        entries.append(pd.DataFrame({'SLK': rows.index, 'artifact': artifact, 'partition': partition
+                                     , 'first_row': rows['first'].to_numpy()
+                                     , 'num_rows': rows['size'].to_numpy()}))
+
+    index = pd.concat(entries, ignore_index=True) if entries \
+              else pd.DataFrame(columns=index_columns)
+    index.attrs['artifacts'] = list(artifacts)
+    index.attrs['period'] = list(period) if period else None
+    index.attrs['config_version'] = config_version
+    index.attrs['run_id'] = run_id
+    # last: until it is replaced, readers use the previous index (and find its partitions changed)
+    self.exporter.export_dataframe(data_name=f"{self.export_prefix}index{self.export_suffix}"
+                                   , data=index)
+    self._index = index
+    self._index_version = None
+    self.partition_cache.clear()
+    logging.info("Client index: %s clients, %d artifacts.", lazy(index['SLK'].nunique), len(artifacts))
+    return index
+
+  def load_index(self, refresh:bool=False) -> pd.DataFrame:
+    """
+      The index, re-read if its file has changed since (or if the file source can't tell).
+    """
+    filepath = f"{self.load_prefix}index.parquet"
+    version = self.file_source.get_version(filepath)
+    if self._index is None or refresh or version is None or version != self._index_version:
+      self._index = self.file_source.load_parquet_file_to_df(filepath)
+      self._index_version = version
+    return self._index
+
+  def _load_partition(self, artifact:str, partition:int) -> pd.DataFrame:
+    filepath = f"{self.load_prefix}{self._partition_name(artifact, partition)}.parquet"
+    return load_versioned(self.partition_cache, self.file_source, filepath
+                          , lambda: self.file_source.load_parquet_file_to_df(filepath))
+
+  def _lookup_rows(self, index:pd.DataFrame, slks:list[str]
+                   , artifacts:list[str]) -> Optional[dict[str, list[pd.DataFrame]]]:
+    """
+      None if a partition file is not from the index's run (it was rewritten since).
+    """
+    entries = index[index['SLK'].isin(slks) & index['artifact'].isin(artifacts)]
+    found_rows:dict[str, list[pd.DataFrame]] = {artifact: [] for artifact in artifacts}
+    for (artifact, partition), found in entries.groupby(['artifact', 'partition'], sort=False):
+      part = self._load_partition(artifact, int(partition))
+      if part.attrs.get('run_id') != index.attrs.get('run_id'):
+        return None
+      positions = np.concatenate([np.arange(first, first + n) for first, n
+                                  in zip(found['first_row'], found['num_rows'])])
+      rows = decode_from_store(part.iloc[positions], part.attrs.get('json_columns', []))
+      rows = rows.set_index(row_index_column).rename_axis(part.attrs.get('index_name'))
+      rows.attrs = {}
+      found_rows[artifact].append(utdf.none_to_nan(rows))
+    return found_rows
+
+  def lookup_clients(self, slks:list[str]
+                     , artifacts:Optional[list[str]]=None) -> dict[str, pd.DataFrame]:
+    """
+      The rows of each artifact (all indexed ones, or those asked for) for the SLKs,
+      with their original index. An artifact without rows for them gives an empty frame.
+      Raises ValueError if the index files are being rewritten (by another run).
+    """
+    index = self.load_index()
+    artifacts = artifacts or list(index.attrs.get('artifacts', index['artifact'].unique()))
+    found_rows = self._lookup_rows(index, slks, artifacts)
+    if found_rows is None:
+      logging.info("Client index: partitions rewritten since the index was read, reloading it.")
+      found_rows = self._lookup_rows(self.load_index(refresh=True), slks, artifacts)
+    if found_rows is None:
+      raise ValueError(f"Client index {self.load_prefix}: the index and its partitions are "
+                       "from different runs (being rewritten?)")
+
+    return {artifact: pd.concat(parts) if len(parts) > 1 else (parts[0] if parts else pd.DataFrame())
+            for artifact, parts in found_rows.items()}
+
+  def lookup_for_period(self, slks:list[str], start_str:str, end_str:str, artifact:str
+                        , config_version:Optional[str]=None) -> tuple[pd.DataFrame, list[str]]:
+    """
+      The artifact's rows for the SLKs, as an import for start_str-end_str (yyyymmdd) would
+      give them, if the index was written by a run whose period covers that one (and with the
+      same config version, if given): only the rows with an AssessmentDate in the period.
+      Returns the rows and the SLKs the index can't answer for (all of them if it doesn't apply).
+    """
+    index = self.load_index()
+    period = index.attrs.get('period')
+    if not period or not (period[0] <= start_str and end_str <= period[1]):
+      logging.debug(f"Client index: period {period} doesn't cover {start_str}-{end_str}.")
+      return pd.DataFrame(), list(slks)
+    if config_version and index.attrs.get('config_version') not in (None, config_version):
+      logging.debug("Client index: written with another config version.")
+      return pd.DataFrame(), list(slks)
+
+    indexed_slks = set(index.loc[index['artifact'] == artifact, 'SLK'])
+    missing = [slk for slk in slks if slk not in indexed_slks]
+    try:
+      rows = self.lookup_clients(slks, artifacts=[artifact])[artifact]
+    except ValueError as e:
+      logging.warning(f"{e}: not used.")
+      return pd.DataFrame(), list(slks)
+    if self._index.attrs.get('run_id') != index.attrs.get('run_id'):
+      # the index was re-read (another run rewrote it): check that one's period and clients
+      return self.lookup_for_period(slks, start_str, end_str, artifact, config_version)
+    if utdf.has_data(rows) and 'AssessmentDate' in rows.columns:
+      dates = pd.to_datetime(rows['AssessmentDate'])
+      rows = rows[dates.between(pd.to_datetime(start_str, format="%Y%m%d")
+                                , pd.to_datetime(end_str, format="%Y%m%d"))]
+    return rows, missing
+
+  def lookup_client(self, slk:str, artifacts:Optional[list[str]]=None) -> dict[str, pd.DataFrame]:
+    """
+      Every indexed artifact's rows for one client (episodes, atoms, final_good, issues ...).
+    """
+    return self.lookup_clients([slk], artifacts)
+
+
+def get_local_client_index(folder:str, name:str="client_index"
+                           , num_partitions:int=DEFAULT_NUM_PARTITIONS) -> ClientIndexStore:
+  exporter = ParquetExporter({"location": f"{folder.rstrip('/')}/"})
+  return ClientIndexStore(LocalFileSource(folder), exporter
+                          , load_prefix=f"{name}_", export_prefix=f"{name}_"
+                          , num_partitions=num_partitions)
+
+
+def get_blob_client_index(container_name:str, folder:str="client_index", name:str="client_index"
+                          , num_partitions:int=DEFAULT_NUM_PARTITIONS) -> ClientIndexStore:
+  prefix = f"{folder}/{name}_"
+  return ClientIndexStore(BlobFileSource(container_name), AzureBlobExporter(container_name)
+                          , load_prefix=prefix, export_prefix=prefix, export_suffix=".parquet"
+                          , num_partitions=num_partitions)
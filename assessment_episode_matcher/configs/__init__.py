@@ -1,13 +1,17 @@
-
+import logging
+from typing import Optional
 from assessment_episode_matcher.importers.main import BlobFileSource
+from assessment_episode_matcher.dataset_cache import DatasetCache, load_versioned
+from assessment_episode_matcher.configs.matcher_config import MatcherConfig, load_local_config
 
 
-def load_blob_config(container: str) -> dict:
+def load_blob_config(container: str, cache: Optional[DatasetCache] = None) -> dict:
   """
   Load configuration from a JSON file in an Azure Blob Storage container.
 
   Parameters:
   container (str): The name of the Azure Blob Storage container.
+  cache (DatasetCache): if given, reused while the file's ETag is unchanged.
 
   Returns:
   dict: The loaded configuration.
@@ -17,7 +21,32 @@ def load_blob_config(container: str) -> dict:
   """
   try:
     config_file_source = BlobFileSource(container_name=container, folder_path=".")
-    config = config_file_source.load_json_file(filename="configuration.json", dtype=str)
+    config = load_versioned(cache, config_file_source, "configuration.json"
+                            , lambda: config_file_source.load_json_file(
+                                        filename="configuration.json", dtype=str))
     return config
   except FileNotFoundError:
-    raise FileNotFoundError(f"Configuration file not found in container {container}")
\ No newline at end of file
+    raise FileNotFoundError(f"Configuration file not found in container {container}")
+
+def load_matcher_config(container: str, cache: Optional[DatasetCache] = None
+                        , local_folder: Optional[str] = None) -> MatcherConfig:
+  """
+  Load the configuration from the container as a MatcherConfig (built once per version).
+
+  Parameters:
+  container (str): The name of the Azure Blob Storage container.
+  cache (DatasetCache): if given, reused while the file's ETag is unchanged.
+  local_folder (str): if given, each version loaded is also saved there, and the latest
+    saved one is used when the container's configuration can't be loaded.
+  """
+  try:
+    raw = load_blob_config(container, cache=cache)
+  except (FileNotFoundError, ValueError) as e:
+    if not local_folder:
+      raise
+    logging.warning(f"Using the locally saved configuration: {e}")
+    return load_local_config(local_folder)
+  config = MatcherConfig.of(raw)
+  if local_folder:
+    config.save_local(local_folder)
+  return config
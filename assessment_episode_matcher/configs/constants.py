@@ -1,4 +1,5 @@
 from enum import Enum
 
 class MatchingConstants(Enum):
-    GET_NEAREST_SLK = 'get_nearest_slk'
\ No newline at end of file
+    GET_NEAREST_SLK = 'get_nearest_slk'
+    MATCHING_BACKEND = 'matching_backend'
\ No newline at end of file
@@ -0,0 +1,189 @@
+"""
+  The matcher's configuration (configuration.json), validated once and with its lookups
+  precomputed: drug -> category, the programs of each purpose, establishment -> program.
+  Stages used to re-derive these from the raw dict on every call (the drug categories
+  were scanned once per drug of every assessment).
+
+  A MatcherConfig is read-only and is also a Mapping over the raw configuration, so code
+  that does config.get("...") keeps working. MatcherConfig.of(config) builds one once
+  per configuration version; stages call it on whatever they are given (dict or MatcherConfig).
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections.abc import Mapping
+from enum import Enum
+from typing import Any, Iterator, Optional
+import numpy as np
+import pandas as pd
+
+from assessment_episode_matcher.configs.constants import MatchingConstants
+
+MATCHING_BACKENDS = ('pandas', 'duckdb')
+
+_built:dict[tuple, "MatcherConfig"] = {}
+_built_lock = threading.Lock()
+
+
+def _normalise_keys(config:Mapping) -> dict:
+  # MatchingConstants members are accepted as keys, as their values
+  return {(k.value if isinstance(k, Enum) else k): v for k, v in config.items()}
+
+
+def _content_hash(config:dict) -> str:
+  return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _str_lists(config:dict, name:str) -> dict[str, tuple[str, ...]]:
+  value = config.get(name)
+  if value is None:
+    return {}
+  if not isinstance(value, dict) \
+      or not all(isinstance(v, list) and all(isinstance(s, str) for s in v) for v in value.values()):
+    raise ValueError(f"Configuration '{name}' must map names to lists of strings.")
+  return {k: tuple(v) for k, v in value.items()}
+
+
+class MatcherConfig(Mapping):
+  """
+    Build with MatcherConfig.of(raw_config). Raises ValueError if the configuration is invalid.
+  """
+
+  def __init__(self, config:Mapping) -> None:
+    raw = _normalise_keys(config)
+    drug_categories = _str_lists(raw, "drug_categories")
+    purpose_programs = _str_lists(raw, "purpose_programs")
+    establishment_programs = raw.get("EstablishmentID_Program") or {}
+    if not isinstance(establishment_programs, dict):
+      raise ValueError("Configuration 'EstablishmentID_Program' must map IDs to programs.")
+
+    try:
+      get_nearest_slk = int(raw.get(MatchingConstants.GET_NEAREST_SLK.value, 0))
+    except (TypeError, ValueError):
+      raise ValueError("Configuration 'get_nearest_slk' must be 0 or 1.")
+    matching_backend = raw.get(MatchingConstants.MATCHING_BACKEND.value, 'pandas')
+    if matching_backend not in MATCHING_BACKENDS:
+      raise ValueError(f"Configuration 'matching_backend' must be one of {MATCHING_BACKENDS}.")
+
+    object.__setattr__(self, "_raw", raw)
+    object.__setattr__(self, "version_number", raw.get("version_number"))
+    object.__setattr__(self, "version_hash", _content_hash(raw))
+    object.__setattr__(self, "get_nearest_slk", get_nearest_slk == 1)
+    object.__setattr__(self, "matching_backend", matching_backend)
+
+    # first category listing a substance wins (the order the categories were scanned in)
+    drug_category:dict[str, str] = {}
+    for category, substances in drug_categories.items():
+      for substance in substances:
+        drug_category.setdefault(substance, category)
+    object.__setattr__(self, "drug_category", drug_category)
+
+    object.__setattr__(self, "purpose_programs", purpose_programs)
+    object.__setattr__(self, "purpose_program_sets"
+                       , {p: frozenset(progs) for p, progs in purpose_programs.items()})
+
+    ids = [str(i) for i in establishment_programs]
+    object.__setattr__(self, "establishment_programs", dict(zip(ids, establishment_programs.values())))
+    object.__setattr__(self, "establishment_dtype", pd.CategoricalDtype(ids))
+    # position i: program of the i-th establishment category, last one for unknown IDs (code -1)
+    object.__setattr__(self, "_program_by_code"
+                       , np.array([*establishment_programs.values(), np.nan], dtype=object))
+
+  def __setattr__(self, name:str, value:Any):
+    raise AttributeError("MatcherConfig is read-only")
+
+  def __getitem__(self, key):
+    return self._raw[key.value if isinstance(key, Enum) else key]
+
+  def __contains__(self, key) -> bool:
+    return (key.value if isinstance(key, Enum) else key) in self._raw
+
+  def __iter__(self) -> Iterator:
+    return iter(self._raw)
+
+  def __len__(self) -> int:
+    return len(self._raw)
+
+  def __repr__(self) -> str:
+    return f"MatcherConfig(version_number={self.version_number}, version_hash={self.version_hash})"
+
+  @classmethod
+  def of(cls, config:Optional[Mapping]) -> "MatcherConfig":
+    """
+      The MatcherConfig for a raw configuration, built once per version_number and content.
+    """
+    if isinstance(config, MatcherConfig):
+      return config
+    raw = _normalise_keys(config or {})
+    key = (str(raw.get("version_number")), _content_hash(raw))
+    with _built_lock:
+      built = _built.get(key)
+    if built is None:
+      built = cls(raw)
+      with _built_lock:
+        built = _built.setdefault(key, built)
+    return built
+
+  def get_drug_category(self, drug_name:str) -> tuple[str, int]:
+    """
+      (category, 1), or (drug_name, 0) if the drug is not in any category.
+    """
+    if not drug_name or not isinstance(drug_name, str):
+      return "", 0
+    category = self.drug_category.get(drug_name)
+    if category is None:
+      return drug_name, 0
+    return category, 1
+
+  def program_filters(self, purpose_name:str) -> dict[str, list[str]]:
+    """
+      The 'lists' filters selecting the purpose's programs (a new dict per call: callers add to it).
+    """
+    if purpose_name not in self.purpose_programs:
+      raise KeyError(f"Missing configurtion for {purpose_name} programs ")
+    return {'Program': list(self.purpose_programs[purpose_name])}
+
+  def map_programs(self, establishment_ids:pd.Series) -> pd.Series:
+    """
+      Program of each establishment ID (NaN for IDs not in the mapping), same as
+      establishment_ids.map(config["EstablishmentID_Program"]).
+    """
+    codes = pd.Categorical(establishment_ids, dtype=self.establishment_dtype).codes
+    return pd.Series(self._program_by_code[codes], index=establishment_ids.index
+                     , name=establishment_ids.name)
+
+  def save_local(self, folder:str) -> str:
+    """
+      Writes the configuration to folder/configuration_v{version_number}.json.
+    """
+    path = os.path.join(folder, f"configuration_v{self.version_number}.json")
+    os.makedirs(folder, exist_ok=True)
+    with open(path, 'w') as file:
+      json.dump(self._raw, file, indent=2, default=str)
+    return path
+
+
+def load_local_config(folder:str, version_number:Optional[str]=None) -> MatcherConfig:
+  """
+    A configuration saved by MatcherConfig.save_local: the given version, or the latest one.
+  """
+  prefix, suffix = "configuration_v", ".json"
+  if version_number is None:
+    saved = [f[len(prefix):-len(suffix)] for f in os.listdir(folder)
+             if f.startswith(prefix) and f.endswith(suffix)] if os.path.isdir(folder) else []
+    if not saved:
+      raise FileNotFoundError(f"No saved configuration in {folder}")
+
+    def version_key(v:str):
+      try:
+        return (1, float(v))
+      except ValueError:
+        return (0, 0.0)
+    version_number = max(saved, key=version_key)
+  path = os.path.join(folder, f"{prefix}{version_number}{suffix}")
+  with open(path, 'r') as file:
+    config = MatcherConfig.of(json.load(file))
+  logging.debug(f"Loaded configuration version {version_number} from {path}")
+  return config
@@ -105,6 +105,17 @@ mulselect_option_to_nadafield = {
 
   }
 
+# NADA fields -> transform applied in prep (see utils.df_ops_base.field_transformers)
+nada_field_transforms = {
+    'Past4WkBeenArrested': 'yes_no',
+    'Past4WkHaveYouViolenceAbusive': 'yes_no',
+    'ATOPHomeless': 'bool',
+    'ATOPRiskEviction': 'bool',
+    'PrimaryCaregiver_0-5': 'bool',
+    'PrimaryCaregiver_5-15': 'bool',
+    'Past4Wk_ViolentToYou': 'bool',
+  }
+
 fieldname_suffixes_range= ["PerOccassionUse"]
 
 # replace left(key) value with the right value in dataset
@@ -1,22 +1,41 @@
 
 import logging
-# from typing import Optional
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Optional, TYPE_CHECKING
+import numpy as np
 import pandas as pd
 
-from assessment_episode_matcher.data_config import keep_parent_fields, mulselect_option_to_nadafield
+from assessment_episode_matcher.data_config import keep_parent_fields, mulselect_option_to_nadafield \
+                                                , nada_field_transforms
 from assessment_episode_matcher.mytypes import Purpose
-from assessment_episode_matcher.utils.base import check_for_string
+from assessment_episode_matcher.aod_warnings import AODWarnings
+from assessment_episode_matcher.configs.matcher_config import MatcherConfig
 from assessment_episode_matcher.utils.dtypes import fix_numerics
 from assessment_episode_matcher.utils.df_ops_base import concat_drop_parent, \
                            drop_fields_by_regex \
-                     ,   drop_fields,\
-                         to_num_yn_none, to_num_bool_none,transform_multiple
+                     ,   drop_fields, transform_fields
 from assessment_episode_matcher.utils.fromstr import clean_and_parse_json
 from assessment_episode_matcher.importers.aod import expand_drug_info
+from assessment_episode_matcher.profiling import profiled
+
+if TYPE_CHECKING:
+  from assessment_episode_matcher.survey_store import ParsedSurveyStore
+
+# parallel prep (expand_and_derive_parallel): smaller chunks aren't worth a process round trip
+MIN_PREP_CHUNK_ROWS = 500
+PREP_CHUNKS_PER_WORKER = 4
 
 # logger = mylogger.get(__name__)
 
-def get_surveydata_expanded(df: pd.DataFrame, prep_type: Purpose) -> pd.DataFrame:
+def get_surveydata_expanded(df: pd.DataFrame, prep_type: Purpose
+                            , ensure_columns:Optional[list[str]]=None) -> pd.DataFrame:
+    """
+      ensure_columns: SurveyData fields to add (as blanks) when none of the rows have them,
+                      e.g. when prepping a chunk of a larger dataset that does.
+    """
     df_surveydata = df['SurveyData'].apply(clean_and_parse_json)
     
     # Filter out invalid or missing JSON data
@@ -27,6 +46,11 @@ def get_surveydata_expanded(df: pd.DataFrame, prep_type: Purpose) -> pd.DataFram
     
     if prep_type == Purpose.MATCHING:
         df_surveydata_expanded = df_surveydata_expanded[['ClientType', 'PDC']]
+    elif ensure_columns:
+        missing = [c for c in ensure_columns if c not in df_surveydata_expanded.columns]
+        if missing:
+            df_surveydata_expanded = df_surveydata_expanded.reindex(
+                columns=[*df_surveydata_expanded.columns, *missing])
     
     # Ensure df_surveydata_expanded has the same index as valid_surveydata
     df_surveydata_expanded.index = valid_surveydata[valid_surveydata].index
@@ -44,55 +68,158 @@ def get_surveydata_expanded(df: pd.DataFrame, prep_type: Purpose) -> pd.DataFram
     return df_final
 
 
-def nadafield_from_multiselect(df1:pd.DataFrame) -> pd.DataFrame:
-  df= df1.copy()
-  # no_answer_value = -1  # do this together later for all fields.
-  for ATOMMultiSelectQuestion, nadafield_searchstr in \
-      mulselect_option_to_nadafield.items():
-    for nadafield, search_str in nadafield_searchstr.items():
-      if ATOMMultiSelectQuestion not in df.columns:
-        logging.warn(f"No column {ATOMMultiSelectQuestion} nadafield_from_multiselect")
-        continue
-      df[nadafield] = df[ATOMMultiSelectQuestion].apply(
-                    lambda x: check_for_string(x, search_str))
+def multiselect_to_nadafields(answers:pd.Series, nadafield_searchstr:dict) -> pd.DataFrame:
+  """
+    A column per nadafield, with check_for_string's result for each answer:
+      list (multiselect) -> whether the option was selected (True/False)
+      dict (e.g. {'Days': 3}) -> the option's value; anything else -> None
+    The list answers are exploded once and all the options looked up together.
+  """
+  if answers.empty:
+    return pd.DataFrame({nadafield: answers for nadafield in nadafield_searchstr})
 
-  return df
+  kinds = answers.map(type).to_numpy()
+  values = answers.to_numpy()
+  is_list, is_dict = kinds == list, kinds == dict
+  positions = np.arange(len(answers))
 
+  selections = pd.Series(values[is_list], index=positions[is_list], dtype=object).explode()
+  selections = selections[selections.isin(list(nadafield_searchstr.values()))]
+  dict_answers = values[is_dict]
 
-def convert_yes_nofields(df1, field_names):
-  return transform_multiple(df1, field_names,to_num_yn_none)
+  result = {}
+  for nadafield, search_str in nadafield_searchstr.items():
+    flags = np.full(len(answers), None, dtype=object)
+    flags[is_list] = False
+    flags[selections.index[selections == search_str]] = True
+    if len(dict_answers):
+      # (.str.get would give NaN, not None, for a missing key)
+      flags[is_dict] = [answer.get(search_str) for answer in dict_answers]
+    # same dtypes as Series.apply would infer (bool when every answer is a list)
+    result[nadafield] = pd.Series(flags, index=answers.index).infer_objects()
 
-def convert_true_falsefields(df1, field_names):
-  return transform_multiple(df1, field_names,to_num_bool_none)
+  return pd.DataFrame(result, index=answers.index)
 
 
+def nadafield_from_multiselect(df1:pd.DataFrame) -> pd.DataFrame:
+  df= df1.copy()
+  # no_answer_value = -1  # do this together later for all fields.
+  for ATOMMultiSelectQuestion, nadafield_searchstr in \
+      mulselect_option_to_nadafield.items():
+    if ATOMMultiSelectQuestion not in df.columns:
+      logging.warn(f"No column {ATOMMultiSelectQuestion} nadafield_from_multiselect")
+      continue
+    flags = multiselect_to_nadafields(df[ATOMMultiSelectQuestion], nadafield_searchstr)
+    for nadafield in flags.columns:
+      df[nadafield] = flags[nadafield]
 
+  return df
 
-def prep_nada_fields(df:pd.DataFrame, config:dict):
 
-  logging.debug(f"prep_dataframe of length {len(df)} : ")
-  df2 = get_surveydata_expanded(df.copy(), Purpose.NADA)
+def expand_survey_fields(df:pd.DataFrame, config:MatcherConfig
+                         , ensure_columns:Optional[list[str]]=None) \
+                          -> tuple[pd.DataFrame, AODWarnings]:
+  """
+    The JSON-parsing part of the NADA prep: SurveyData -> columns, drug lists -> per-drug columns.
+  """
+  df2 = get_surveydata_expanded(df.copy(), Purpose.NADA, ensure_columns)
  
   df4 = drop_fields_by_regex(df2,regex='Comment|Note|ITSP') # remove *Goals notes, so do before PDC step (PDCGoals dropdown)
 
-  df5, warnings_aod = expand_drug_info(df4, config)
+  return expand_drug_info(df4, config)
+
+
+def expand_and_derive(df:pd.DataFrame, config:MatcherConfig
+                      , ensure_columns:Optional[list[str]]=None) \
+                        -> tuple[pd.DataFrame, AODWarnings]:
+  """
+    The row-by-row (CPU-bound) part of the NADA prep:
+    SurveyData -> columns, notes dropped, drug lists -> per-drug columns, multiselect -> NADA fields.
+  """
+  df5, warnings_aod = expand_survey_fields(df, config, ensure_columns)
+  return nadafield_from_multiselect(df5), warnings_aod
+
+
+def get_prep_chunk_size(num_rows:int, workers:int) -> int:
+  # a few chunks per worker, so the workers finish at about the same time
+  return max(MIN_PREP_CHUNK_ROWS, math.ceil(num_rows / (workers * PREP_CHUNKS_PER_WORKER)))
+
+
+def prep_process_pool(workers:int) -> ProcessPoolExecutor:
+  """
+    Worker processes for expand_and_derive_parallel, to share between several preps
+    (e.g. the chunks of a chunked export): starting one imports pandas and the package.
+  """
+  # spawn, not fork: the caller may be running loader/export/logging threads (and their locks)
+  return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def expand_and_derive_parallel(df:pd.DataFrame, config:MatcherConfig, workers:int
+                               , ensure_columns:Optional[list[str]]=None
+                               , chunk_size:Optional[int]=None
+                               , executor:Optional[ProcessPoolExecutor]=None) \
+                                -> tuple[pd.DataFrame, AODWarnings]:
+  """
+    expand_and_derive over chunks of rows, in worker processes.
+    The chunks' results are put back together in the original row order; their columns in
+    the order the chunks (in row order) first have them, whichever worker finishes first.
+    ensure_columns: fields the whole dataset has (see nada.get_surveydata_fields_present),
+                    added to the chunks that don't, as the single-process prep would have them.
+    executor: the prep_process_pool (of workers processes) to use; one is started if not given.
+  """
+  chunk_size = chunk_size or get_prep_chunk_size(len(df), workers)
+  chunks = [df.iloc[start:start + chunk_size] for start in range(0, len(df), chunk_size)]
+  if workers <= 1 or len(chunks) <= 1:
+    return expand_and_derive(df, config, ensure_columns)
+
+  if executor is None:
+    with prep_process_pool(min(workers, len(chunks))) as executor:
+      return expand_and_derive_parallel(df, config, workers, ensure_columns, chunk_size, executor)
+  results = list(executor.map(expand_and_derive, chunks, repeat(config), repeat(ensure_columns)))
+
+  columns = list(dict.fromkeys(col for part, _ in results for col in part.columns))
+  expanded = pd.concat([part.reindex(columns=columns) for part, _ in results])
+  warnings_aod = AODWarnings()
+  for _, chunk_warnings in results:
+    warnings_aod.extend(chunk_warnings)
+  logging.debug("Prep: %d assessments in %d chunks, %d processes"
+                , len(df), len(chunks), min(workers, len(chunks)))
+  return expanded, warnings_aod
+
+
+@profiled
+def prep_nada_fields(df:pd.DataFrame, config:MatcherConfig
+                     , ensure_columns:Optional[list[str]]=None
+                     , survey_store:Optional["ParsedSurveyStore"]=None
+                     , workers:Optional[int]=None
+                     , executor:Optional[ProcessPoolExecutor]=None):
+  """
+    survey_store: if passed, only the assessments it doesn't have (by SLK, RowKey, Timestamp)
+                  have their SurveyData parsed.
+    workers: if more than 1 (and no survey_store), the SurveyData is parsed and expanded
+             in that many processes (expand_and_derive_parallel; executor: their prep_process_pool).
+  """
+  logging.debug(f"prep_dataframe of length {len(df)} : ")
+  if survey_store is not None:
+    df5, warnings_aod = survey_store.expand(df, config, ensure_columns)
+    df51 = nadafield_from_multiselect(df5)
+  elif workers and workers > 1:
+    df51, warnings_aod = expand_and_derive_parallel(df, config, workers, ensure_columns
+                                                    , executor=executor)
+  else:
+    df51, warnings_aod = expand_and_derive(df, config, ensure_columns)
 
   # df51 = expand_activities_info(df5)
-  df51 = nadafield_from_multiselect(df5)
   # df6 = df5[df5.PDCSubstanceOrGambling.notna()]# removes rows without PDC
   
-  yes_nofields = ['Past4WkBeenArrested', 'Past4WkHaveYouViolenceAbusive']
-
-  df52 = convert_yes_nofields(df51, yes_nofields)
-  bool_fields = ['ATOPHomeless',	'ATOPRiskEviction',	'PrimaryCaregiver_0-5',
-                 	'PrimaryCaregiver_5-15',	'Past4Wk_ViolentToYou',]
-  df6 = convert_true_falsefields(df52, bool_fields)
+  # yes/no and true/false answers -> '1'/'0'/None codes
+  df6 = transform_fields(df51, nada_field_transforms)
    
   df7 = fix_numerics(df6)  
   df7.rename(columns={'ESTABLISHMENT IDENTIFIER': 'AgencyCode'}, inplace=True)
   
   df9 = df7.sort_values(by=["SLK", "AssessmentDate"])
   
-  logging.debug(f"Done Prepping for NADA. \n\t" +
-                "  Dataset shape:{df9.shape}). Warnings shape {warnings_aod}")
+  logging.debug("Done Prepping for NADA. \n\t  Dataset shape: %s. Warnings: %d"
+                , df9.shape, len(warnings_aod))
   return df9 , warnings_aod
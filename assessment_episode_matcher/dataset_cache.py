@@ -0,0 +1,158 @@
+"""
+  Process-level cache of prepared datasets (episodes, ATOMs, config).
+  On a warm Function host, module state survives between invocations: back-to-back
+  requests reuse what an earlier one loaded, instead of downloading and preparing it again.
+
+  Entries are keyed by the source file's version (a blob's ETag), so a changed file
+  is never served from the cache. Entries expire after a TTL, and the least recently
+  used ones are evicted when the estimated memory footprint goes over the limit.
+"""
+import copy
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+import pandas as pd
+
+from assessment_episode_matcher.importers.main import FileSource
+from assessment_episode_matcher.utils.environment import ConfigKeys
+
+DEFAULT_MAX_MB = 1024
+DEFAULT_TTL_SECONDS = 15 * 60
+
+
+def estimate_size(value:Any) -> int:
+  """
+    Estimated memory footprint (bytes) of a cached value.
+  """
+  if isinstance(value, pd.DataFrame):
+    return int(value.memory_usage(index=True, deep=True).sum())
+  if isinstance(value, (tuple, list)):
+    return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+  if isinstance(value, dict):
+    return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+  return sys.getsizeof(value)
+
+
+def _copy_value(value:Any) -> Any:
+  # callers get their own copy: a frame changed in place must not change the cached one
+  if isinstance(value, pd.DataFrame):
+    return value.copy()
+  if isinstance(value, tuple):
+    return tuple(_copy_value(v) for v in value)
+  return copy.deepcopy(value)
+
+
+class _Entry(object):
+
+  def __init__(self, value:Any, size:int, loaded_at:float) -> None:
+    self.value = value
+    self.size = size
+    self.loaded_at = loaded_at
+
+
+class DatasetCache(object):
+  """
+    LRU cache bounded by estimated memory footprint (max_bytes), with a TTL.
+    Thread-safe; values are copied on the way out.
+  """
+
+  def __init__(self, max_bytes:int, ttl_seconds:float
+               , clock:Callable[[], float]=time.monotonic) -> None:
+    self.max_bytes = max_bytes
+    self.ttl_seconds = ttl_seconds
+    self.clock = clock
+    self._entries:OrderedDict[Hashable, _Entry] = OrderedDict()
+    self._lock = threading.Lock()
+    self.num_bytes = 0
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.expirations = 0
+
+  def _remove(self, key:Hashable):
+    entry = self._entries.pop(key)
+    self.num_bytes -= entry.size
+
+  def get(self, key:Hashable) -> Optional[Any]:
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry and self.clock() - entry.loaded_at > self.ttl_seconds:
+        self._remove(key)
+        self.expirations += 1
+        entry = None
+      if not entry:
+        self.misses += 1
+        return None
+      self._entries.move_to_end(key)
+      self.hits += 1
+      value = entry.value
+    return _copy_value(value)
+
+  def put(self, key:Hashable, value:Any):
+    size = estimate_size(value)
+    if size > self.max_bytes:
+      logging.info(f"Dataset cache: not caching {key} ({size} bytes is over the limit)")
+      return
+    with self._lock:
+      if key in self._entries:
+        self._remove(key)
+      self._entries[key] = _Entry(value, size, self.clock())
+      self.num_bytes += size
+      while self.num_bytes > self.max_bytes:
+        oldest = next(iter(self._entries))
+        self._remove(oldest)
+        self.evictions += 1
+        logging.debug(f"Dataset cache: evicted {oldest}")
+
+  def get_or_load(self, key:Hashable, loader:Callable[[], Any]) -> Any:
+    value = self.get(key)
+    if value is not None:
+      return value
+    value = loader()
+    self.put(key, value)
+    return _copy_value(value)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self.num_bytes = 0
+
+  def get_stats(self) -> dict[str, int]:
+    with self._lock:
+      return {
+        'hits': self.hits,
+        'misses': self.misses,
+        'evictions': self.evictions,
+        'expirations': self.expirations,
+        'entries': len(self._entries),
+        'bytes': self.num_bytes,
+      }
+
+
+def load_versioned(cache:Optional[DatasetCache], file_source:FileSource, filepath:str
+                   , loader:Callable[[], Any], key_extra:tuple=()) -> Any:
+  """
+    loader() result for the file, from the cache while the file's version (ETag) is the same.
+    key_extra: anything else the result depends on (e.g. the config version, the period).
+  """
+  version = file_source.get_version(filepath) if cache else None
+  if version is None:
+    return loader()
+  source_id = getattr(file_source, 'container_name', getattr(file_source, 'path', ''))
+  key = (type(file_source).__name__, source_id, filepath, version, *key_extra)
+  return cache.get_or_load(key, loader)
+
+
+def _env_number(key:ConfigKeys, default:float) -> float:
+  value = os.environ.get(key.value)
+  return float(value) if value else default
+
+
+# shared by the invocations on this host
+dataset_cache = DatasetCache(
+  max_bytes=int(_env_number(ConfigKeys.DATASET_CACHE_MAX_MB, DEFAULT_MAX_MB) * 1024 * 1024),
+  ttl_seconds=_env_number(ConfigKeys.DATASET_CACHE_TTL_SECONDS, DEFAULT_TTL_SECONDS))
@@ -1,10 +1,10 @@
 import pandas as pd
-from assessment_episode_matcher.utils.dtypes import date_str_format
+from assessment_episode_matcher.utils.dtypes import date_series_format
 from assessment_episode_matcher.utils.df_ops_base import safe_convert_to_int_strs, prescribe_fields
 from assessment_episode_matcher.exporters.config.NADAbase import nada_final_fields, notanswered_defaults
 
 
-def get_stage_per_episode(df:pd.DataFrame)-> pd.Series:  
+def get_stage_per_episode(df:pd.DataFrame)-> pd.Series:
   df = df.sort_values(by=["PMSEpisodeID", "AssessmentDate"])
   # Rank the assessments within each client
   return  df.groupby('PMSEpisodeID').cumcount()
@@ -12,18 +12,18 @@ def get_stage_per_episode(df:pd.DataFrame)-> pd.Series:
 
 def set_not_answered(df1:pd.DataFrame, notanswered_cols:list) -> pd.DataFrame:
   df = df1.copy()
-  for col in notanswered_cols:
-    # Use the recommended approach to handle the FutureWarning
-    # This addresses the pandas FutureWarning about downcasting behavior
-    result = df[col].replace('', -1)
-    df[col] = result.infer_objects(copy=False)
-    # infer: instruct pandas to infer the data type of the resulting
-    # column and perform any necessary downcasting.
+  cols = [col for col in dict.fromkeys(notanswered_cols) if col in df.columns]
+  if not cols:
+    return df
+  block = df[cols]
+  # '' -> -1 for all the columns at once;
+  # infer: columns that end up all -1 become int64 (as replace + infer_objects did)
+  df[cols] = block.mask(block.eq(''), -1).infer_objects()
   return df
 
 
 def cols_prep(source_df, dest_columns, fill_new_cols) -> pd.DataFrame:
-  
+
   df_final = source_df.reindex(columns=dest_columns, fill_value=fill_new_cols)
   # 'StandardDrinksPerDay' (_PerOccassionUse) -> Range/average calculation resutls in float
   float_cols = list(df_final.select_dtypes(include=['float']).columns )
@@ -34,16 +34,16 @@ def cols_prep(source_df, dest_columns, fill_new_cols) -> pd.DataFrame:
 
 
 def generate_finaloutput_df(df1):
+  # nada_final_fields repeats some columns (e.g. Alcohol_DaysInLast28 is in DU and ATOP):
+  # format each column once, then lay out the final (repeating) column order.
+  unique_fields = list(dict.fromkeys(nada_final_fields))
 
-  df = df1.copy()
-  # df["Stage"] = get_stage_per_episode(df)
+  df_final = prescribe_fields(df1, unique_fields)
+  df_final = cols_prep(df_final, unique_fields, fill_new_cols="")
 
-  df_final = prescribe_fields(df, nada_final_fields)
-  df_final = cols_prep(df_final, nada_final_fields, fill_new_cols="")
-  
   # TODO zfill PID
-  cols_fill4 = ['PDCCode', 'PMSPersonID']
-  df_final[cols_fill4] = df_final[cols_fill4].astype(str).apply(lambda x: x.str.zfill(4))
+  for col in ['PDCCode', 'PMSPersonID']:
+    df_final[col] = df_final[col].astype(str).str.zfill(4)
 
-  df_final['AssessmentDate'] = df_final['AssessmentDate'].apply(date_str_format)
-  return df_final
\ No newline at end of file
+  df_final['AssessmentDate'] = date_series_format(df_final['AssessmentDate'])
+  return df_final[nada_final_fields]
@@ -1,11 +1,101 @@
 
+import os
+import logging
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Optional
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Optional, TYPE_CHECKING
 # from pathlib import Path
 import pandas as pd
-from assessment_episode_matcher.azutil.az_blob_query import AzureBlobQuery
+if TYPE_CHECKING:
+  # (the Azure SDK is only imported when a blob exporter is created)
+  from assessment_episode_matcher.azutil.az_blob_query import AzureBlobQuery, BlockBlobWriter
 from assessment_episode_matcher.mytypes import CSVTypeObject
 
+class CSVChunkWriter(ABC):
+  """
+    Writes DataFrames, one chunk at a time, into a single CSV.
+    The header is taken from the first chunk (write an empty frame
+    for a header-only CSV). The output is only
+    finalised by close(); use as a context manager to discard it on error.
+  """
+
+  def __init__(self) -> None:
+    self.num_rows = 0
+    self.num_chunks = 0
+
+  def write_chunk(self, data:pd.DataFrame):
+    csv_text = data.to_csv(index=False, header=(self.num_chunks == 0))
+    self._write(csv_text)
+    self.num_rows += len(data)
+    self.num_chunks += 1
+
+  @abstractmethod
+  def _write(self, csv_text:str):
+    pass
+
+  @abstractmethod
+  def close(self) -> Any:
+    pass
+
+  def abort(self):
+    pass
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    if exc_type:
+      self.abort()
+    else:
+      self.close()
+
+
+class LocalCSVChunkWriter(CSVChunkWriter):
+
+  def __init__(self, file_path:str) -> None:
+    super().__init__()
+    self.file_path = file_path
+    # newline='' : same line endings as DataFrame.to_csv(path)
+    self.file = open(file_path, 'w', newline='', encoding='utf-8')
+
+  def _write(self, csv_text:str):
+    self.file.write(csv_text)
+
+  def close(self):
+    self.file.close()
+
+  def abort(self):
+    # no partial survey.txt left behind
+    self.file.close()
+    if os.path.exists(self.file_path):
+      os.remove(self.file_path)
+
+
+class BlobCSVChunkWriter(CSVChunkWriter):
+  """
+    Each chunk is staged as a block; the blob is created when the blocks are committed.
+    An aborted upload leaves no blob behind (uncommitted blocks expire).
+  """
+
+  def __init__(self, block_writer:'BlockBlobWriter') -> None:
+    super().__init__()
+    self.block_writer = block_writer
+
+  def _write(self, csv_text:str):
+    self.block_writer.write(csv_text)
+
+  def close(self) -> dict[str, Any]:
+    return self.block_writer.commit()
+
+
+# num_bytes: None if the exporter can't tell; serialize_seconds: None if it isn't separate from the write
+ExportResult = namedtuple('ExportResult'
+                          , ['data_name', 'num_rows', 'num_bytes', 'serialize_seconds', 'write_seconds'])
+
+
 class DataExporter(ABC):
 
   def __init__(self, config) -> None:
@@ -15,25 +105,166 @@ class DataExporter(ABC):
   def export_dataframe(self, data_name:str, data:pd.DataFrame):
     pass
 
+  def open_csv_writer(self, data_name:str) -> CSVChunkWriter:
+    raise NotImplementedError(f"{type(self).__name__} does not support chunked CSV writes")
 
-class CSVExporter(DataExporter):
+  def export_bytes(self, data_name:str, data:bytes):
+    """
+      A file that isn't a DataFrame (e.g. a profile); data_name includes the extension.
+    """
+    path = self.config.get("location") if hasattr(self, "config") else None
+    if not path:
+      raise NotImplementedError(f"{type(self).__name__} does not support file exports")
+    with open(f"{path}{data_name}", 'wb') as file:
+      file.write(data)
+
+  def export_many(self, items:dict[str, pd.DataFrame], max_workers:int=4) -> dict[str, ExportResult]:
+    """
+      Exports each (data_name -> DataFrame) in worker threads, so the writes/uploads overlap.
+      Returns the size and timings of each export, by data_name.
+      Raises the first export error, after the other exports have finished.
+    """
+    if not items:
+      return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+      futures = {name: executor.submit(self._export_timed, name, data)
+                 for name, data in items.items()}
+    results = {name: future.result() for name, future in futures.items()}
+    for r in results.values():
+      logging.info(f"Exported {r.data_name}: {r.num_rows} rows, {r.num_bytes} bytes"
+                   f" in {r.write_seconds:.2f}s")
+    return results
+
+  def _export_timed(self, data_name:str, data:pd.DataFrame) -> ExportResult:
+    start = time.perf_counter()
+    self.export_dataframe(data_name, data)
+    return ExportResult(data_name, len(data), self._get_exported_size(data_name)
+                        , None, time.perf_counter() - start)
+
+  def _get_exported_size(self, data_name:str) -> Optional[int]:
+    return None
+
+
+class DeferredExporter(DataExporter):
+  """
+    Collects export_dataframe/export_bytes calls, to be exported together by flush():
+    the DataFrames concurrently, then the files (e.g. a manifest of the frames) in order.
+  """
+
+  def __init__(self, exporter:DataExporter) -> None:
+    self.exporter = exporter
+    self.pending:dict[str, pd.DataFrame] = {}
+    self.pending_files:dict[str, bytes] = {}
 
   def export_dataframe(self, data_name:str, data:pd.DataFrame):
+    self.pending[data_name] = data
+
+  def export_bytes(self, data_name:str, data:bytes):
+    self.pending_files[data_name] = data
+
+  def flush(self, max_workers:int=4) -> dict[str, ExportResult]:
+    pending, self.pending = self.pending, {}
+    pending_files, self.pending_files = self.pending_files, {}
+    results = self.exporter.export_many(pending, max_workers=max_workers)
+    for data_name, data in pending_files.items():
+      self.exporter.export_bytes(data_name, data)
+    return results
+
+
+class BackgroundExporter(DataExporter):
+  """
+    Starts each export_dataframe/export_bytes call in a background thread straight away
+    (e.g. uploading the episode cache while the ATOMs are still loading); flush() waits for them.
+    A file is written after the DataFrames exported before it (e.g. a manifest of the frames),
+    and not at all if one of them failed.
+  """
+
+  def __init__(self, exporter:DataExporter, max_workers:int=4) -> None:
+    self.exporter = exporter
+    self.max_workers = max_workers
+    self.executor:Optional[ThreadPoolExecutor] = None
+    self.frame_futures:dict[str, Future] = {}
+    self.file_futures:list[Future] = []
+    # (exports may be started from several loader threads)
+    self.lock = threading.Lock()
+
+  def _get_executor(self) -> ThreadPoolExecutor:
+    if self.executor is None:
+      self.executor = ThreadPoolExecutor(max_workers=self.max_workers
+                                         , thread_name_prefix="export")
+    return self.executor
+
+  def export_dataframe(self, data_name:str, data:pd.DataFrame):
+    with self.lock:
+      self.frame_futures[data_name] = self._get_executor().submit(
+                                        self.exporter._export_timed, data_name, data)
+
+  def export_bytes(self, data_name:str, data:bytes):
+    def write(before:list[Future]):
+      wait(before)
+      # (a manifest must not point at a frame that wasn't written: flush() raises the error)
+      if any(f.exception() is not None for f in before):
+        logging.error(f"Not exporting {data_name}: an export before it failed.")
+        return
+      self.exporter.export_bytes(data_name, data)
+
+    with self.lock:
+      # (the frames' exports were queued before this one: they are running or done when it starts)
+      before = list(self.frame_futures.values())
+      self.file_futures.append(self._get_executor().submit(write, before))
+
+  def flush(self) -> dict[str, ExportResult]:
+    """
+      Waits for the exports started so far. Returns the DataFrames' results, by data_name;
+      raises the first export error, after the other exports have finished.
+    """
+    with self.lock:
+      frame_futures, self.frame_futures = self.frame_futures, {}
+      file_futures, self.file_futures = self.file_futures, []
+      executor, self.executor = self.executor, None
+    if executor is not None:
+      executor.shutdown(wait=True)
+
+    results = {name: future.result() for name, future in frame_futures.items()}
+    for future in file_futures:
+      future.result()
+    for r in results.values():
+      logging.info(f"Exported {r.data_name}: {r.num_rows} rows, {r.num_bytes} bytes"
+                   f" in {r.write_seconds:.2f}s")
+    return results
+
+
+class CSVExporter(DataExporter):
+
+  def _get_path(self) -> str:
     path = self.config.get("location")
     if not path:
       raise FileNotFoundError("CSVExporter:No file-path was passed in")
-    
+    return path
+
+  def export_dataframe(self, data_name:str, data:pd.DataFrame):
+    path = self._get_path()
     data.to_csv(f"{path}{data_name}.csv", index=False)
 
+  def _get_exported_size(self, data_name:str) -> Optional[int]:
+    return os.path.getsize(f"{self._get_path()}{data_name}.csv")
+
+  def open_csv_writer(self, data_name:str) -> CSVChunkWriter:
+    path = self._get_path()
+    return LocalCSVChunkWriter(f"{path}{data_name}.csv")
 
-# class ParquetExporter(DataExporter):
 
-#   def export_dataframe(self, data_name:str, data:pd.DataFrame):
-#     path = self.config.get("location")
-#     if not path:
-#       raise FileNotFoundError("ParquetExporter:No file-path was passed in")
+class ParquetExporter(DataExporter):
+
+  def export_dataframe(self, data_name:str, data:pd.DataFrame):
+    path = self.config.get("location")
+    if not path:
+      raise FileNotFoundError("ParquetExporter:No file-path was passed in")
     
-#     data.to_parquet(f"{path}{data_name}.parquet", index=False)
+    data.to_parquet(f"{path}{data_name}.parquet", index=False)
+
+  def _get_exported_size(self, data_name:str) -> Optional[int]:
+    return os.path.getsize(f"{self.config.get('location')}{data_name}.parquet")
 
 
 class LocalFileExporter(DataExporter):
@@ -47,6 +278,14 @@ class LocalFileExporter(DataExporter):
   def export_dataframe(self, data_name:str, data:pd.DataFrame):
     p = CSVExporter(self.config)
     p.export_dataframe(data_name, data)
+
+  def open_csv_writer(self, data_name:str) -> CSVChunkWriter:
+    p = CSVExporter(self.config)
+    return p.open_csv_writer(data_name)
+
+  def _get_exported_size(self, data_name:str) -> Optional[int]:
+    p = CSVExporter(self.config)
+    return p._get_exported_size(data_name)
     
 
 # class ConstructorRequirementError(Exception):
@@ -61,9 +300,10 @@ class LocalFileExporter(DataExporter):
   
 
 class AzureBlobExporter(DataExporter):
-  blobClient:AzureBlobQuery
+  blobClient:'AzureBlobQuery'
 
   def __init__(self, container_name:str, config:Optional[dict]=None) -> None:
+    from assessment_episode_matcher.azutil.az_blob_query import AzureBlobQuery
     if config:
       super().__init__(config)
       # if not hasattr(self.config, 'container_name'):
@@ -74,24 +314,53 @@ class AzureBlobExporter(DataExporter):
     self.container_name = container_name
     self.blobClient = AzureBlobQuery()
 
-  def export_dataframe(self, data_name:str, data:pd.DataFrame):   
-    full_path = data_name
+  def _get_full_path(self, data_name:str) -> str:
     if hasattr(self, "config"):
       folder_path = self.config.get("location")
       if folder_path:
-        full_path = f"{folder_path}/{data_name}"
+        return f"{folder_path}/{data_name}"
+    return data_name
+
+  def export_dataframe(self, data_name:str, data:pd.DataFrame):   
+    full_path = self._get_full_path(data_name)
   
     result = self.blobClient.write_dataframe(container_name=self.container_name
                                         , blob_url=full_path
                                         ,data=data)    
     return result
+
+  def _export_timed(self, data_name:str, data:pd.DataFrame) -> ExportResult:
+    # serialized here, in the worker thread, rather than inside the upload
+    full_path = self._get_full_path(data_name)
+    start = time.perf_counter()
+    payload = self.blobClient.serialize_dataframe(blob_url=full_path, data=data)
+    if isinstance(payload, str):
+      payload = payload.encode('utf-8')
+    serialized = time.perf_counter()
+    self.blobClient.upload_data(container_name=self.container_name
+                                , blob_url=full_path, data=payload)
+    return ExportResult(data_name, len(data), len(payload)
+                        , serialized - start, time.perf_counter() - serialized)
     
+  def open_csv_writer(self, data_name:str) -> CSVChunkWriter:
+    full_path = self._get_full_path(data_name)
+
+    block_writer = self.blobClient.open_block_writer(container_name=self.container_name
+                                                     , blob_url=full_path)
+    return BlobCSVChunkWriter(block_writer)
+
+  def export_text(self, data_name:str, data:str):
+    full_path = self._get_full_path(data_name)
+    return self.blobClient.upload_data(container_name=self.container_name
+                                       , blob_url=full_path, data=data)
+
+  def export_bytes(self, data_name:str, data:bytes):
+    full_path = self._get_full_path(data_name)
+    return self.blobClient.upload_data(container_name=self.container_name
+                                       , blob_url=full_path, data=data)
+
   def export_csv(self, data_name:str, data:CSVTypeObject):   
-    full_path = data_name
-    if hasattr(self, "config"):
-      folder_path = self.config.get("location")
-      if folder_path:
-        full_path = f"{folder_path}/{data_name}"
+    full_path = self._get_full_path(data_name)
   
     result = self.blobClient.write_csv(container_name=self.container_name
                                         , blob_url=full_path
@@ -4,6 +4,8 @@ from assessment_episode_matcher.data_config import PDC_ODC_ATOMfield_names as PD
 from assessment_episode_matcher.utils.fromstr import range_average
 from assessment_episode_matcher.utils.df_ops_base import drop_fields
 from assessment_episode_matcher.mytypes import AODWarning
+from assessment_episode_matcher.aod_warnings import AODWarnings
+from assessment_episode_matcher.configs.matcher_config import MatcherConfig
 
 def get_drug_category(drug_name:str, aod_groupings:dict) -> tuple[str, int]:
   """
@@ -143,7 +145,7 @@ def get_typical_qty(item, field_names:dict[str, str], assessment)->  tuple[float
       field_value=f"Unexpected error: {str(e)}"
     )
 
-def process_drug_list_for_assessment(pdc_odc_colname:str, assessment, config:dict):
+def process_drug_list_for_assessment(pdc_odc_colname:str, assessment, config:MatcherConfig):
   """
   Process a list of drugs for an assessment, extracting information like drug names, 
   usage days, and typical quantities.
@@ -151,11 +153,12 @@ def process_drug_list_for_assessment(pdc_odc_colname:str, assessment, config:dic
   Args:
       pdc_odc_colname: Column name ('PDC' or 'ODC')
       assessment: Row from DataFrame containing drug information
-      config: Dictionary containing drug categories configuration
+      config: MatcherConfig (or the configuration dict) with the drug categories
       
   Returns:
       Tuple of (row_data, warnings)
   """
+  config = MatcherConfig.of(config)
   row_data = {}
   warnings = []
   
@@ -183,7 +186,6 @@ def process_drug_list_for_assessment(pdc_odc_colname:str, assessment, config:dic
     ))
     return row_data, warnings
     
-  drug_categories = config["drug_categories"]
   field_names = PDC_ODC_fields[pdc_odc_colname]
   field_drug_name = field_names['drug_name']
   field_use_ndays = field_names['used_in_last_4wks']
@@ -201,7 +203,7 @@ def process_drug_list_for_assessment(pdc_odc_colname:str, assessment, config:dic
 
     try:
       # Map drug to category
-      mapped_drug, found_category = get_drug_category(substance, aod_groupings=drug_categories)
+      mapped_drug, found_category = config.get_drug_category(substance)
       
       # Handle unmapped drugs
       if not found_category:
@@ -261,22 +263,23 @@ def process_drug_list_for_assessment(pdc_odc_colname:str, assessment, config:dic
 
   return row_data, warnings
 
-def normalize_pdc_odc(df:pd.DataFrame, config:dict):
+def normalize_pdc_odc(df:pd.DataFrame, config:MatcherConfig):
   """
   Normalize PDC (Principal Drug of Concern) and ODC (Other Drugs of Concern) data from a DataFrame.
   
   Args:
       df: DataFrame containing PDC and/or ODC columns
-      config: Dictionary containing drug categories configuration
+      config: MatcherConfig (or the configuration dict) with the drug categories
       
   Returns:
       Tuple of (expanded_data, warnings)
   """
   if df.empty:
-    return pd.DataFrame(index=df.index), []
+    return pd.DataFrame(index=df.index), AODWarnings()
+  config = MatcherConfig.of(config)
     
   new_data = []
-  warnings = []
+  warnings = AODWarnings()
   
   for index, row in df.iterrows():
     row_data = {}
@@ -290,13 +293,13 @@ def normalize_pdc_odc(df:pd.DataFrame, config:dict):
         if warnings1:
           warnings.extend(warnings1)
       except Exception as e:
-        warnings.append(AODWarning(
+        warnings.add(
           row.get('SLK', ''),
           row.get('RowKey', ''),
           drug_name='',
           field_name='PDC',
           field_value=f"Error processing PDC: {str(e)}"
-        ))
+        )
     
     # Process ODC (Other Drugs of Concern)
     if 'ODC' in row and isinstance(row['ODC'], list) and row['ODC']:
@@ -305,13 +308,13 @@ def normalize_pdc_odc(df:pd.DataFrame, config:dict):
         if warnings2:
           warnings.extend(warnings2)
       except Exception as e:
-        warnings.append(AODWarning(
+        warnings.add(
           row.get('SLK', ''),
           row.get('RowKey', ''),
           drug_name='',
           field_name='ODC',
           field_value=f"Error processing ODC: {str(e)}"
-        ))
+        )
     
     # Combine PDC and ODC data
     row_data = pdc_row_data | odc_row_data
@@ -516,20 +519,20 @@ def convert_new_to_old_structure(df: pd.DataFrame) -> pd.DataFrame:
         # Return empty DataFrame if any error occurs
         return pd.DataFrame()
 
-def expand_drug_info(df1: pd.DataFrame, config: dict) -> tuple[pd.DataFrame, list[AODWarning]]:
+def expand_drug_info(df1: pd.DataFrame, config: MatcherConfig) -> tuple[pd.DataFrame, AODWarnings]:
     """
     Expand drug information handling mixed structures efficiently.
     
     Args:
         df1: DataFrame containing drug information in either new or old structure
-        config: Dictionary containing drug categories configuration
+        config: MatcherConfig (or the configuration dict) with the drug categories
         
     Returns:
         Tuple of (final_df, all_warnings)
     """
     # Handle empty DataFrame
     if df1.empty:
-        return pd.DataFrame(), []
+        return pd.DataFrame(), AODWarnings()
         
     try:
         # Create structure masks
@@ -541,7 +544,7 @@ def expand_drug_info(df1: pd.DataFrame, config: dict) -> tuple[pd.DataFrame, lis
         
         # Process each structure type
         results = []
-        all_warnings = []
+        all_warnings = AODWarnings()
         
         # Process old structure (PDC/ODC)
         if not df_old.empty:
@@ -551,13 +554,13 @@ def expand_drug_info(df1: pd.DataFrame, config: dict) -> tuple[pd.DataFrame, lis
                 all_warnings.extend(warnings_old)
             except Exception as e:
                 # Add warning for processing error
-                all_warnings.append(AODWarning(
+                all_warnings.add(
                     '',  # No specific SLK
                     '',  # No specific RowKey
                     drug_name='',
                     field_name='old_structure',
                     field_value=f"Error processing old structure: {str(e)}"
-                ))
+                )
         
         # Process new structure (DrugsOfConcernDetails)
         if not df_new.empty:
@@ -568,27 +571,18 @@ def expand_drug_info(df1: pd.DataFrame, config: dict) -> tuple[pd.DataFrame, lis
                 all_warnings.extend(warnings_new)
             except Exception as e:
                 # Add warning for processing error
-                all_warnings.append(AODWarning(
+                all_warnings.add(
                     '',  # No specific SLK
                     '',  # No specific RowKey
                     drug_name='',
                     field_name='new_structure',
                     field_value=f"Error processing new structure: {str(e)}"
-                ))
+                )
         
         # Handle invalid rows (neither new nor old structure)
         invalid_mask = ~(new_mask | old_mask)
-        if invalid_mask.any():
-            invalid_rows = df1[invalid_mask]
-            for idx, row in invalid_rows.iterrows():
-                warning = AODWarning(
-                    row.get('SLK', ''),
-                    row.get('RowKey', ''),
-                    drug_name='',
-                    field_name='structure',
-                    field_value='Invalid structure - missing required fields'
-                )
-                all_warnings.append(warning)
+        all_warnings.extend_masked(df1, invalid_mask, field_name='structure'
+                                   , field_value='Invalid structure - missing required fields')
         
         # Combine results maintaining original index order
         if results:
@@ -599,13 +593,13 @@ def expand_drug_info(df1: pd.DataFrame, config: dict) -> tuple[pd.DataFrame, lis
             except Exception as e:
                 # If concatenation fails, create empty DataFrame with same index
                 combined_df = pd.DataFrame(index=df1.index)
-                all_warnings.append(AODWarning(
+                all_warnings.add(
                     '',  # No specific SLK
                     '',  # No specific RowKey
                     drug_name='',
                     field_name='concat',
                     field_value=f"Error combining results: {str(e)}"
-                ))
+                )
         else:
             combined_df = pd.DataFrame(index=df1.index)
         
@@ -618,25 +612,27 @@ def expand_drug_info(df1: pd.DataFrame, config: dict) -> tuple[pd.DataFrame, lis
         except Exception as e:
             # If join fails, return original DataFrame without drug columns
             final_df = drop_fields(df1.copy(), ['PDC', 'ODC', 'DrugsOfConcernDetails', 'PDCSubstanceOrGambling'])
-            all_warnings.append(AODWarning(
+            all_warnings.add(
                 '',  # No specific SLK
                 '',  # No specific RowKey
                 drug_name='',
                 field_name='join',
                 field_value=f"Error joining results: {str(e)}"
-            ))
+            )
         
         return final_df, all_warnings
         
     except Exception as e:
         # Catch-all for any unexpected errors
-        return df1.copy(), [AODWarning(
+        unexpected = AODWarnings()
+        unexpected.add(
             '',  # No specific SLK
             '',  # No specific RowKey
             drug_name='',
             field_name='expand_drug_info',
             field_value=f"Unexpected error: {str(e)}"
-        )]
+        )
+        return df1.copy(), unexpected
 
 if __name__ == "__main__":
     # Sample config
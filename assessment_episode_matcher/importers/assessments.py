@@ -1,11 +1,16 @@
 import logging
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
 import pandas as pd
 from assessment_episode_matcher.importers.main import FileSource
 from assessment_episode_matcher.utils import io
 from assessment_episode_matcher.mytypes import Purpose
+from assessment_episode_matcher.configs.matcher_config import MatcherConfig
 from assessment_episode_matcher.utils.df_ops_base import has_data
+from assessment_episode_matcher.profiling import profiled
+
+if TYPE_CHECKING:
+  from assessment_episode_matcher.client_index import ClientIndexStore
 
 
 def filter_by_purpose(df:pd.DataFrame, filters:dict|None) -> pd.DataFrame:
@@ -15,17 +20,23 @@ def filter_by_purpose(df:pd.DataFrame, filters:dict|None) -> pd.DataFrame:
 
 
 
+@profiled
 def import_data(asmt_st:str, asmt_end:str
                 , file_source:FileSource
                 , prefix:str, suffix:str
-                ,purpose:Purpose, config:dict
+                ,purpose:Purpose, config:MatcherConfig
                 , only_for_slks:Optional[list[str]]
                 , refresh:bool=True
+                , client_index:Optional["ClientIndexStore"]=None
                 ) -> tuple[pd.DataFrame, str|None]:
   
   """
     Returns 2 values - the 2nd is a path to the cached to
 
+    0. only_for_slks + client_index: the clients' ATOMs from the index, if it was written
+       by a run for a period covering this one (nothing to cache);
+       the clients it doesn't have are fetched from the source DB.
+
     1. If processed file for the period exists:
         if asking to be refreshed, go to #2
         else return file
@@ -42,15 +53,26 @@ def import_data(asmt_st:str, asmt_end:str
 
   """
 
-  purpose_programs = config.get("purpose_programs") # data_config.ATOM_DB_filters[purpose]
-  if not (purpose_programs and purpose.name in purpose_programs):
-     raise KeyError(f"Missing configurtion for {purpose} programs ")
-  filters = { "lists":{
-                  'Program' : list(purpose_programs.get(purpose.name)) 
-                 }
-            }
+  filters = { "lists": MatcherConfig.of(config).program_filters(purpose.name) }
   if only_for_slks:
     filters['lists']['PartitionKey'] = only_for_slks
+    if client_index:
+      indexed, missing = client_index.lookup_for_period(
+                            only_for_slks, asmt_st, asmt_end, artifact='atoms'
+                            , config_version=MatcherConfig.of(config).version_hash)
+      indexed = filter_by_purpose(indexed, filters['lists']) if has_data(indexed) else indexed
+      if len(missing) < len(only_for_slks):
+        logging.debug(f"ATOMs of {len(only_for_slks) - len(missing)} clients from the client index"
+                      f", {len(missing)} from the source.")
+        if not missing:
+          return indexed, None
+        filters['lists']['PartitionKey'] = missing
+        fetched = io.get_from_source(prefix, int(asmt_st), int(asmt_end), filters=filters)
+        if not has_data(fetched):
+          return indexed, None
+        fetched = io.process_assment(fetched)
+        return (pd.concat([indexed, fetched], ignore_index=True) if has_data(indexed)
+                else fetched), None
   
   #1.  if raw parquet exists, process and send back (if doesnt need refresh)
   file_path, best_start_date, best_end_date = \
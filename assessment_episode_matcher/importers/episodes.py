@@ -1,10 +1,12 @@
 import logging
 import pandas as pd
 from assessment_episode_matcher.configs import episodes as EpCfg
+from assessment_episode_matcher.configs.matcher_config import MatcherConfig
 from assessment_episode_matcher.importers.main import FileSource
 from assessment_episode_matcher.utils.dtypes import blank_to_today_str, convert_to_datetime
 from assessment_episode_matcher.utils.df_ops_base import has_data
 from assessment_episode_matcher.utils import io
+from assessment_episode_matcher.profiling import profiled
 # from assessment_episode_matcher.setup.bootstrap import Bootstrap
 
 # from utils.io import read_parquet, write_parquet
@@ -18,14 +20,14 @@ def get_cols_of_interest(df_columns) -> list[str]:
   return cols
   
 
-def prepare(ep_df1:pd.DataFrame, config) -> pd.DataFrame:
+def prepare(ep_df1:pd.DataFrame, config:MatcherConfig) -> pd.DataFrame:
   # processed_folder = Bootstrap.get_path("processed_dir")
   cols = get_cols_of_interest(ep_df1.columns)
   ep_df = ep_df1[cols].copy()
-  map_establishmentID_program = config.get("EstablishmentID_Program")
-  if not map_establishmentID_program:
+  config = MatcherConfig.of(config)
+  if not config.establishment_programs:
     raise Exception( " No Establishment ID - program mapping in configuration")
-  ep_df['Program'] = ep_df['ESTABLISHMENT IDENTIFIER'].map(map_establishmentID_program)
+  ep_df['Program'] = config.map_programs(ep_df['ESTABLISHMENT IDENTIFIER'])
   
 #  convert_to_datetime(atom_df['AssessmentDate'], format='%Y%m%d')
   ep_df[EpCfg.date_cols[0]] = convert_to_datetime(ep_df[EpCfg.date_cols[0]],  format='%d%m%Y'
@@ -44,8 +46,9 @@ def prepare(ep_df1:pd.DataFrame, config) -> pd.DataFrame:
 
 
 
+@profiled
 def import_data(eps_st:str,  eps_end:str, file_source:FileSource
-                    , prefix:str, suffix:str, config:dict) -> tuple  [pd.DataFrame, str|None]:
+                    , prefix:str, suffix:str, config:MatcherConfig) -> tuple  [pd.DataFrame, str|None]:
                 
                  
   """
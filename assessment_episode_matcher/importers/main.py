@@ -1,9 +1,12 @@
 import os
 from abc import ABC, abstractmethod
 import json
+from typing import Optional, TYPE_CHECKING
 import pandas as pd
 
-from assessment_episode_matcher.azutil.az_blob_query import AzureBlobQuery
+if TYPE_CHECKING:
+    # (the Azure SDK is only imported when a blob source is created)
+    from assessment_episode_matcher.azutil.az_blob_query import AzureBlobQuery
 
 class FileSource(ABC):
     def __init__(self, path: str):
@@ -18,8 +21,14 @@ class FileSource(ABC):
         pass
     
     @abstractmethod
-    def load_parquet_file_to_df(self, filepath: str) -> pd.DataFrame:
+    def load_parquet_file_to_df(self, filepath: str, columns: Optional[list[str]] = None) -> pd.DataFrame:
         pass
+
+    def get_version(self, filepath: str) -> Optional[str]:
+        """
+        Changes whenever the file's content does (e.g. a blob's ETag); None if unknown.
+        """
+        return None
     
     # def get_full_filepath(self) -> str:
         
@@ -41,13 +50,20 @@ class LocalFileSource(FileSource):
         else:
             raise FileNotFoundError(f"File not found: {full_path}")
 
-    def load_parquet_file_to_df(self, filepath: str) -> pd.DataFrame:
+    def load_parquet_file_to_df(self, filepath: str, columns: Optional[list[str]] = None) -> pd.DataFrame:
         full_path = os.path.join(self.path, filepath)
         if os.path.isfile(full_path):
-            return pd.read_parquet(full_path)
+            return pd.read_parquet(full_path, columns=columns)
         else:
             raise FileNotFoundError(f"File not found: {full_path}")
 
+    def get_version(self, filepath: str) -> Optional[str]:
+        full_path = os.path.join(self.path, filepath)
+        if not os.path.isfile(full_path):
+            return None
+        stat = os.stat(full_path)
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
 
     def load_json_file(self, filepath: str) -> pd.DataFrame:
         full_path = os.path.join(self.path, filepath)
@@ -61,9 +77,10 @@ class LocalFileSource(FileSource):
 
 class BlobFileSource(FileSource):
     
-    blobClient:AzureBlobQuery
+    blobClient:'AzureBlobQuery'
 
     def __init__(self, container_name: str, folder_path:str=""):
+        from assessment_episode_matcher.azutil.az_blob_query import AzureBlobQuery
         self.container_name = container_name
         self.folder_path = folder_path
         self.blobClient = AzureBlobQuery()
@@ -75,7 +92,7 @@ class BlobFileSource(FileSource):
         
         return files
     
-    def load_json_file(self, filename: str, dtype)-> dict:
+    def load_json_file(self, filename: str, dtype=None)-> dict:
         
         blob_bytes = self.blobClient.load_data(self.container_name,blob_url=filename)
         if blob_bytes:
@@ -94,11 +111,14 @@ class BlobFileSource(FileSource):
             raise ValueError(f"Failed to load blob data from URL: {filepath}")        
 
 
-    def load_parquet_file_to_df(self, filename: str) -> pd.DataFrame:
+    def load_parquet_file_to_df(self, filename: str, columns: Optional[list[str]] = None) -> pd.DataFrame:
         
         blob_bytes = self.blobClient.load_data(self.container_name, blob_url=filename)
         if blob_bytes:
-            return pd.read_parquet(blob_bytes)
+            return pd.read_parquet(blob_bytes, columns=columns)
         else:
             filepath = f"{self.container_name}/{filename}"
-            raise ValueError(f"Failed to load blob data from URL: {filepath}")  
\ No newline at end of file
+            raise ValueError(f"Failed to load blob data from URL: {filepath}")
+
+    def get_version(self, filename: str) -> Optional[str]:
+        return self.blobClient.get_etag(self.container_name, blob_url=filename)  
\ No newline at end of file
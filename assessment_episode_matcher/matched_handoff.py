@@ -0,0 +1,101 @@
+"""
+  The matched (reindexed) assessments handed from the matching step to the NADA export.
+
+  Written as typed parquet ({name}.parquet) plus a small manifest ({name}.manifest.json:
+  the data file, row count, columns and dtypes, which columns hold JSON), written last.
+  The NADA step reads the manifest instead of listing the folder, and only the columns it
+  needs from the parquet. A CSV copy ({name}.csv, all text) is only written if asked for.
+"""
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+from assessment_episode_matcher.version import __version__
+from assessment_episode_matcher.exporters.main import DataExporter
+from assessment_episode_matcher.importers.main import FileSource
+from assessment_episode_matcher.survey_store import get_mixed_json_columns, encode_for_store \
+                                                  , decode_from_store
+
+MANIFEST_SUFFIX = ".manifest.json"
+# the strings pd.read_csv reads as NaN by default (and blank)
+CSV_NA_VALUES = frozenset(["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan"
+                           , "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None"
+                           , "n/a", "nan", "null"])
+
+def write_matched(df:pd.DataFrame, exporter:DataExporter, data_name:str, suffix:str=""
+                  , csv_exporter:Optional[DataExporter]=None, csv_suffix:str="") -> dict:
+  """
+    data_name: e.g. NADA/20240101-20240331_reindexed
+    suffix/csv_suffix: the file extensions, for exporters whose data names include them (blobs)
+    csv_exporter: if set, also writes the human-readable CSV copy with it.
+    Returns the manifest.
+  """
+  json_columns = get_mixed_json_columns(df)
+  stored = encode_for_store(df, json_columns)
+  exporter.export_dataframe(data_name=f"{data_name}{suffix}", data=stored)
+  if csv_exporter:
+    csv_exporter.export_dataframe(data_name=f"{data_name}{csv_suffix}", data=df)
+
+  manifest = {
+    'format': 'parquet',
+    'data': f"{os.path.basename(data_name)}.parquet",
+    'num_rows': len(df),
+    'columns': {str(c): str(t) for c, t in df.dtypes.items()},
+    'json_columns': json_columns,
+    'written_at': datetime.now(timezone.utc).isoformat(),
+    'package_version': __version__,
+  }
+  exporter.export_bytes(f"{data_name}{MANIFEST_SUFFIX}", json.dumps(manifest, indent=2).encode('utf-8'))
+  return manifest
+
+
+def read_manifest(file_source:FileSource, name:str) -> Optional[dict]:
+  """
+    name: the data name relative to file_source's folder (e.g. NADA/20240101-20240331_reindexed)
+  """
+  try:
+    return file_source.load_json_file(f"{name}{MANIFEST_SUFFIX}")
+  except (FileNotFoundError, ValueError) as e:
+    logging.info(f"No matched-data manifest for {name} ({e})")
+    return None
+
+
+def read_matched(file_source:FileSource, name:str
+                 , columns:Optional[list[str]]=None) -> Optional[pd.DataFrame]:
+  """
+    The matched assessments written by write_matched (only the columns asked for, of those
+    it has), or None if there is no manifest for name.
+  """
+  manifest = read_manifest(file_source, name)
+  if manifest is None:
+    return None
+  if columns is not None:
+    columns = [c for c in manifest['columns'] if c in set(columns)]
+  # the manifest has the data file's name only: it is next to the manifest
+  folder = os.path.dirname(name)
+  data_path = f"{folder}/{manifest['data']}" if folder else manifest['data']
+  df = file_source.load_parquet_file_to_df(data_path, columns=columns)
+  df = decode_from_store(df, manifest.get('json_columns', []))
+  df.attrs = {}
+  if len(df) != manifest['num_rows']:
+    raise ValueError(f"{data_path}: {len(df)} rows, the manifest has {manifest['num_rows']}")
+  return df
+
+
+def as_exported_text(df:pd.DataFrame) -> pd.DataFrame:
+  """
+    The frame with each value as its text, as the NADA prep works on it (it was written for the
+    reindexed CSV read back with dtype=str): the same strings to_csv writes (dates as yyyy-mm-dd,
+    floats as repr), blanks, missing values and read_csv's NA strings ("NA", "null", ...) as NaN.
+    Converted column by column in memory, without writing or parsing a CSV.
+  """
+  text = {}
+  for col in df.columns:
+    values = df[col]
+    as_str = values.astype(str).astype(object)
+    text[col] = as_str.where(values.notna() & ~as_str.isin(CSV_NA_VALUES), np.nan)
+  return pd.DataFrame(text, index=df.index)
@@ -51,64 +51,63 @@ def date_boundary_validators(limit_days:int) -> list[ValidationMaskIssueTuple]:
   ]
 
 
-# Define matching functions
-def assessment_date_validator(gaps_df, mit_dict:ValidationMaskIssueTuple) ->\
-                                tuple[pd.DataFrame, pd.DataFrame]:
-  # Check if assessment date falls between commencement and end dates
-  invalid_mask_lambda = mit_dict.mask # ~((df["commencement_date"] <= df["assessment_date"]) & (df["assessment_date"] <= df["end_date"]))
-  if not invalid_mask_lambda:
-      return gaps_df, pd.DataFrame()
-  
-  ew_df = gaps_df[invalid_mask_lambda(gaps_df.copy())]
-
-  if not ut.has_data(ew_df):
-     return gaps_df, pd.DataFrame()
-
-  vi:ValidationIssue = mit_dict.validation_issue
-  ew_df = ew_df.assign(issue_type=vi.issue_type.name
-                       , issue_level=vi.issue_level.name
-                      )
-  # ew_df['issue_msg']  = validation_issue.msg
-
-  invalid_indices = ew_df.index.tolist()
-  remaining = gaps_df.drop(invalid_indices)
-
-  return remaining, ew_df
-
-
 def gap_asmtdate_epsd_boundaries(merged_df1:pd.DataFrame):
-  ad = dk.assessment_date.value
+  ad = pd.to_datetime(merged_df1[dk.assessment_date.value])
   merged_df = merged_df1.assign(
-     days_from_start=(merged_df1[ad] - merged_df1[dk.episode_start_date.value]).apply(lambda x: x.days) 
-    , days_from_end=( merged_df1[ad] - merged_df1[dk.episode_end_date.value]).apply(lambda x: x.days)
+     days_from_start=(ad - pd.to_datetime(merged_df1[dk.episode_start_date.value])).dt.days
+    , days_from_end=(ad - pd.to_datetime(merged_df1[dk.episode_end_date.value])).dt.days
     )
   return merged_df
 
 
 def keep_nearest_mismatching_episode(
       unmatched_asmt:pd.DataFrame) -> pd.DataFrame:
-   unm = unmatched_asmt.copy()
-   unm['min_days'] = np.minimum(
-                        np.abs(unm['days_from_start'])
-                        , np.abs(unm['days_from_end']))
-   ew_df = unm.sort_values(['SLK_RowKey', 'min_days'])
-   ew_df = ew_df.drop_duplicates('SLK_RowKey', keep='first')
-   return ew_df
+   """
+    The assessment's nearest episode (smallest min_days; the first one on a tie),
+    ordered by SLK_RowKey.
+   """
+   min_days = np.minimum(np.abs(unmatched_asmt['days_from_start'])
+                         , np.abs(unmatched_asmt['days_from_end']))
+   # (no gap - a missing date - is the farthest)
+   by_position = pd.Series(min_days.fillna(np.inf).to_numpy())
+   nearest_pos = by_position.groupby(unmatched_asmt['SLK_RowKey'].to_numpy(), dropna=False) \
+                            .idxmin().to_numpy()
+   return unmatched_asmt.iloc[nearest_pos].assign(min_days=min_days.iloc[nearest_pos])
+
+
+def classify_boundary_issues(gaps_df:pd.DataFrame
+                             , mask_isuetypes:list[ValidationMaskIssueTuple]) -> np.ndarray:
+  """
+    For each row, the position in mask_isuetypes of the first rule its gaps meet (-1 : none).
+  """
+  rules = [v.mask(gaps_df).to_numpy(dtype=bool) for v in mask_isuetypes]
+  return np.select(rules, np.arange(len(mask_isuetypes)), default=-1)
 
 
 def get_assessment_boundary_issues(
               dt_unmtch_asmt:pd.DataFrame
               , mask_isuetypes:list[ValidationMaskIssueTuple]) \
                       -> pd.DataFrame:
+    if not ut.has_data(dt_unmtch_asmt):
+      return pd.DataFrame()
+
     gaps_df = gap_asmtdate_epsd_boundaries(dt_unmtch_asmt)
-    nearest_remaining_mismatch = keep_nearest_mismatching_episode(gaps_df)
-    full_ew_df =  pd.DataFrame()
-    for v in mask_isuetypes:
-        nearest_remaining_mismatch, ew_df = assessment_date_validator(nearest_remaining_mismatch, v)        
-        if ut.has_data(ew_df):
-            full_ew_df = pd.concat([full_ew_df, ew_df], ignore_index=True)
-
-    if len(nearest_remaining_mismatch) > 0:
+    nearest_mismatch = keep_nearest_mismatching_episode(gaps_df)
+    rule = classify_boundary_issues(nearest_mismatch, mask_isuetypes)
+
+    if (rule < 0).any():
       logging.warn("matched_df should not have anything remaining.")
-    
+
+    # grouped by rule (in mask_isuetypes order), by SLK_RowKey within a rule
+    order = np.argsort(rule, kind='stable')
+    order = order[rule[order] >= 0]
+    if len(order) == 0:
+      return pd.DataFrame()
+
+    issues = [v.validation_issue for v in mask_isuetypes]
+    rule = rule[order]
+    full_ew_df = nearest_mismatch.iloc[order].reset_index(drop=True)
+    full_ew_df = full_ew_df.assign(
+        issue_type=np.array([vi.issue_type.name for vi in issues], dtype=object)[rule]
+      , issue_level=np.array([vi.issue_level.name for vi in issues], dtype=object)[rule])
     return full_ew_df
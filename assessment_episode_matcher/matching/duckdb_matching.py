@@ -0,0 +1,153 @@
+"""
+  DuckDB backend for the date-matching in matching.main (do_matches_slkprog / do_matches_slk).
+  Optional: needs the duckdb package (pip install assessment_episode_matcher[duckdb]).
+
+  Instead of merging the assessments and episodes in pandas and re-testing every row of the
+  merge at each slack level (increasing_slack), the join runs in-process in DuckDB, which gives
+  each (assessment, episode) pair the slack it needs and picks each assessment's
+  best episode(s) with window functions. Only the rows that are returned are materialised,
+  in the same layout/order/index that the pandas path produces.
+"""
+import importlib.util
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from assessment_episode_matcher.mytypes import DataKeys as dk
+import assessment_episode_matcher.utils.df_ops_base as utdf
+from assessment_episode_matcher.matching import increasing_slack as mis
+
+
+def is_available() -> bool:
+  # (duckdb itself is only imported when a match runs on it)
+  return importlib.util.find_spec('duckdb') is not None
+
+
+_pairs_sql = """
+  WITH merged AS (
+    SELECT a.a_pos, e.e_pos, a.asmt_key, a.Program AS a_program, e.Program AS e_program
+         , row_number() OVER (ORDER BY a.a_pos, e.e_pos) - 1 AS merged_pos
+         , CASE WHEN a.asmt_date IS NULL OR e.start_date IS NULL OR e.end_date IS NULL THEN NULL
+                ELSE greatest(0, date_diff('day', a.asmt_date, e.start_date)
+                               , date_diff('day', e.end_date, a.asmt_date))
+           END AS slack
+    FROM asmts a JOIN eps e ON {join_on}
+  ), candidates AS (
+    SELECT * FROM merged {where}
+  ), ranked AS (
+    SELECT *, min(slack) OVER (PARTITION BY asmt_key) AS min_slack
+    FROM candidates
+  )
+  SELECT a_pos, e_pos, merged_pos, slack, min_slack
+       , (slack = min_slack AND min_slack <= $max_slack) AS is_match
+       , count(*) FILTER (WHERE slack = min_slack) OVER (PARTITION BY asmt_key) AS n_best
+       , row_number() OVER (PARTITION BY asmt_key, slack = min_slack ORDER BY merged_pos) AS best_rank
+  FROM ranked
+  ORDER BY merged_pos
+"""
+
+
+def _relation(df:pd.DataFrame, pos_name:str, cols:dict[str, pd.Series]) -> pa.Table:
+  """
+    The columns as an Arrow table; the *_date columns typed date32, the others string.
+    (Inferred from the values, an empty or all-missing column would be Arrow's null type,
+     which DuckDB can't compare or take date_diff of.)
+  """
+  arrays = {pos_name: pa.array(np.arange(len(df), dtype=np.int64))}
+  for name, values in cols.items():
+    arrow_type = pa.date32() if name.endswith('_date') else pa.string()
+    arrays[name] = pa.array(values.to_numpy(dtype=object), type=arrow_type, from_pandas=True)
+  return pa.table(arrays)
+
+
+def _to_dates(values:pd.Series) -> pd.Series:
+  return pd.to_datetime(values).dt.date
+
+
+def get_match_pairs(as_df:pd.DataFrame, ep_df:pd.DataFrame, on:list[str]
+                    , max_slack:int, different_program:bool=False) -> pd.DataFrame:
+  """
+    One row per (assessment, episode) pair of the merge on the `on` columns, in pandas merge
+    order (merged_pos), with the slack (days) the pair needs and whether it is the
+    assessment's match (is_match), a tie (n_best > 1) and the first of its ties (best_rank).
+  """
+  asmts = _relation(as_df, 'a_pos', {
+              **{c: as_df[c].astype(str) for c in on if c != 'Program'},
+              'Program': as_df['Program'].astype(object),
+              'asmt_key': as_df[dk.assessment_id.value].astype(str),
+              'asmt_date': _to_dates(as_df[dk.assessment_date.value])})
+  eps = _relation(ep_df, 'e_pos', {
+              **{c: ep_df[c].astype(str) for c in on if c != 'Program'},
+              'Program': ep_df['Program'].astype(object),
+              'start_date': _to_dates(ep_df[dk.episode_start_date.value]),
+              'end_date': _to_dates(ep_df[dk.episode_end_date.value])})
+
+  join_on = " AND ".join(f'a."{c}" = e."{c}"' for c in on)
+  # SLK-only matching just retries where the programs differ (see do_matches_slk)
+  where = "WHERE a_program IS DISTINCT FROM e_program" if different_program else ""
+
+  import duckdb
+  con = duckdb.connect()
+  try:
+    con.register('asmts', asmts)
+    con.register('eps', eps)
+    pairs = con.execute(_pairs_sql.format(join_on=join_on, where=where)
+                        , {'max_slack': max_slack}).df()
+  finally:
+    con.close()
+  return pairs
+
+
+def materialize_merged(as_df:pd.DataFrame, ep_df:pd.DataFrame, on:list[str]
+                       , match_keys:list[str], a_pos, e_pos, index) -> pd.DataFrame:
+  """
+    The rows pd.merge(as_df, ep_df, on=on) (+ the match key) would have for the given pairs.
+  """
+  layout = pd.merge(as_df.iloc[:0], ep_df.iloc[:0], on=on)
+  overlap = (set(as_df.columns) & set(ep_df.columns)) - set(on)
+
+  left = as_df.iloc[a_pos].reset_index(drop=True) \
+                .rename(columns={c: f"{c}_x" for c in overlap})
+  right = ep_df.iloc[e_pos].drop(columns=on).reset_index(drop=True) \
+                .rename(columns={c: f"{c}_y" for c in overlap})
+  rows = pd.concat([left, right], axis=1)[layout.columns]
+  rows, _ = utdf.merge_keys_new_field(rows, match_keys)
+  rows.index = pd.Index(index)
+  return rows
+
+
+def match_dates_increasing_slack(as_df:pd.DataFrame, ep_df:pd.DataFrame
+                                 , on:list[str], match_keys:list[str]
+                                 , max_slack:int=7, different_program:bool=False) \
+                                  -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+  """
+    Same (result_matched_df, unmatched_asmt, duplicate_rows_dfs) as
+    increasing_slack.match_dates_increasing_slack on the merge of as_df and ep_df.
+  """
+  pairs = get_match_pairs(as_df, ep_df, on, max_slack, different_program)
+  if pairs.empty:
+    empty_merged = materialize_merged(as_df, ep_df, on, match_keys, [], [], [])
+    return mis.match_dates_increasing_slack(empty_merged, max_slack=max_slack)
+
+  is_match = pairs['is_match'].fillna(False).astype(bool)
+  matched = pairs[is_match].sort_values(['min_slack', 'merged_pos'], kind='stable')
+  # (increasing_slack concatenates each slack level's matches, then keeps an assessment's first)
+  matched = matched.assign(concat_pos=np.arange(len(matched)))
+  best = matched[matched['best_rank'] == 1]
+  dupes = matched[matched['n_best'] > 1]
+  unmatched_keys = ~(pairs['min_slack'] <= max_slack).fillna(False).astype(bool)
+  unmatched = pairs[unmatched_keys]
+
+  def rows(selected:pd.DataFrame, index) -> pd.DataFrame:
+    return materialize_merged(as_df, ep_df, on, match_keys
+                              , selected['a_pos'].to_numpy(), selected['e_pos'].to_numpy(), index)
+
+  result_matched_df = rows(best, best['concat_pos'].to_numpy()) if not best.empty \
+                        else pd.DataFrame().drop_duplicates(subset=[dk.assessment_id.value])
+  duplicate_rows_dfs = rows(dupes, np.arange(len(dupes))) if not dupes.empty else pd.DataFrame()
+  unmatched_asmt = rows(unmatched, unmatched['merged_pos'].to_numpy())
+
+  if len(unmatched_asmt) > 0:
+    logging.info(f"There are still {len(unmatched_asmt)} unmatched ATOMs")
+  return result_matched_df, unmatched_asmt, duplicate_rows_dfs
@@ -24,8 +24,8 @@ def key_matching_errwarn_names(merge_key: str, slk_prog_onlyin: pd.DataFrame, it
     # redundant
     if not slk_prog_onlyin.empty:
       if not slk_onlyin.empty:
-        slk_prog_onlyin1, _ = utdf.get_delta_by_key(
-            slk_prog_onlyin, slk_onlyin, key=merge_key)
+        slk_prog_onlyin1 = slk_prog_onlyin[utdf.get_key_masks(
+            slk_prog_onlyin, slk_onlyin, key=merge_key).left_only]
       else:
          slk_prog_onlyin1 = slk_prog_onlyin
       # mask_common = slk_prog_onlyin[matchkey2].isin(slk_onlyin[matchkey2])
@@ -137,8 +137,9 @@ def process_errors_warnings(ew:dict, warning_asmt_ids, merge_key2:str
 
 def write_validation_results(errors_warnings:dict[str, pd.DataFrame]
                              , audit_exporter: DataExporter):
-    
-    for ew_type_name, errs_warns in errors_warnings.items():
-      if utdf.has_data(errs_warns):
-        audit_exporter.export_dataframe(f"{ew_type_name}.csv", errs_warns)       
+    # the audit files are uploaded concurrently
+    items = {f"{ew_type_name}.csv": errs_warns
+             for ew_type_name, errs_warns in errors_warnings.items()
+             if utdf.has_data(errs_warns)}
+    return audit_exporter.export_many(items)
        
@@ -40,25 +40,13 @@ def match_dates_increasing_slack(
       # Get matched assessments with the current slack
       matched_df = match_with_dates(unmatched_asmt, matching_ndays_slack)
       
-      #one Assessment matching to multiple episodes    
-      duplicate_rows_df = get_dupes_by_key(matched_df, asmt_key)
-
-                                          #  'SLK_Program_y')
-      # y because during the merge , assmt df is on the right (so not x)
-      # this checks if there ATOMs matching to multiple episodes
-
-      if has_data(duplicate_rows_df):
-        #logging.error("Duplicate rows", duplicate_rows_df)
-        duplicate_rows_dfs = pd.concat([duplicate_rows_dfs, duplicate_rows_df] , ignore_index=True)
-        #TODO: remove duplicates from from matched_df ? is that what the below is doing ? : result_matched_df.drop_duplicates(subset=[asmt_key])
-
-      if len(matched_df) == 0: # no more SLK+Program matches between Episode and ATOM
-         break
-      
-      # Add the matched DataFrame to the list
-      result_matched_dfs.append(matched_df)
-      # remove from unmatched, any that matched in this iteration.
-      unmatched_asmt = unmatched_asmt[~unmatched_asmt[asmt_key].isin(matched_df[asmt_key])]
+      # nothing matching at this slack doesn't mean nothing will with more slack:
+      # keep going, so an assessment's match doesn't depend on the other clients in the run
+      if len(matched_df) > 0:
+        # Add the matched DataFrame to the list
+        result_matched_dfs.append(matched_df)
+        # remove from unmatched, any that matched in this iteration.
+        unmatched_asmt = unmatched_asmt[~unmatched_asmt[asmt_key].isin(matched_df[asmt_key])]
 
       ## there may be other assessments for this SLK that can match if the slack dways are increased
       ## don't exclude the SLK, but the SLK +RowKey
@@ -76,6 +64,14 @@ def match_dates_increasing_slack(
   # Concatenate all matched DataFrames from the list
   if result_matched_dfs:
     result_matched_df = pd.concat(result_matched_dfs, ignore_index=True)
+
+  # one Assessment matching to multiple episodes.
+  # An assessment only matches at one slack level (it is out of unmatched_asmt after that),
+  # so its duplicates in the concatenated matches are the ones at that level,
+  # and they come in slack order.
+  duplicate_rows_df = get_dupes_by_key(result_matched_df, asmt_key)
+  if has_data(duplicate_rows_df):
+    duplicate_rows_dfs = duplicate_rows_df.reset_index(drop=True)
   
   # add_to_issue_report(unmatched_by_date, IssueType.DATE_MISMATCH, IssueLevel.ERROR)
   # mask_matched_eps = ep_asmt_merged_df.PMSEpisodeID.isin(result_matched_df.PMSEpisodeID)
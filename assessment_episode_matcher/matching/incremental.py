@@ -0,0 +1,193 @@
+"""
+  Incremental re-matching.
+  A client's (SLK's) matches and issues only depend on that client's episodes and assessments,
+  so a run only needs to rematch the clients whose rows have changed since the last run.
+  The match state (a fingerprint of each client's input rows, plus final_good and the
+  errors/warnings frames) is kept as parquet; the rematched clients' results are spliced into it.
+"""
+import logging
+from datetime import date
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+from assessment_episode_matcher.configs.matcher_config import MatcherConfig
+from assessment_episode_matcher.exporters.main import DataExporter, ParquetExporter, AzureBlobExporter
+from assessment_episode_matcher.importers.main import FileSource, LocalFileSource, BlobFileSource
+from assessment_episode_matcher.matching.main import match_and_get_issues
+import assessment_episode_matcher.utils.df_ops_base as utdf
+from assessment_episode_matcher.profiling import profiled
+
+ew_names = ['slk_onlyinass', 'slk_onlyin_ep', 'slk_prog_onlyinass'
+            , 'slk_prog_onlyin_ep', 'dates_ewdf', 'dates_ewdf2']
+
+
+def client_fingerprints(inputs:list[pd.DataFrame]) -> pd.Series:
+  """
+    SLK -> a hash of all the client's rows across the inputs (independent of row order).
+  """
+  per_input = []
+  for i, df in enumerate(inputs):
+    if not utdf.has_data(df):
+      continue
+    # the input a row came from is part of the client's state as well
+    rows = df[sorted(df.columns)].astype(str).assign(_input=str(i))
+    row_hashes = pd.util.hash_pandas_object(rows, index=False)
+    per_input.append(row_hashes.groupby(df['SLK'].to_numpy()).sum())
+
+  if not per_input:
+    return pd.Series(dtype='uint64', name='fingerprint')
+  # (uint64 sums wrap around, which is fine for a fingerprint)
+  return pd.concat(per_input).groupby(level=0).sum().rename('fingerprint')
+
+
+def get_run_params(slack_for_matching:int, reporting_start:date, reporting_end:date
+                   , config:Optional[MatcherConfig]) -> dict[str, str]:
+  """
+    A change in any of these means every client has to be rematched.
+  """
+  return {
+    'slack_for_matching': str(slack_for_matching),
+    'reporting_start': str(pd.to_datetime(reporting_start).date()),
+    'reporting_end': str(pd.to_datetime(reporting_end).date()),
+    'get_nearest_slk': str(int(MatcherConfig.of(config).get_nearest_slk)),
+  }
+
+
+class MatchState(object):
+
+  def __init__(self, fingerprints:pd.Series, params:dict[str, str]
+               , final_good:pd.DataFrame, ew:dict[str, pd.DataFrame]) -> None:
+    self.fingerprints = fingerprints
+    self.params = params
+    self.final_good = final_good
+    self.ew = ew
+
+
+class MatchStateStore(object):
+  """
+    Reads/writes a MatchState as parquet files: {name}_fingerprints, {name}_final_good, {name}_<ew name>.
+    load_prefix: path prefix for file_source, export_prefix/export_suffix: data_name parts for exporter
+  """
+
+  def __init__(self, file_source:FileSource, exporter:DataExporter
+               , load_prefix:str, export_prefix:str, export_suffix:str="") -> None:
+    self.file_source = file_source
+    self.exporter = exporter
+    self.load_prefix = load_prefix
+    self.export_prefix = export_prefix
+    self.export_suffix = export_suffix
+
+  def _load(self, part:str) -> pd.DataFrame:
+    return self.file_source.load_parquet_file_to_df(f"{self.load_prefix}{part}.parquet")
+
+  def _save(self, part:str, data:pd.DataFrame):
+    self.exporter.export_dataframe(data_name=f"{self.export_prefix}{part}{self.export_suffix}"
+                                   , data=data)
+
+  def load(self) -> Optional[MatchState]:
+    try:
+      fp_df = self._load("fingerprints")
+      final_good = self._load("final_good")
+      ew = {name: self._load(name) for name in ew_names}
+    except (FileNotFoundError, ValueError) as e:
+      logging.info(f"No match state found at {self.load_prefix}* ({e})")
+      return None
+
+    fingerprints = fp_df.set_index('SLK')['fingerprint']
+    return MatchState(fingerprints, dict(fp_df.attrs.get('params', {})), final_good, ew)
+
+  def save(self, state:MatchState):
+    fp_df = state.fingerprints.rename_axis('SLK').reset_index()
+    fp_df.attrs['params'] = state.params
+    self._save("fingerprints", fp_df)
+    self._save("final_good", state.final_good)
+    for name in ew_names:
+      self._save(name, state.ew[name])
+    logging.info(f"Saved match state for {len(fp_df)} clients.")
+
+
+def get_dirty_clients(fingerprints:pd.Series, previous:MatchState) -> set[str]:
+  """
+    Clients that are new, have changed or are gone since the previous state.
+  """
+  both = pd.concat([fingerprints.rename('now'), previous.fingerprints.rename('before')], axis=1)
+  changed = both['now'].ne(both['before']) # (NaN on either side -> changed)
+  return set(both.index[changed])
+
+
+def _without_clients(df:pd.DataFrame, slks:set[str]) -> pd.DataFrame:
+  if not utdf.has_data(df) or 'SLK' not in df.columns:
+    return df
+  return df[~df['SLK'].isin(slks)]
+
+
+def _only_clients(df:pd.DataFrame, slks:set[str]) -> pd.DataFrame:
+  if not utdf.has_data(df) or 'SLK' not in df.columns:
+    return df
+  return df[df['SLK'].isin(slks)]
+
+
+def splice(kept:pd.DataFrame, rematched:pd.DataFrame) -> pd.DataFrame:
+  if not utdf.has_data(kept):
+    return rematched
+  if not utdf.has_data(rematched):
+    return kept
+  return pd.concat([kept, rematched], ignore_index=True)
+
+
+@profiled
+def match_and_get_issues_incremental(e_df, a_df
+                         , inperiod_atomslk_notin_ep
+                         , inperiod_epslk_notin_atom
+                         , slack_for_matching
+                         , reporting_start:date, reporting_end:date
+                         , state_store:MatchStateStore
+                         , config:Optional[MatcherConfig]=None) -> tuple[pd.DataFrame, dict[str, pd.DataFrame]]:
+    """
+      Same results as matching.main.match_and_get_issues (row order aside), but only the
+      clients whose episode/assessment rows differ from the stored state are rematched.
+      The state is updated with the results.
+    """
+    config = MatcherConfig.of(config)
+    inputs = [e_df, a_df, inperiod_atomslk_notin_ep, inperiod_epslk_notin_atom]
+    fingerprints = client_fingerprints(inputs)
+    params = get_run_params(slack_for_matching, reporting_start, reporting_end, config)
+
+    previous = state_store.load()
+    if previous is None or previous.params != params:
+      logging.info("Incremental matching: no usable match state, matching all clients.")
+      final_good, ew = match_and_get_issues(*inputs, slack_for_matching
+                                            , reporting_start, reporting_end, config)
+      state_store.save(MatchState(fingerprints, params, final_good, ew))
+      return final_good, ew
+
+    dirty = get_dirty_clients(fingerprints, previous)
+    logging.info(f"Incremental matching: rematching {len(dirty)} of {len(fingerprints)} clients.")
+    if not dirty:
+      return previous.final_good, previous.ew
+
+    rematched_good, rematched_ew = match_and_get_issues(
+                                      *[_only_clients(df, dirty) for df in inputs]
+                                      , slack_for_matching
+                                      , reporting_start, reporting_end, config)
+
+    final_good = splice(_without_clients(previous.final_good, dirty), rematched_good)
+    ew = {name: splice(_without_clients(previous.ew[name], dirty), rematched_ew[name])
+          for name in ew_names}
+
+    state_store.save(MatchState(fingerprints, params, final_good, ew))
+    return final_good, ew
+
+
+def get_local_match_state_store(folder:str, name:str="match_state") -> MatchStateStore:
+  exporter = ParquetExporter({"location": f"{folder.rstrip('/')}/"})
+  return MatchStateStore(LocalFileSource(folder), exporter
+                         , load_prefix=f"{name}_", export_prefix=f"{name}_")
+
+
+def get_blob_match_state_store(container_name:str
+                               , folder:str="match_state", name:str="match_state") -> MatchStateStore:
+  prefix = f"{folder}/{name}_"
+  return MatchStateStore(BlobFileSource(container_name), AzureBlobExporter(container_name)
+                         , load_prefix=prefix, export_prefix=prefix, export_suffix=".parquet")
@@ -1,19 +1,26 @@
 import logging
 import json
 from datetime import date
+from typing import Optional
 import pandas as pd
 from assessment_episode_matcher.mytypes import DataKeys as dk, IssueLevel, IssueType
 # from utils.environment import MyEnvironmentConfig, ConfigKeys
 import assessment_episode_matcher.utils.df_ops_base as utdf
-from assessment_episode_matcher.utils import base as utbase
 from assessment_episode_matcher.utils import fromstr as utstr
 import assessment_episode_matcher.matching.date_checks as dtchk
 from assessment_episode_matcher.matching import increasing_slack as mis
-from assessment_episode_matcher.configs.constants import MatchingConstants
+from assessment_episode_matcher.matching import duckdb_matching
+from assessment_episode_matcher.configs.matcher_config import MatcherConfig
+from assessment_episode_matcher.setup.log_management import lazy, log_event
+from assessment_episode_matcher.profiling import profiled
 
 # from assessment_episode_matcher.setup.bootstrap import Bootstrap
 SLK_MATCH_THRESHOLD = 0.75
+# values for MatcherConfig.matching_backend
+MATCHING_BACKEND_PANDAS = 'pandas'
+MATCHING_BACKEND_DUCKDB = 'duckdb'
 
+@profiled
 def get_data_for_matching2(episode_df, atom_df, start_date:date
                            , end_date:date, slack_for_matching) \
               -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
@@ -25,8 +32,7 @@ def get_data_for_matching2(episode_df, atom_df, start_date:date
     # SLK_RowKey
   a_df, _ = utdf.merge_keys_new_field(
       a_df, [dk.client_id.value, dk.per_client_asmt_id.value])
-  print("filtered ATOMs shape ", a_df.shape)
-  print("filtered Episodes shape ", e_df.shape)
+  log_event("filtered_for_matching", atoms_shape=a_df.shape, episodes_shape=e_df.shape)
   return a_df, e_df, inperiod_atomslk_notin_ep, inperiod_epslk_notin_atom
 
 
@@ -148,10 +154,9 @@ def setup_df_for_check(episode_df: pd.DataFrame, \
                           k_tup:list[str]) -> \
                           tuple[pd.DataFrame, pd.DataFrame, str]:
  
-    # Get unique SLKs from episode and assessment dataframes
-    # fixme: is a copy necessary?
-    ep_df = episode_df.copy()
-    as_df = assessment_df.copy()    
+    # single key: no copy - the frames are only filtered from here on,
+    # and their (cached) key indexes can be reused.
+    ep_df, as_df = episode_df, assessment_df
 
     if len(k_tup) > 1:
         ep_df, key = utdf.merge_keys_new_field(episode_df, k_tup)
@@ -167,18 +172,17 @@ def merge_check_keys(episode_df: pd.DataFrame, assessment_df: pd.DataFrame, k_tu
     
     epdf_mkey, asdf_mkey, key = setup_df_for_check(episode_df,assessment_df, k_tup)
     
-    only_in_ep, only_in_as, in_both = utbase.check_if_exists_in_other(
-       set(epdf_mkey[key]),   set(asdf_mkey[key])
-    )
-    if only_in_as:  #len(assessment_df[asdf_mkey[key].isin(only_in_as)] )
-      logging.info(f" (mergkey:{key}) only in assessment: {len(only_in_as)}")
-    if only_in_ep: # len(episode_df[epdf_mkey[key].isin(only_in_ep)])
-      logging.info(f"(mergkey:{key})  only in episode  {len(only_in_ep)}")
-
-    return   epdf_mkey[epdf_mkey[key].isin(only_in_ep)] \
-                 , asdf_mkey[asdf_mkey[key].isin(only_in_as)] \
-                 , epdf_mkey[epdf_mkey[key].isin(in_both)]\
-                 , asdf_mkey[asdf_mkey[key].isin(in_both)], \
+    masks = utdf.get_key_masks(epdf_mkey, asdf_mkey, key)
+    only_in_ep, only_in_as = epdf_mkey[masks.left_only], asdf_mkey[masks.right_only]
+    if not only_in_as.empty:
+      logging.info("(mergkey:%s) only in assessment: %s", key, lazy(only_in_as[key].nunique))
+    if not only_in_ep.empty:
+      logging.info("(mergkey:%s) only in episode: %s", key, lazy(only_in_ep[key].nunique))
+
+    return   only_in_ep \
+                 , only_in_as \
+                 , epdf_mkey[masks.left_in_both]\
+                 , asdf_mkey[masks.right_in_both], \
                   key
 
 
@@ -207,6 +211,12 @@ def perform_date_matches(merged_df: pd.DataFrame, match_key:str, slack_ndays:int
     result_matched_df, dt_unmat_asmts, duplicate_rows_dfs = \
       mis.match_dates_increasing_slack (merged_df #,mergekeys_to_check
                                           , max_slack=slack_ndays)
+    return get_date_match_issues(result_matched_df, dt_unmat_asmts
+                                 , duplicate_rows_dfs, slack_ndays)
+
+
+def get_date_match_issues(result_matched_df: pd.DataFrame, dt_unmat_asmts: pd.DataFrame
+                          , duplicate_rows_dfs: pd.DataFrame, slack_ndays:int):
 
     mask_isuetype_map = dtchk.date_boundary_validators(limit_days=slack_ndays)
     # validation_issues, matched_df, invalid_indices =
@@ -230,6 +240,15 @@ def perform_date_matches(merged_df: pd.DataFrame, match_key:str, slack_ndays:int
     return  result_matched_df, final_dates_ewdf
 
 
+def use_duckdb(backend:str) -> bool:
+    if backend != MATCHING_BACKEND_DUCKDB:
+      return False
+    if not duckdb_matching.is_available():
+      logging.warning("duckdb matching backend requested, but duckdb is not installed: using pandas.")
+      return False
+    return True
+
+
 def filter_asmt_by_ep_programs(
         ep_df: pd.DataFrame, a_df:pd.DataFrame)\
             -> tuple[pd.DataFrame, pd.DataFrame]:
@@ -238,11 +257,8 @@ def filter_asmt_by_ep_programs(
     For instance, the assessments may have BEGAPATH which is no longer in operation 
     and won't have episodes, so no point trying to match/report program-mismatch errors.
   """
-  asm_invalid_progs, asm_epprog = utdf.get_delta_by_key(a_df
-                                                      , ep_df
-                                                      , key='Program'
-                                                      , common=True)
-  return asm_epprog, asm_invalid_progs
+  masks = utdf.get_key_masks(a_df, ep_df, key='Program')
+  return a_df[masks.left_in_both], a_df[masks.left_only]
   # ep_programs = ep_df['Program'].unique()
   # aprog_in_any_eprog =a_df['Program'].isin(ep_programs)
   # a_df_epprog = a_df[aprog_in_any_eprog]
@@ -276,12 +292,22 @@ def get_merged_for_matching(episode_df: pd.DataFrame
                                                         
 
 
-def do_matches_slkprog(a_ineprogs:pd.DataFrame, e_df:pd.DataFrame, slack_for_matching:int) \
+def do_matches_slkprog(a_ineprogs:pd.DataFrame, e_df:pd.DataFrame, slack_for_matching:int
+                       , backend:str=MATCHING_BACKEND_PANDAS) \
            -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     mkeys = ['SLK', 'Program']
+    match_keys = [dk.episode_id.value, dk.assessment_id.value]
+    if use_duckdb(backend):
+      slk_prog_onlyin_ep, slk_prog_onlyinass, ep_df_inboth, as_df_inboth, _ = \
+          merge_check_keys(e_df, a_ineprogs, k_tup=mkeys)
+      matched = duckdb_matching.match_dates_increasing_slack(
+          as_df_inboth, ep_df_inboth, on=mkeys, match_keys=match_keys, max_slack=slack_for_matching)
+      good_df, dates_ewdf = get_date_match_issues(*matched, slack_for_matching)
+      return good_df, dates_ewdf, slk_prog_onlyinass, slk_prog_onlyin_ep
+
     merged_df, merge_key, match_key, slk_prog_onlyinass, slk_prog_onlyin_ep = \
         get_merged_for_matching(e_df, a_ineprogs, mergekeys_to_check=mkeys
-                                , match_keys=[dk.episode_id.value, dk.assessment_id.value]
+                                , match_keys=match_keys
                                 )
     good_df, dates_ewdf = perform_date_matches(
         merged_df, match_key, slack_ndays=slack_for_matching)
@@ -290,18 +316,28 @@ def do_matches_slkprog(a_ineprogs:pd.DataFrame, e_df:pd.DataFrame, slack_for_mat
     return good_df, dates_ewdf, slk_prog_onlyinass, slk_prog_onlyin_ep 
     
 
-def do_matches_slk(not_matched_asmts_slkprog:pd.DataFrame, e_df:pd.DataFrame, slack_for_matching:int) \
+def do_matches_slk(not_matched_asmts_slkprog:pd.DataFrame, e_df:pd.DataFrame, slack_for_matching:int
+                   , backend:str=MATCHING_BACKEND_PANDAS) \
            -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, str]:
   
     # retry mismatching dates, with just SLK
     # (in case the assesssment was made in a program different to the episode program)
     mkeys = ['SLK']
+    match_keys = [dk.episode_id.value, dk.assessment_id.value]
+    if use_duckdb(backend):
+      _, slk_onlyinass, ep_df_inboth, as_df_inboth, merge_key2 = \
+          merge_check_keys(e_df, not_matched_asmts_slkprog, k_tup=mkeys)
+      matched = duckdb_matching.match_dates_increasing_slack(
+          as_df_inboth, ep_df_inboth, on=mkeys, match_keys=match_keys
+          , max_slack=slack_for_matching, different_program=True)
+      good_df2, dates_ewdf2 = get_date_match_issues(*matched, slack_for_matching)
+      return good_df2, dates_ewdf2, slk_onlyinass, merge_key2
 
     merged_df3, merge_key2 \
       , match_key3, slk_onlyinass, _ = get_merged_for_matching(
                       e_df, not_matched_asmts_slkprog
                       , mergekeys_to_check=mkeys
-                      , match_keys=[dk.episode_id.value, dk.assessment_id.value])
+                      , match_keys=match_keys)
     # try date-matching again, but only where the SLKs are same but the Programs are different
     merged_df4 = merged_df3[merged_df3['Program_x'] != merged_df3['Program_y']]
     good_df2, dates_ewdf2 = perform_date_matches(
@@ -335,9 +371,11 @@ def exclude_mismatched_dupe_assessments(slkprog_datematched:pd.DataFrame
     slk_datematched['Ep_AsDate'] = slk_datematched['SLK'] + \
                                 '_' + slk_datematched.PMSEpisodeID + \
                                     '_' + slk_datematched.PMSEpisodeID_SLK_RowKey.str[-8:]
-    slkprog_datematched['Ep_AsDate'] = slkprog_datematched['SLK'] + \
+    # (not added to slkprog_datematched itself: it goes on to the final results)
+    slkprog_datematched = slkprog_datematched.assign(
+                           Ep_AsDate=slkprog_datematched['SLK'] + \
                                        '_' + slkprog_datematched.PMSEpisodeID + \
-                                 '_' + slkprog_datematched.PMSEpisodeID_SLK_RowKey.str[-8:]
+                                 '_' + slkprog_datematched.PMSEpisodeID_SLK_RowKey.str[-8:])
    
     # keep only what is in slk_datematched
     slk_datematched_v2 = utdf.filter_out_common(slk_datematched, slkprog_datematched, key='Ep_AsDate')
@@ -363,7 +401,8 @@ def fix_incorrect_program( slk_datematched:pd.DataFrame) -> pd.DataFrame:
     # for matches based only on SLK, use the program information of the episode. log the changes
     logging.info(f"SLK-only based matched: ({len(slk_datematched)}.")
 
-    logging.info(f"Adding program information from matched episode : {_get_val_counts(slk_datematched)}")
+    logging.debug("Adding program information from matched episode : %s"
+                  , lazy(_get_val_counts, slk_datematched))
 
     slk_datematched['Program'] = slk_datematched['Program_y'] 
     
@@ -393,12 +432,13 @@ def filter_by_date (df:pd.DataFrame, reporting_start, reporting_end) -> pd.DataF
   return result
   
   
+@profiled
 def match_and_get_issues(e_df, a_df
                          , inperiod_atomslk_notin_ep
                          , inperiod_epslk_notin_atom
                          , slack_for_matching
                          , reporting_start:date, reporting_end:date
-                         , config:dict={}):
+                         , config:Optional[MatcherConfig]=None):
     """
       Perform Date Matching  - Assessment has to fall within Episode Start and End dates
       Steps: 
@@ -418,55 +458,68 @@ def match_and_get_issues(e_df, a_df
     reporting_start = pd.to_datetime(reporting_start).date()
     reporting_end = pd.to_datetime(reporting_end).date()
 
+    config = MatcherConfig.of(config)
+    backend = config.matching_backend
+
     # XXA this assumes Assessment's program is always Correct 
     slkprog_datematched, dates_ewdf \
     , slk_prog_onlyinass, slk_prog_onlyin_ep  = do_matches_slkprog(
                                                           a_df 
                                                           , e_df
                                                           , slack_for_matching
+                                                          , backend
                                                         )
     a_key = dk.assessment_id.value # SLK +RowKey
     # ATOMs that could not be date matched with episode, when merging on SLK+Program
     if not slkprog_datematched.empty:
-      unmatched_asmt_by_slkprog, _ = utdf.get_delta_by_key(a_df
-                                                         , slkprog_datematched
-                                                         , key=a_key)
+      unmatched_asmt_by_slkprog = a_df[utdf.get_key_masks(a_df
+                                                          , slkprog_datematched
+                                                          , key=a_key).left_only]
+    else:
+      unmatched_asmt_by_slkprog = a_df
     # unmatched_asmt_by_slkprog = utdf.filter_out_common(a_ineprogs, slkprog_datematched, a_key)      
-      if not unmatched_asmt_by_slkprog.empty:
-        slkonly_datematched, dates_ewdf2 \
-          , slk_onlyinass, merge_key2  = do_matches_slk(unmatched_asmt_by_slkprog 
-                                                                , e_df
-                                                                , slack_for_matching
-                                                                )
-
+    if not unmatched_asmt_by_slkprog.empty:
+      slkonly_datematched, dates_ewdf2 \
+        , slk_onlyinass, merge_key2  = do_matches_slk(unmatched_asmt_by_slkprog 
+                                                              , e_df
+                                                              , slack_for_matching
+                                                              , backend
+                                                              )
+      if slkonly_datematched.empty:
+        final_good = slkprog_datematched
+      elif slkprog_datematched.empty:
+        final_good = fix_incorrect_program(slkonly_datematched)
+      else:
         slkonly_datematched_v2 = exclude_mismatched_dupe_assessments(slkprog_datematched
                                                                     , slkonly_datematched)
         slkonly_datematched_v2 = fix_incorrect_program(slkonly_datematched_v2)
-        slk_onlyinass = pd.concat([slk_onlyinass, inperiod_atomslk_notin_ep])
-        
         final_good = pd.concat([slkprog_datematched, slkonly_datematched_v2])
-        filtered_slk_onlyinass = filter_by_date(slk_onlyinass, reporting_start, reporting_end)
-      else:
-        final_good = slkprog_datematched  # all were date matched with SLK+Prog key ! :)
-        slk_onlyinass = pd.DataFrame()
-        dates_ewdf2 = pd.DataFrame()
-        filtered_slk_onlyinass = pd.DataFrame()
     else:
-      final_good =  pd.DataFrame(columns=['SLK_RowKey'])
+      final_good = slkprog_datematched  # all were date matched with SLK+Prog key ! :)
       slk_onlyinass = pd.DataFrame()
       dates_ewdf2 = pd.DataFrame()
+
+    if final_good.empty:
+      final_good =  pd.DataFrame(columns=['SLK_RowKey'])
+    # in-period assessments of clients without an episode are reported, whether or not
+    # any of the other clients' assessments went unmatched
+    slk_onlyinass = pd.concat([slk_onlyinass, inperiod_atomslk_notin_ep])
+    if not slk_onlyinass.empty:
+      filtered_slk_onlyinass = filter_by_date(slk_onlyinass, reporting_start, reporting_end)
+    else:
       filtered_slk_onlyinass = pd.DataFrame()
 
     # can't use the result above (_)as we are only using the un-merged assesemtns (slk_prog_onlyinass) as input
-    slk_onlyin_ep, _ = utdf.get_delta_by_key(e_df, a_df, key='SLK')
+    # (e_df's SLK index is the one built for the SLK-only matching)
+    slk_onlyin_ep = e_df[utdf.get_key_masks(e_df, a_df, key='SLK').left_only]
     # slk_onlyin_ep = utdf.filter_out_common(e_df, a_ineprogs, key='SLK')
 
     # TODO: explain why these are two different things (pre date-matching vs post date-matching errors)
-    print("concating pre-match missing SLK errors of lengths :")
-    print(f"\n\t only-in-ATOM: {len(inperiod_atomslk_notin_ep)}  ; only in Episode: {len(inperiod_epslk_notin_atom)} ")    
+    log_event("prematch_missing_slk", only_in_atom=len(inperiod_atomslk_notin_ep)
+              , only_in_episode=len(inperiod_epslk_notin_atom))
     slk_onlyin_ep = pd.concat([slk_onlyin_ep, inperiod_epslk_notin_atom])
     
-    if config.get(MatchingConstants.GET_NEAREST_SLK, 0) == 1 and \
+    if config.get_nearest_slk and \
         not slk_onlyinass.empty and not slk_onlyin_ep.empty:
       slk_onlyinass_uq:pd.Series = pd.Series(slk_onlyinass.SLK.unique()) 
       slk_onlyinep_uq = slk_onlyin_ep.SLK.unique().tolist()
@@ -1,44 +1,144 @@
 import os
 import logging
+from contextlib import nullcontext
+from typing import Optional
 import pandas as pd
 
 from assessment_episode_matcher import project_directory
-from assessment_episode_matcher.configs import load_blob_config
+from assessment_episode_matcher.configs import load_matcher_config, MatcherConfig
+from assessment_episode_matcher.dataset_cache import dataset_cache as host_dataset_cache
 
 from assessment_episode_matcher.setup.bootstrap import Bootstrap
 from assessment_episode_matcher.utils.environment import ConfigKeys
-from assessment_episode_matcher.exporters.main import AzureBlobExporter
-from assessment_episode_matcher.data_prep import prep_dataframe_nada
+from assessment_episode_matcher.exporters.main import AzureBlobExporter, CSVChunkWriter
+from assessment_episode_matcher.data_prep import prep_nada_fields, prep_process_pool
+from assessment_episode_matcher.data_config import mulselect_option_to_nadafield, keep_parent_fields \
+                                                , nada_field_transforms, data_types
+from assessment_episode_matcher.exporters.config.NADAbase import notanswered_defaults, nada_final_fields
 from assessment_episode_matcher.exporters import NADAbase as nada_df_generator
 from assessment_episode_matcher.importers.main import  BlobFileSource
-from assessment_episode_matcher.mytypes import AODWarning, CSVTypeObject
+from assessment_episode_matcher.survey_store import ParsedSurveyStore, store_key
+from assessment_episode_matcher.matched_handoff import read_matched, as_exported_text
+from assessment_episode_matcher.aod_warnings import AODWarnings
 import assessment_episode_matcher.utils.df_ops_base as utdf
 import assessment_episode_matcher.importers.nada_indexed as io
+from assessment_episode_matcher.setup.log_management import lazy
+from assessment_episode_matcher.profiling import profiled
 
 
+@profiled
 def generate_nada_export(
-    matched_assessments:pd.DataFrame, config:dict) \
-        -> tuple[pd.DataFrame,list[AODWarning]]:
-    res, warnings_aod = prep_dataframe_nada(matched_assessments, config)
+    matched_assessments:pd.DataFrame, config:MatcherConfig
+    , survey_store:Optional[ParsedSurveyStore]=None
+    , workers:Optional[int]=None) \
+        -> tuple[pd.DataFrame, AODWarnings]:
+    """
+      workers: parse/expand the SurveyData in that many processes (data_prep.prep_nada_fields)
+    """
+    dataset_fields = None
+    if workers and workers > 1:
+      # as for the chunked export: a not-answered field missing from a whole chunk stays blank
+      dataset_fields = get_surveydata_fields_present(matched_assessments
+                                                     , get_notanswered_source_fields())
+    res, warnings_aod = prep_nada_fields(matched_assessments, config, ensure_columns=dataset_fields
+                                         , survey_store=survey_store, workers=workers)
 
     st = nada_df_generator.generate_finaloutput_df(res)        
     return st, warnings_aod
 
+
+def get_notanswered_source_fields() -> list[str]:
+  """
+    SurveyData fields the not-answered (-1) survey.txt columns are derived from.
+  """
+  derived_from = {nadafield: question.split('.')[0]
+                  for question, nadafields in mulselect_option_to_nadafield.items()
+                  for nadafield in nadafields}
+  return list(dict.fromkeys(derived_from.get(f, f) for f in notanswered_defaults))
+
+
+def get_nada_input_columns() -> list[str]:
+  """
+    The matched-assessment columns the NADA prep and survey.txt read
+    (the rest of the matching step's columns are not needed for the export).
+  """
+  multiselect_questions = [question.split('.')[0] for question in mulselect_option_to_nadafield]
+  numeric_fields = [k for k, v in data_types.items() if v == 'numeric']
+  return list(dict.fromkeys(['SurveyData', *store_key, 'ESTABLISHMENT IDENTIFIER'
+                             , *keep_parent_fields, *nada_final_fields, *nada_field_transforms
+                             , *mulselect_option_to_nadafield, *multiselect_questions
+                             , *numeric_fields]))
+
+
+def get_surveydata_fields_present(matched_assessments:pd.DataFrame
+                                  , fields:list[str]) -> list[str]:
+  """
+    Which of the fields are in at least one row's SurveyData (a text scan, no JSON parsing).
+  """
+  surveydata = matched_assessments['SurveyData'].astype(str)
+  return [f for f in fields
+          if surveydata.str.contains(f'"{f}"', regex=False).any()]
+
+
+@profiled
+def generate_nada_export_chunked(
+    matched_assessments:pd.DataFrame, config:MatcherConfig
+    , writer:CSVChunkWriter, chunk_size:int
+    , survey_store:Optional[ParsedSurveyStore]=None
+    , workers:Optional[int]=None) -> AODWarnings:
+    """
+      Same survey.txt as generate_nada_export, but prepared and written
+      chunk_size assessments at a time: only one chunk's expanded
+      (SurveyData + AOD) frame is held in memory at once.
+      workers: each chunk's SurveyData is parsed in that many processes
+               (one pool of them for the whole export)
+    """
+    # prep_nada_fields sorts by SLK, AssessmentDate (a stable sort).
+    # Sorting the input the same way first keeps the chunks in survey.txt order.
+    ordered = matched_assessments.sort_values(by=["SLK", "AssessmentDate"])
+    # a not-answered field missing from a whole chunk would otherwise be written as -1,
+    # where the full export writes a blank (the field is in the dataset, not in the row)
+    dataset_fields = get_surveydata_fields_present(ordered, get_notanswered_source_fields())
+
+    config = MatcherConfig.of(config)
+    warnings_aod = AODWarnings()
+    parallel = bool(workers and workers > 1 and survey_store is None)
+    with (prep_process_pool(workers) if parallel else nullcontext()) as executor:
+      for start in range(0, len(ordered), chunk_size):
+        chunk = ordered.iloc[start:start + chunk_size]
+        res, chunk_warnings = prep_nada_fields(chunk, config, ensure_columns=dataset_fields
+                                               , survey_store=survey_store, workers=workers
+                                               , executor=executor)
+        writer.write_chunk(nada_df_generator.generate_finaloutput_df(res))
+        warnings_aod.extend(chunk_warnings)
+        logging.debug(f"NADA export: wrote chunk {writer.num_chunks} ({writer.num_rows} rows so far)")
+
+    if not writer.num_chunks:
+      # nothing to export: still a survey.txt, with just its header
+      writer.write_chunk(pd.DataFrame(columns=nada_final_fields))
+    return warnings_aod
+
 #  = "atom-matching"
 def save_nada_data(data:pd.DataFrame, container:str, outfile:str):
   exp = AzureBlobExporter(container_name=container) #
   exp.export_dataframe(data_name=outfile, data=data) 
 
 
-def save_aod_warnings(data:list[AODWarning], container:str, outfile:str):
-  header = ["SLK","RowKey","drug_name","field_name", "field_value"]
-  warnings_list = CSVTypeObject(header=header, rows=data)
+def save_aod_warnings(data:AODWarnings, container:str, outfile:str):
   exp = AzureBlobExporter(container_name=container) #
-  exp.export_csv(data_name=outfile, data=warnings_list)   
+  exp.export_text(data_name=outfile, data=data.to_csv())
 
 
 def get_matched_assessments(container_name, st_dt, end_dt):
   # st_dt, end_dt= "20240101", "20240331"
+  # the typed parquet handoff (matched_handoff), only the columns the export needs
+  # (blob names are from the container root: BlobFileSource's folder is only used for listing)
+  name = f"NADA/{st_dt}-{end_dt}_reindexed"
+  df = read_matched(BlobFileSource(container_name), name, columns=get_nada_input_columns())
+  if df is not None:
+    return as_exported_text(df), f"{name}.parquet"
+
+  # written before the parquet handoff: the reindexed CSV
   file_source = BlobFileSource(container_name,folder_path="NADA")
   df , fname = io.import_data(st_dt, end_dt, file_source
               , prefix="forstxt_" #f"{st_dt}-{end_dt}"
@@ -48,8 +148,20 @@ def get_matched_assessments(container_name, st_dt, end_dt):
 
 def generate_nada_save(reporting_start_str:str
                        , reporting_end_str :str
-                       , config:dict
-                       , container:str) -> list[AODWarning]|None:
+                       , config:MatcherConfig
+                       , container:str
+                       , chunk_size:Optional[int]=None
+                       , survey_store:Optional[ParsedSurveyStore]=None
+                       , workers:Optional[int]=None) -> AODWarnings|None:
+  """
+    chunk_size: if set, survey.txt is streamed to the blob in blocks of
+                chunk_size assessments (bounded memory for multi-year runs).
+    survey_store: if set, only new/changed assessments have their SurveyData parsed;
+                  the store is updated with them after the export.
+    workers: the SurveyData is parsed in that many processes (default: NADA_PREP_WORKERS, or 1)
+  """
+  if workers is None:
+    workers = int(os.environ.get(ConfigKeys.NADA_PREP_WORKERS.value) or 1)
 
   p_str = f"{reporting_start_str}-{reporting_end_str}"
 
@@ -58,22 +170,41 @@ def generate_nada_save(reporting_start_str:str
     logging.error(f"No Indexed NADA data file with name {fname} could be found")
     return None
   
-  nada, warnings_aod = generate_nada_export(df_reindexed, config)
   outfile = f"{p_str}/surveytxt_{p_str}.csv"
-
-  save_nada_data(nada, container=container, outfile=outfile)
-  msg = f"saved {len(nada)} NADA COMS records to {outfile}"
+  if chunk_size:
+    exp = AzureBlobExporter(container_name=container)
+    with exp.open_csv_writer(data_name=outfile) as writer:
+      warnings_aod = generate_nada_export_chunked(df_reindexed, config
+                                                  , writer, chunk_size, survey_store, workers)
+    num_records = writer.num_rows
+  else:
+    nada, warnings_aod = generate_nada_export(df_reindexed, config, survey_store, workers)
+    save_nada_data(nada, container=container, outfile=outfile)
+    num_records = len(nada)
+
+  if survey_store:
+    survey_store.save()
+
+  msg = f"saved {num_records} NADA COMS records to {outfile}"
   logging.info(msg)
   return warnings_aod
   # print("Done. New file : ", nada_importfile.absolute())
 
 
-def write_aod_warnings(data:list[AODWarning]
+def write_aod_warnings(data:AODWarnings
                        , container:str, period_str:str) -> str:
-
+  """
+    Writes the warnings, and their counts by drug_name/field_name (..._warn_summary.csv).
+  """
   outfile = f"NADA/{period_str}/aod_{period_str}_warn.csv"
   logging.info("Going to write AOD Warnings")
   save_aod_warnings(data, container, outfile=outfile)
+
+  summary = data.summary()
+  logging.info("%d AOD warnings, most frequent:\n%s", len(data)
+               , lazy(summary.head(10).to_string, index=False))
+  exp = AzureBlobExporter(container_name=container)
+  exp.export_dataframe(data_name=f"NADA/{period_str}/aod_{period_str}_warn_summary.csv", data=summary)
   return outfile
 
 
@@ -83,7 +214,7 @@ def main ():
   if not container:
       logging.exception(f"unable to proceed without app config {ConfigKeys.AZURE_BLOB_CONTAINER.value} ")
       return
-  config = load_blob_config(container)
+  config = load_matcher_config(container, cache=host_dataset_cache)
   reporting_start_str, reporting_end_str =  '20240101', '20240331' # Q1 2024
   warnings_aod = generate_nada_save(reporting_start_str, reporting_end_str, config, container)
   if warnings_aod:    
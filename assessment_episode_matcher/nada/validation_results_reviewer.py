@@ -9,7 +9,7 @@ Usage:
     python error_classification.py
 
 Requirements:
-    Python 3.10+
+    Python 3.10+, pandas
 
 Input files (should be in the same directory as the script):
     - validation_errors.txt: Contains validation errors from the online tool
@@ -19,162 +19,132 @@ Output:
     A dictionary containing error statistics and counts
 """
 
+import csv
+from itertools import islice
 from pathlib import Path
 import re
-from typing import TypeAlias
-from collections import defaultdict
+from typing import Iterator, TypeAlias
+import pandas as pd
 
-ErrorDict: TypeAlias = dict[int, list[dict[str, str]]]
-RowData: TypeAlias = tuple[str, str]
-ClassifiedError: TypeAlias = dict[str, str | int]
-UniqueAssessments: TypeAlias = set[tuple[str, str]]
 ErrorCounts: TypeAlias = dict[str, tuple[int, str]]
 ReportData: TypeAlias = dict[str, int | float | ErrorCounts]
 
-def parse_validation_errors(validation_file: str) -> ErrorDict:
+error_pattern = re.compile(r'SURVEY\.txt: (\w+) (\w+) (\d+) for Agency (\w+) on Row (\d+), Column (\d+)')
+error_fields = ['error_kind', 'entity', 'value', 'agency', 'row', 'column']
+
+def parse_validation_errors(validation_file: str, chunk_lines: int = 100_000) -> pd.DataFrame:
     """
-    Parse the validation errors file and extract errors for each row.
+    Parse the validation errors file, chunk_lines lines at a time, into one row per error.
 
     Args:
         validation_file (str): Path to the validation errors file
+        chunk_lines (int): Number of lines of the file held in memory at once
 
     Returns:
-        ErrorDict: A dictionary mapping row numbers to lists of error information
+        pd.DataFrame: row, error_type, value, agency, column (in the order of the file)
     """
-    errors: ErrorDict = defaultdict(list)
-    pattern = r'SURVEY\.txt: (\w+) (\w+) (\d+) for Agency (\w+) on Row (\d+), Column (\d+)'
-    
+    chunks = []
     with open(validation_file, 'r') as f:
-        for line in f:
-            match = re.search(pattern, line)
-            if match:
-                error_type, entity, value, agency, row, column = match.groups()
-                errors[int(row)].append({
-                    'type': f'{error_type} {entity}',
-                    'value': value,
-                    'agency': agency,
-                    'column': column
-                })
-    
-    return errors
-
-def extract_relevant_rows(csv_file: str, error_rows: set[int]) -> dict[int, RowData]:
+        while lines := list(islice(f, chunk_lines)):
+            matches = [m.groups() for m in map(error_pattern.search, lines) if m]
+            if matches:
+                chunks.append(pd.DataFrame(matches, columns=error_fields))
+
+    errors = pd.concat(chunks, ignore_index=True) if chunks \
+                else pd.DataFrame(columns=error_fields)
+    errors['row'] = errors['row'].astype(int)
+    errors['error_type'] = errors['error_kind'] + ' ' + errors['entity']
+    return errors[['row', 'error_type', 'value', 'agency', 'column']]
+
+def scan_csv_rows(csv_file: str, error_rows: set[int]) -> tuple[pd.DataFrame, int]:
     """
-    Extract relevant rows from the CSV file based on error row numbers.
+    One pass over the CSV file: the rows with errors, and the total number of lines.
 
     Args:
         csv_file (str): Path to the CSV file
         error_rows (set[int]): Set of row numbers with errors
 
     Returns:
-        dict[int, RowData]: A dictionary mapping row numbers to (EpisodeID, AssessmentDate) tuples
+        tuple[pd.DataFrame, int]: row, episode_id, assessment_date of the error rows
+        , and the number of lines in the file
     """
-    import csv
+    num_lines = 0
+
+    def counted(lines) -> Iterator[str]:
+        nonlocal num_lines
+        for line in lines:
+            num_lines += 1
+            yield line
+
     with open(csv_file, 'r') as f:
-        return {
-            i: (row[1], row[4])
-            for i, row in enumerate(csv.reader(f), start=1)
-            if i in error_rows
-        }
+        relevant = [(i, row[1], row[4])
+                    for i, row in enumerate(csv.reader(counted(f)), start=1)
+                    if i in error_rows]
+    return pd.DataFrame(relevant, columns=['row', 'episode_id', 'assessment_date']), num_lines
 
-def classify_errors(validation_file: str, csv_file: str) -> tuple[list[ClassifiedError], UniqueAssessments]:
+def classify_errors(validation_file: str, csv_file: str
+                    , chunk_lines: int = 100_000) -> tuple[pd.DataFrame, int]:
     """
     Classify errors by linking validation errors to the original CSV data.
 
     Args:
         validation_file (str): Path to the validation errors file
         csv_file (str): Path to the CSV file
+        chunk_lines (int): Lines of the validation errors file parsed at a time
 
     Returns:
-        tuple[list[ClassifiedError], UniqueAssessments]: A tuple containing a list of classified errors 
-        and a set of unique assessments with errors
+        tuple[pd.DataFrame, int]: The classified errors (row, episode_id, assessment_date,
+        error_type, agency, column; in CSV row order), and the number of lines in the CSV file
     """
-    errors = parse_validation_errors(validation_file)
-    relevant_rows = extract_relevant_rows(csv_file, set(errors.keys()))
-    
-    classified_errors = []
-    unique_assessments = set()
-    for row, data in relevant_rows.items():
-        for error_info in errors[row]:
-            classified_errors.append({
-                'row': row,
-                'episode_id': data[0],
-                'assessment_date': data[1],
-                'error_type': error_info['type'],
-                'agency': error_info['agency'],
-                'column': error_info['column']
-            })
-        unique_assessments.add((data[0], data[1]))
-    
-    return classified_errors, unique_assessments
-
-def count_unique_assessments(grouped_errors: dict[str, list[ClassifiedError]]) -> ErrorCounts:
+    errors = parse_validation_errors(validation_file, chunk_lines)
+    relevant_rows, total_rows = scan_csv_rows(csv_file, set(errors['row']))
+    classified = relevant_rows.merge(errors, on='row', how='inner')
+    return classified[['row', 'episode_id', 'assessment_date'
+                       , 'error_type', 'agency', 'column']], total_rows
+
+def count_unique_assessments(classified_errors: pd.DataFrame) -> ErrorCounts:
     """
     Count unique assessments for each error type and provide an example error.
 
     Args:
-        grouped_errors (dict[str, list[ClassifiedError]]): Grouped classified errors
+        classified_errors (pd.DataFrame): Classified errors
 
     Returns:
         ErrorCounts: A dictionary mapping error types to counts of unique assessments and an example error
     """
-    unique_assessment_counts = {}
-    for error_type, errors in grouped_errors.items():
-        unique_count = len(set((error['episode_id'], error['assessment_date']) for error in errors))
-        first_error = errors[0]
-        error_message = f"{error_type} {first_error['episode_id']} for Agency {first_error['agency']} on Row {first_error['row']}, Column {first_error['column']}"
-        unique_assessment_counts[error_type] = (unique_count, error_message)
-    return unique_assessment_counts
-
-def group_errors(classified_errors: list[ClassifiedError]) -> dict[str, list[ClassifiedError]]:
-    """
-    Group classified errors by error type.
-
-    Args:
-        classified_errors (list[ClassifiedError]): List of classified errors
-
-    Returns:
-        dict[str, list[ClassifiedError]]: A dictionary mapping error types to lists of classified errors
-    """
-    error_groups: dict[str, list[ClassifiedError]] = defaultdict(list)
-    for error in classified_errors:
-        error_groups[error['error_type']].append(error)
-    return dict(error_groups)
-
-def count_total_rows(csv_file: str) -> int:
-    """
-    Count the total number of rows in the CSV file.
-
-    Args:
-        csv_file (str): Path to the CSV file
-
-    Returns:
-        int: Total number of rows in the CSV file
-    """
-    with open(csv_file, 'r') as f:
-        return sum(1 for _ in f)
+    unique_counts = classified_errors \
+                        .drop_duplicates(['error_type', 'episode_id', 'assessment_date']) \
+                        .groupby('error_type', sort=False).size()
+    first_errors = classified_errors.drop_duplicates('error_type').set_index('error_type')
+    return {
+        error_type: (int(count),
+                     f"{error_type} {first.episode_id} for Agency {first.agency} on Row {first.row}, Column {first.column}")
+        for (error_type, count), first in zip(unique_counts.items()
+                                              , first_errors.loc[unique_counts.index].itertuples())
+    }
 
-def generate_report(csv_file: str, validation_file: str) -> ReportData:
+def generate_report(csv_file: str, validation_file: str
+                    , chunk_lines: int = 100_000) -> ReportData:
     """
     Generate a comprehensive report of error statistics.
 
     Args:
         csv_file (str): Path to the CSV file
         validation_file (str): Path to the validation errors file
+        chunk_lines (int): Lines of the validation errors file parsed at a time
 
     Returns:
         ReportData: A dictionary containing error statistics and counts
     """
-    classified_errors, unique_assessments = classify_errors(validation_file, csv_file)
-    grouped_errors = group_errors(classified_errors)
-    unique_assessment_counts = count_unique_assessments(grouped_errors)
-    total_rows = count_total_rows(csv_file)
+    classified_errors, total_rows = classify_errors(validation_file, csv_file, chunk_lines)
+    unique_assessment_counts = count_unique_assessments(classified_errors)
+    num_unique_assessments = len(classified_errors[['episode_id', 'assessment_date']].drop_duplicates())
 
-    error_percentage = (len(unique_assessments) / total_rows) * 100
+    error_percentage = (num_unique_assessments / total_rows) * 100
 
     return {
         "total_rows": total_rows,
-        "unique_assessments_with_errors": len(unique_assessments),
+        "unique_assessments_with_errors": num_unique_assessments,
         "error_percentage": round(error_percentage, 2),
         "error_counts": unique_assessment_counts
     }
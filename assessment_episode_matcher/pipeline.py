@@ -0,0 +1,392 @@
+"""
+  A small DAG runner for the end-to-end flow
+  (import episodes/ATOMs -> get_data_for_matching2 -> match_and_get_issues
+    -> process_errors_warnings -> reindexed CSV -> NADA survey.txt).
+
+  Each Stage declares the outputs it needs from other stages (inputs) and the run
+  parameters it uses (params). A stage's outputs are cached as parquet, keyed by a hash of:
+    - the fingerprints (content hashes) of its inputs,
+    - the values of its params,
+    - the config version and the code version (package + stage version).
+  So a re-run with only a different reporting period or slack recomputes the stages
+  that use them and the stages downstream of those whose inputs actually changed.
+
+  Source stages (cache=False) always run: they read data the runner can't fingerprint
+  beforehand. Their outputs are fingerprinted after the read.
+  Stages that export files (audit, reindexed, surveytxt, client_index) are not cached
+  (cache=False): their exports go to wherever the run's exporters point, so they run every
+  time; the pure stages upstream of them still come from the cache.
+"""
+import hashlib
+import json
+import logging
+from functools import partial
+from graphlib import TopologicalSorter
+from typing import Callable, Optional
+import pandas as pd
+
+from assessment_episode_matcher.version import __version__
+from assessment_episode_matcher.client_index import ClientIndexStore
+from assessment_episode_matcher.configs.matcher_config import MatcherConfig
+from assessment_episode_matcher.dataset_cache import DatasetCache, load_versioned
+from assessment_episode_matcher.exporters.main import DataExporter, ParquetExporter, AzureBlobExporter
+from assessment_episode_matcher.importers.main import FileSource, LocalFileSource, BlobFileSource
+from assessment_episode_matcher.importers import episodes as EpisodesImporter
+from assessment_episode_matcher.importers import assessments as ATOMsImporter
+from assessment_episode_matcher.matching import main as match_helper
+from assessment_episode_matcher.matching.errors import process_errors_warnings
+from assessment_episode_matcher.matching.incremental import ew_names
+from assessment_episode_matcher.mytypes import DataKeys as dk, Purpose
+from assessment_episode_matcher.nada import generate_nada_export, get_nada_input_columns
+from assessment_episode_matcher.matched_handoff import write_matched, as_exported_text
+from assessment_episode_matcher.profiling import profile_stage, profile_output
+from assessment_episode_matcher.survey_store import get_mixed_json_columns, encode_for_store \
+                                                  , decode_from_store
+from assessment_episode_matcher.utils.base import get_period_range
+import assessment_episode_matcher.utils.df_ops_base as utdf
+from assessment_episode_matcher.utils.io import load_for_period
+
+index_column = '_stage_index'
+
+
+class Stage(object):
+  """
+    func(**inputs, **params) -> {output name: DataFrame}
+    version: bump when the stage's logic changes in a way the package version doesn't capture
+  """
+
+  def __init__(self, name:str, func:Callable[..., dict[str, pd.DataFrame]], outputs:list[str]
+               , inputs:Optional[list[str]]=None, params:Optional[list[str]]=None
+               , cache:bool=True, version:str="1") -> None:
+    self.name = name
+    self.func = func
+    self.outputs = outputs
+    self.inputs = inputs or []
+    self.params = params or []
+    self.cache = cache
+    self.version = version
+
+
+def data_fingerprint(df:pd.DataFrame) -> str:
+  """
+    Content hash of a frame (values, index and column names).
+  """
+  h = hashlib.sha256(json.dumps([str(c) for c in df.columns]).encode())
+  if len(df) > 0:
+    row_hashes = pd.util.hash_pandas_object(df.astype(str), index=True)
+    h.update(row_hashes.to_numpy().tobytes())
+  return h.hexdigest()
+
+
+def config_version(config:Optional[MatcherConfig]) -> str:
+  return MatcherConfig.of(config).version_hash
+
+
+def stage_key(stage:Stage, input_fingerprints:list[str], params:dict, config_ver:str) -> str:
+  key_parts = {
+    'stage': stage.name,
+    'code_version': f"{__version__}/{stage.version}",
+    'config_version': config_ver,
+    'inputs': input_fingerprints,
+    'params': {p: str(params[p]) for p in stage.params},
+  }
+  return hashlib.sha256(json.dumps(key_parts, sort_keys=True).encode()).hexdigest()[:24]
+
+
+class StageCache(object):
+  """
+    Stage outputs as parquet files: {prefix}{stage}_{output}_{key}.
+    load_prefix: path prefix for file_source, export_prefix/export_suffix: data_name parts for exporter
+  """
+
+  def __init__(self, file_source:FileSource, exporter:DataExporter
+               , load_prefix:str, export_prefix:str, export_suffix:str="") -> None:
+    self.file_source = file_source
+    self.exporter = exporter
+    self.load_prefix = load_prefix
+    self.export_prefix = export_prefix
+    self.export_suffix = export_suffix
+
+  def load(self, stage:Stage, key:str) -> Optional[tuple[dict[str, pd.DataFrame], dict[str, str]]]:
+    outputs, fingerprints = {}, {}
+    for name in stage.outputs:
+      try:
+        stored = self.file_source.load_parquet_file_to_df(
+                    f"{self.load_prefix}{stage.name}_{name}_{key}.parquet")
+      except (FileNotFoundError, ValueError):
+        return None
+      attrs = dict(stored.attrs)
+      df = decode_from_store(stored, attrs.get('json_columns', []))
+      df = utdf.none_to_nan(df.set_index(index_column).rename_axis(attrs.get('index_name')))
+      df.attrs = {}
+      outputs[name], fingerprints[name] = df, attrs['fingerprint']
+    return outputs, fingerprints
+
+  def save(self, stage:Stage, key:str
+           , outputs:dict[str, pd.DataFrame], fingerprints:dict[str, str]):
+    for name, df in outputs.items():
+      stored = encode_for_store(df, get_mixed_json_columns(df))
+      stored.insert(0, index_column, df.index)
+      stored.attrs.update(fingerprint=fingerprints[name], index_name=df.index.name)
+      self.exporter.export_dataframe(
+          data_name=f"{self.export_prefix}{stage.name}_{name}_{key}{self.export_suffix}"
+          , data=stored)
+
+
+class Pipeline(object):
+
+  def __init__(self, stages:list[Stage], cache:Optional[StageCache]=None
+               , config:Optional[MatcherConfig]=None
+               , profile_exporter:Optional[DataExporter]=None) -> None:
+    """
+      profile_exporter: where the profiles of stages named in PROFILE_STAGES go (see profiling)
+    """
+    self.stages = {s.name: s for s in stages}
+    self.producers = {out: s.name for s in stages for out in s.outputs}
+    self.cache = cache
+    self.config_version = config_version(config)
+    self.profile_exporter = profile_exporter
+    self.ran:list[str] = []
+    self.from_cache:list[str] = []
+
+  def _get_order(self, targets:Optional[list[str]]) -> list[str]:
+    graph = {name: {self.producers[i] for i in s.inputs} for name, s in self.stages.items()}
+    needed, todo = set(), list(targets or self.stages)
+    while todo:
+      name = todo.pop()
+      if name not in needed:
+        needed.add(name)
+        todo.extend(graph[name])
+    return [name for name in TopologicalSorter(graph).static_order() if name in needed]
+
+  def run(self, params:dict, targets:Optional[list[str]]=None) -> dict[str, pd.DataFrame]:
+    """
+      Runs (or loads from the cache) the target stages and the stages they depend on.
+      Returns all their outputs by name.
+    """
+    self.ran, self.from_cache = [], []
+    data:dict[str, pd.DataFrame] = {}
+    fingerprints:dict[str, str] = {}
+
+    for name in self._get_order(targets):
+      stage = self.stages[name]
+      key = stage_key(stage, [fingerprints[i] for i in stage.inputs], params, self.config_version)
+
+      cached = self.cache.load(stage, key) if (self.cache and stage.cache) else None
+      if cached:
+        outputs, out_fingerprints = cached
+        self.from_cache.append(name)
+        logging.info(f"Pipeline: {name} from cache ({key})")
+      else:
+        with profile_output(self.profile_exporter), profile_stage(name):
+          outputs = stage.func(**{i: data[i] for i in stage.inputs}
+                               , **{p: params[p] for p in stage.params})
+        out_fingerprints = {out: data_fingerprint(outputs[out]) for out in stage.outputs}
+        if self.cache and stage.cache:
+          self.cache.save(stage, key, outputs, out_fingerprints)
+        self.ran.append(name)
+        logging.info(f"Pipeline: ran {name}")
+
+      for out in stage.outputs:
+        data[out], fingerprints[out] = outputs[out], out_fingerprints[out]
+    return data
+
+
+# Stages of the NADA flow (test_surveytxt_local.main3 + nada.generate_nada_save)
+
+def import_episodes(reporting_start, reporting_end, file_source:FileSource, prefix:str
+                    , config:MatcherConfig, cache_exporter:Optional[DataExporter]=None
+                    , dataset_cache:Optional[DatasetCache]=None):
+  start_str, end_str = get_period_range(reporting_start, reporting_end)
+  file_path, _, _ = load_for_period(file_source, start_str, end_str
+                                    , prefix=f"{prefix}_", suffix="AllPrograms.csv")
+  episode_df, cache_to_path = load_versioned(
+      dataset_cache if file_path else None, file_source, file_path
+      , lambda: EpisodesImporter.import_data(start_str, end_str, file_source
+                                             , prefix=prefix, suffix="AllPrograms", config=config)
+      , key_extra=('episodes', config_version(config)))
+  if cache_to_path and cache_exporter:
+    if cache_to_path[-3:] == 'csv':
+      cache_to_path = f"{cache_to_path[:-3]}parquet"
+    cache_exporter.export_dataframe(data_name=cache_to_path, data=episode_df)
+  return {'episodes': episode_df}
+
+
+def import_atoms(reporting_start, reporting_end, file_source:FileSource, prefix:str
+                 , config:MatcherConfig, cache_exporter:Optional[DataExporter]=None
+                 , dataset_cache:Optional[DatasetCache]=None):
+  start_str, end_str = get_period_range(reporting_start, reporting_end)
+  file_path, _, _ = load_for_period(file_source, start_str, end_str
+                                    , prefix=f"{prefix}_", suffix="AllPrograms.parquet")
+  # (no file: loaded from the source DB - not cached)
+  atoms_df, cache_to_path = load_versioned(
+      dataset_cache if file_path else None, file_source, file_path
+      , lambda: ATOMsImporter.import_data(start_str, end_str, file_source
+                                          , prefix=prefix, suffix="AllPrograms"
+                                          , purpose=Purpose.NADA, config=config
+                                          , only_for_slks=None, refresh=True)
+      , key_extra=('atoms', config_version(config)))
+  if cache_to_path and cache_exporter:
+    cache_exporter.export_dataframe(data_name=cache_to_path, data=atoms_df)
+  return {'atoms': atoms_df}
+
+
+def prepare_for_matching(episodes, atoms, reporting_start, reporting_end, slack_for_matching):
+  a_df, e_df, atomslk_notin_ep, epslk_notin_atom = match_helper.get_data_for_matching2(
+        episodes, atoms, reporting_start, reporting_end, slack_for_matching=slack_for_matching)
+  return {'a_df': a_df, 'e_df': e_df
+          , 'atomslk_notin_ep': atomslk_notin_ep, 'epslk_notin_atom': epslk_notin_atom}
+
+
+def match(a_df, e_df, atomslk_notin_ep, epslk_notin_atom
+          , reporting_start, reporting_end, slack_for_matching, config:MatcherConfig):
+  final_good, ew = match_helper.match_and_get_issues(e_df, a_df, atomslk_notin_ep, epslk_notin_atom
+                                                     , slack_for_matching
+                                                     , reporting_start, reporting_end, config)
+  return {'final_good': final_good
+          , **{name: ew[name] if ew[name] is not None else pd.DataFrame() for name in ew_names}}
+
+
+def audit(final_good, reporting_start, reporting_end, audit_exporter:DataExporter, **ew):
+  summary = process_errors_warnings(ew, final_good.SLK_RowKey.unique(), dk.client_id.value
+                                    , period_start=reporting_start, period_end=reporting_end
+                                    , audit_exporter=audit_exporter)
+  counts = [{'level': level, 'name': name, 'count': n}
+            for level, by_name in summary.items() for name, n in by_name.items()]
+  return {'audit_summary': pd.DataFrame(counts)}
+
+
+def reindex(final_good, reporting_start, reporting_end
+            , out_exporter:DataExporter, out_suffix:str=""
+            , handoff_exporter:Optional[DataExporter]=None, handoff_suffix:str=""
+            , reindexed_csv:bool=False):
+  """
+    handoff_exporter: writes the matched assessments as typed parquet + manifest (matched_handoff),
+                      with the reindexed CSV only if reindexed_csv.
+                      Without it, the reindexed CSV is written (with out_exporter) as before.
+  """
+  start_str, end_str = get_period_range(reporting_start, reporting_end)
+  df_reindexed = final_good.reset_index(drop=True)
+  data_name = f"NADA/{start_str}-{end_str}_reindexed"
+  if handoff_exporter is None:
+    out_exporter.export_dataframe(data_name=f"{data_name}{out_suffix}", data=df_reindexed)
+  else:
+    write_matched(df_reindexed, handoff_exporter, data_name, suffix=handoff_suffix
+                  , csv_exporter=out_exporter if reindexed_csv else None, csv_suffix=out_suffix)
+  return {'reindexed': df_reindexed}
+
+
+def surveytxt(reindexed, reporting_start, reporting_end, config:MatcherConfig
+              , out_exporter:DataExporter, out_suffix:str=""):
+  start_str, end_str = get_period_range(reporting_start, reporting_end)
+  p_str = f"{start_str}-{end_str}"
+  # the NADA step works off the matched columns as text, as generate_nada_save reads them
+  as_exported = as_exported_text(reindexed[[c for c in get_nada_input_columns()
+                                            if c in reindexed.columns]])
+  nada, warnings_aod = generate_nada_export(as_exported, config)
+  out_exporter.export_dataframe(data_name=f"{p_str}/surveytxt_{p_str}{out_suffix}", data=nada)
+  return {'surveytxt': nada, 'aod_warnings': warnings_aod.to_frame()}
+
+
+def index_clients(episodes, atoms, final_good, reporting_start, reporting_end
+                  , client_index:ClientIndexStore, config:Optional[MatcherConfig]=None, **ew):
+  index = client_index.write({'episodes': episodes, 'atoms': atoms, 'final_good': final_good, **ew}
+                             , period=get_period_range(reporting_start, reporting_end)
+                             , config_version=config_version(config) if config is not None else None)
+  return {'client_index': index}
+
+
+def matching_stages(config:MatcherConfig) -> list[Stage]:
+  config = MatcherConfig.of(config)
+  period = ['reporting_start', 'reporting_end']
+  return [
+    Stage('matching_data', prepare_for_matching
+          , outputs=['a_df', 'e_df', 'atomslk_notin_ep', 'epslk_notin_atom']
+          , inputs=['episodes', 'atoms'], params=[*period, 'slack_for_matching']),
+    Stage('matches', partial(match, config=config)
+          , outputs=['final_good', *ew_names]
+          , inputs=['a_df', 'e_df', 'atomslk_notin_ep', 'epslk_notin_atom']
+          , params=[*period, 'slack_for_matching']),
+  ]
+
+
+def output_stages(config:MatcherConfig, out_exporter:DataExporter, audit_exporter:DataExporter
+                  , out_suffix:str="", handoff_exporter:Optional[DataExporter]=None
+                  , handoff_suffix:str="", reindexed_csv:bool=False) -> list[Stage]:
+  config = MatcherConfig.of(config)
+  period = ['reporting_start', 'reporting_end']
+  return [
+    Stage('audit', partial(audit, audit_exporter=audit_exporter)
+          , outputs=['audit_summary'], inputs=['final_good', *ew_names], params=period
+          , cache=False),
+    Stage('reindexed', partial(reindex, out_exporter=out_exporter, out_suffix=out_suffix
+                               , handoff_exporter=handoff_exporter, handoff_suffix=handoff_suffix
+                               , reindexed_csv=reindexed_csv)
+          , outputs=['reindexed'], inputs=['final_good'], params=period, cache=False),
+    Stage('surveytxt', partial(surveytxt, config=config
+                               , out_exporter=out_exporter, out_suffix=out_suffix)
+          , outputs=['surveytxt', 'aod_warnings'], inputs=['reindexed'], params=period
+          , cache=False),
+  ]
+
+
+def client_index_stage(client_index:ClientIndexStore
+                       , config:Optional[MatcherConfig]=None) -> Stage:
+  """
+    Writes the per-client lookup index (client_index.ClientIndexStore) of the run's data and matches,
+    with the run's period and config version.
+  """
+  return Stage('client_index', partial(index_clients, client_index=client_index, config=config)
+               , outputs=['client_index'], inputs=['episodes', 'atoms', 'final_good', *ew_names]
+               , params=['reporting_start', 'reporting_end'], cache=False)
+
+
+def get_nada_pipeline(config:MatcherConfig
+                      , ep_file_source:FileSource, atom_file_source:FileSource
+                      , out_exporter:DataExporter, audit_exporter:DataExporter
+                      , cache:Optional[StageCache]=None, out_suffix:str=""
+                      , source_cache_exporter:Optional[DataExporter]=None
+                      , ep_prefix:str="MDS", atom_prefix:str="ATOM"
+                      , dataset_cache:Optional[DatasetCache]=None
+                      , client_index:Optional[ClientIndexStore]=None
+                      , handoff_exporter:Optional[DataExporter]=None, handoff_suffix:str=""
+                      , reindexed_csv:bool=False) -> Pipeline:
+  """
+    params for run(): reporting_start, reporting_end (dates), slack_for_matching (days)
+    out_suffix: file extension for out_exporter's data names (e.g. ".csv" for blobs)
+    handoff_exporter: writes the matched assessments for the NADA step as parquet + manifest
+                      (handoff_suffix ".parquet" for blobs); reindexed_csv: also as CSV
+    dataset_cache: keeps the imported episodes/ATOMs in memory between runs (see dataset_cache)
+    client_index: if set, the run also writes the per-client lookup index
+  """
+  config = MatcherConfig.of(config)
+  period = ['reporting_start', 'reporting_end']
+  stages = [
+    Stage('episodes', partial(import_episodes, file_source=ep_file_source, prefix=ep_prefix
+                              , config=config, cache_exporter=source_cache_exporter
+                              , dataset_cache=dataset_cache)
+          , outputs=['episodes'], params=period, cache=False),
+    Stage('atoms', partial(import_atoms, file_source=atom_file_source, prefix=atom_prefix
+                           , config=config, cache_exporter=source_cache_exporter
+                           , dataset_cache=dataset_cache)
+          , outputs=['atoms'], params=period, cache=False),
+    *matching_stages(config),
+    *output_stages(config, out_exporter, audit_exporter, out_suffix
+                   , handoff_exporter, handoff_suffix, reindexed_csv),
+  ]
+  if client_index:
+    stages.append(client_index_stage(client_index, config))
+  return Pipeline(stages, cache, config, profile_exporter=audit_exporter)
+
+
+def get_local_stage_cache(folder:str, name:str="stage") -> StageCache:
+  exporter = ParquetExporter({"location": f"{folder.rstrip('/')}/"})
+  return StageCache(LocalFileSource(folder), exporter
+                    , load_prefix=f"{name}_", export_prefix=f"{name}_")
+
+
+def get_blob_stage_cache(container_name:str
+                         , folder:str="pipeline_cache", name:str="stage") -> StageCache:
+  prefix = f"{folder}/{name}_"
+  return StageCache(BlobFileSource(container_name), AzureBlobExporter(container_name)
+                    , load_prefix=prefix, export_prefix=prefix, export_suffix=".parquet")
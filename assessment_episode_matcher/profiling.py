@@ -0,0 +1,280 @@
+"""
+  On-demand profiles of named stages, for when a period runs slowly.
+
+  Off unless PROFILE_STAGES is set (comma-separated stage/function names, or '*' for all),
+  either in the environment or with configure_profiling(). When off, a profiled call is
+  a plain call: no profiler is created.
+
+  A profiled stage writes, with the exporter of the run's audit outputs (profile_output),
+  or to the local PROFILE_DIR (default "profiles") otherwise:
+    profile_{stage}_{timestamp}.pstats         : python -m pstats / snakeviz
+    profile_{stage}_{timestamp}.collapsed.txt  : collapsed stacks, for flamegraph.pl / speedscope
+  and logs the stage's top PROFILE_TOP_N functions by cumulative time.
+
+  PROFILER=sampling uses pyinstrument (a sampling profiler) if it is installed; cProfile otherwise.
+  Only the thread running the stage is profiled (not the exporters' upload threads).
+"""
+import cProfile
+import functools
+import importlib.util
+import io
+import logging
+import marshal
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, TYPE_CHECKING
+
+from assessment_episode_matcher.utils.environment import ConfigKeys
+
+if TYPE_CHECKING:
+  from assessment_episode_matcher.exporters.main import DataExporter
+
+PROFILER_CPROFILE = 'cprofile'
+PROFILER_SAMPLING = 'sampling'
+DEFAULT_TOP_N = 20
+DEFAULT_PROFILE_DIR = "profiles"
+# collapsed stacks: paths with less time than this are left out
+MIN_STACK_SECONDS = 1e-5
+MAX_STACK_DEPTH = 64
+
+# (file, line, function) -> (primitive calls, calls, own time, cumulative time, callers)
+Stats = dict[tuple, tuple]
+
+
+class _Settings(object):
+
+  def __init__(self) -> None:
+    self.stages:frozenset[str] = frozenset()
+    self.profiler = PROFILER_CPROFILE
+    self.top_n = DEFAULT_TOP_N
+    self.profile_dir = DEFAULT_PROFILE_DIR
+
+
+_settings = _Settings()
+_local = threading.local()
+
+
+def configure_profiling(stages:Optional[str|list[str]]=None, profiler:Optional[str]=None
+                        , top_n:Optional[int]=None, profile_dir:Optional[str]=None):
+  """
+    stages: names to profile ('*': all); None/empty turns profiling off.
+    Values not given are read from the environment (ConfigKeys.PROFILE_*).
+  """
+  if stages is None:
+    stages = os.environ.get(ConfigKeys.PROFILE_STAGES.value, "")
+  if isinstance(stages, str):
+    stages = stages.split(",")
+  _settings.stages = frozenset(s.strip() for s in stages if s.strip())
+  _settings.profiler = (profiler or os.environ.get(ConfigKeys.PROFILER.value)
+                        or PROFILER_CPROFILE).lower()
+  _settings.top_n = int(top_n or os.environ.get(ConfigKeys.PROFILE_TOP_N.value) or DEFAULT_TOP_N)
+  _settings.profile_dir = profile_dir or os.environ.get(ConfigKeys.PROFILE_DIR.value) \
+                            or DEFAULT_PROFILE_DIR
+
+
+def is_profiled(name:str) -> bool:
+  stages = _settings.stages
+  return bool(stages) and ('*' in stages or name in stages or name.rsplit('.', 1)[-1] in stages)
+
+
+@contextmanager
+def profile_output(exporter:Optional["DataExporter"]) -> Iterator[None]:
+  """
+    Profiles of the stages run in this block (this thread) are written with exporter.
+  """
+  previous = getattr(_local, 'exporter', None)
+  _local.exporter = exporter
+  try:
+    yield
+  finally:
+    _local.exporter = previous
+
+
+class _SamplingProfiler(object):
+  """
+    pyinstrument, with its call tree turned into pstats-style stats.
+  """
+
+  def __init__(self) -> None:
+    from pyinstrument import Profiler
+    self.profiler = Profiler(interval=0.001)
+
+  def enable(self):
+    self.profiler.start()
+
+  def disable(self):
+    self.profiler.stop()
+
+  def get_stats(self) -> Stats:
+    stats:dict[tuple, list] = {}
+
+    def add(frame, parent_key:Optional[tuple]):
+      key = (frame.file_path_short or '~', frame.line_no or 0, frame.function or '<unknown>')
+      entry = stats.setdefault(key, [0, 0, 0.0, 0.0, {}])
+      entry[0] += 1
+      entry[1] += 1
+      entry[2] += frame.self_time
+      entry[3] += frame.time
+      if parent_key is not None:
+        cc, nc, tt, ct = entry[4].get(parent_key, (0, 0, 0.0, 0.0))
+        entry[4][parent_key] = (cc + 1, nc + 1, tt + frame.self_time, ct + frame.time)
+      for child in frame.children:
+        add(child, key)
+
+    root = self.profiler.last_session.root_frame() if self.profiler.last_session else None
+    if root is not None:
+      add(root, None)
+    return {k: tuple(v) for k, v in stats.items()}
+
+
+class _CProfiler(object):
+
+  def __init__(self) -> None:
+    self.profiler = cProfile.Profile()
+
+  def enable(self):
+    self.profiler.enable()
+
+  def disable(self):
+    self.profiler.disable()
+
+  def get_stats(self) -> Stats:
+    self.profiler.create_stats()
+    return self.profiler.stats
+
+
+def _new_profiler():
+  if _settings.profiler == PROFILER_SAMPLING:
+    if importlib.util.find_spec("pyinstrument") is not None:
+      return _SamplingProfiler()
+    logging.info("Profiling: pyinstrument is not installed, using cProfile.")
+  return _CProfiler()
+
+
+class _StatsHolder(object):
+  # what pstats.Stats() loads from
+
+  def __init__(self, stats:Stats) -> None:
+    self.stats = stats
+
+  def create_stats(self):
+    pass
+
+
+def _label(func:tuple) -> str:
+  filename, line, name = func
+  if filename == '~':
+    return name.replace(';', ',')
+  return f"{name} ({os.path.basename(filename)}:{line})".replace(';', ',')
+
+
+def collapsed_stacks(stats:Stats) -> str:
+  """
+    "root;caller;callee microseconds" lines. cProfile only records caller -> callee edges,
+    so a function's time is split between its call paths in proportion to each caller's share.
+  """
+  callees:dict[tuple, list[tuple[tuple, float]]] = {}
+  for func, (_, _, _, _, callers) in stats.items():
+    for caller, edge in callers.items():
+      callees.setdefault(caller, []).append((func, edge[3]))
+
+  lines:dict[str, float] = {}
+
+  def walk(func:tuple, path:list[str], on_path:set, share:float):
+    own = stats[func][2]
+    path = [*path, _label(func)]
+    if own * share >= MIN_STACK_SECONDS:
+      stack = ";".join(path)
+      lines[stack] = lines.get(stack, 0.0) + own * share
+    if len(path) >= MAX_STACK_DEPTH:
+      return
+    for callee, edge_seconds in callees.get(func, []):
+      callee_total = stats[callee][3]
+      if callee in on_path or callee_total <= 0:
+        continue
+      callee_share = share * edge_seconds / callee_total
+      if edge_seconds * share >= MIN_STACK_SECONDS:
+        walk(callee, path, on_path | {callee}, min(callee_share, 1.0))
+
+  for func, entry in stats.items():
+    if not entry[4]:
+      walk(func, [], {func}, 1.0)
+  return "".join(f"{stack} {round(seconds * 1e6)}\n" for stack, seconds in lines.items())
+
+
+def hotspots(stats:Stats, top_n:int) -> str:
+  out = io.StringIO()
+  pstats.Stats(_StatsHolder(stats), stream=out).sort_stats('cumulative').print_stats(top_n)
+  return out.getvalue()
+
+
+def _write(data_name:str, data:bytes):
+  exporter = getattr(_local, 'exporter', None)
+  if exporter is not None:
+    exporter.export_bytes(data_name, data)
+    return
+  os.makedirs(_settings.profile_dir, exist_ok=True)
+  with open(os.path.join(_settings.profile_dir, data_name), 'wb') as file:
+    file.write(data)
+
+
+@contextmanager
+def profile_stage(name:str) -> Iterator[None]:
+  """
+    Profiles the block if the stage name is in PROFILE_STAGES.
+    (A stage run inside another profiled one is part of the outer profile.)
+  """
+  if not is_profiled(name) or getattr(_local, 'active', False):
+    yield
+    return
+
+  profiler = _new_profiler()
+  try:
+    profiler.enable()
+  except ValueError as e:
+    # (Python 3.12+: one cProfile at a time per process, e.g. periods run in threads)
+    logging.info(f"Profiling: {name} not profiled ({e})")
+    profiler = None
+  if profiler is None:
+    yield
+    return
+
+  _local.active = True
+  started = time.perf_counter()
+  try:
+    yield
+  finally:
+    profiler.disable()
+    _local.active = False
+    seconds = time.perf_counter() - started
+    try:
+      stats = profiler.get_stats()
+      prefix = f"profile_{name}_{time.strftime('%Y%m%d-%H%M%S')}"
+      _write(f"{prefix}.pstats", marshal.dumps(stats))
+      _write(f"{prefix}.collapsed.txt", collapsed_stacks(stats).encode('utf-8'))
+      logging.info(f"Profile of {name} ({seconds:.2f}s), written to {prefix}.*; top functions:\n"
+                   + hotspots(stats, _settings.top_n))
+    except Exception:
+      logging.exception(f"Profiling: could not write the profile of {name}")
+
+
+def profiled(func:Callable) -> Callable:
+  """
+    Decorator: profile_stage around the function, named {module}.{function}
+    (PROFILE_STAGES may use the function name alone).
+  """
+  name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+  @functools.wraps(func)
+  def wrapper(*args, **kwargs):
+    if not _settings.stages:
+      return func(*args, **kwargs)
+    with profile_stage(name):
+      return func(*args, **kwargs)
+  return wrapper
+
+
+configure_profiling()
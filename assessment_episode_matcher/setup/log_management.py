@@ -1,41 +1,90 @@
+import atexit
 import os
+import queue
 import shutil
 from datetime import datetime
 
 import logging
-from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
 
-def configure_logging(log_dir, running_file:str, log_suffix:str=""):
+log_format = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener:QueueListener|None = None
+
+
+class lazy(object):
+    """
+      A log message argument that is only computed if the record is emitted:
+        logging.debug("counts: %s", lazy(get_counts, df))
+    """
+    __slots__ = ('func', 'args', 'kwargs')
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self) -> str:
+        return str(self.func(*self.args, **self.kwargs))
+
+
+def log_event(event:str, level:int=logging.INFO, **fields):
+    """
+      A structured log record: "event k=v ...", with the record's event and event_fields
+      attributes set (for handlers/formatters that want the values, not the text).
+    """
+    logger = logging.getLogger()
+    if not logger.isEnabledFor(level):
+        return
+    text = " ".join([event, *(f"{k}={v}" for k, v in fields.items())])
+    logger.log(level, text, extra={'event': event, 'event_fields': fields}, stacklevel=2)
+
+
+def stop_logging():
+    """
+      Stops the queue listener: the records still queued are written out first.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def configure_logging(log_dir, running_file:str, log_suffix:str="", level:int|str=logging.DEBUG):
+    """
+      Logs to {log_dir}/{hour}{-log_suffix}.log.
+      The root logger only puts records on a queue (QueueHandler); the file is written by a
+      QueueListener thread, so a log call doesn't wait for the disk.
+    """
+    global _listener
     timestamp = datetime.now().strftime("%H")
     if log_suffix:
         log_suffix = f"-{log_suffix}"
     fname = f"{log_dir}/{timestamp}{log_suffix}.log"
-    log_config = {
-        'version': 1,
-        'handlers': {
-            'fileHandler': {
-                'class': 'logging.FileHandler',
-                'level': 'DEBUG',
-                'formatter': 'myFormatter',
-                'filename': fname,
-                'mode': 'a'
-            }
-        },
-        'formatters': {
-            'myFormatter': {
-                'format': '%(asctime)s - %(levelname)s - %(message)s'
-            }
-        },
-        'root': {
-            'level': 'DEBUG',
-            'handlers': ['fileHandler']
-        }
-    }
-    dictConfig(log_config)
+
+    file_handler = logging.FileHandler(fname, mode='a')
+    file_handler.setFormatter(logging.Formatter(log_format))
+
+    stop_logging()
+    log_queue:queue.SimpleQueue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+
     logger = logging.getLogger(running_file)
     return logger
 
 
+atexit.register(stop_logging)
+
+
 def setup_logdir_by_currentdate(env_suffix:str="") -> str:
   
     base_log_dir = f"logs_{env_suffix}" if env_suffix  else "logs"
@@ -0,0 +1,64 @@
+"""
+  Loads the inputs of a run - the config, the episodes (MDS CSV) and the ATOMs (parquet or
+  the source tables) - concurrently, in threads: while one source is parsed the other is
+  still downloading, so the import takes about as long as the slowest source, not the sum.
+  (pandas and pyarrow release the GIL for most of the download and parsing work.)
+
+  The sources' caches are written with the cache_exporter they are given; a
+  BackgroundExporter starts those uploads straight away, to be awaited (flush) before exit.
+"""
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from typing import Callable, Optional
+import pandas as pd
+
+from assessment_episode_matcher import pipeline
+from assessment_episode_matcher.configs.matcher_config import MatcherConfig
+from assessment_episode_matcher.dataset_cache import DatasetCache
+from assessment_episode_matcher.exporters.main import DataExporter
+from assessment_episode_matcher.importers.main import FileSource
+from assessment_episode_matcher.setup.log_management import log_event
+
+
+def _timed(timings:dict[str, float], name:str, func:Callable, *args, **kwargs):
+  start = time.perf_counter()
+  try:
+    return func(*args, **kwargs)
+  finally:
+    timings[name] = round(time.perf_counter() - start, 2)
+
+
+def load_sources(reporting_start:date, reporting_end:date
+                 , ep_file_source:FileSource, atom_file_source:FileSource
+                 , get_config:Callable[[], MatcherConfig]
+                 , cache_exporter:Optional[DataExporter]=None
+                 , ep_prefix:str="MDS", atom_prefix:str="ATOM"
+                 , dataset_cache:Optional[DatasetCache]=None) \
+                  -> tuple[MatcherConfig, pd.DataFrame, pd.DataFrame]:
+  """
+    get_config: loads the config (e.g. configs.load_matcher_config); the sources are
+                prepared with it, so each waits for it before it is imported.
+    Returns the config, the episodes and the ATOMs, as pipeline.import_episodes/import_atoms do.
+    Raises the first source's error, after the other sources have finished loading.
+  """
+  timings:dict[str, float] = {}
+  started = time.perf_counter()
+
+  def import_source(name:str, importer:Callable, file_source:FileSource, prefix:str
+                    , config_future:Future) -> pd.DataFrame:
+    config = config_future.result()
+    return _timed(timings, name, importer, reporting_start, reporting_end, file_source, prefix
+                  , config, cache_exporter, dataset_cache)[name]
+
+  with ThreadPoolExecutor(max_workers=3, thread_name_prefix="load") as executor:
+    config_future = executor.submit(_timed, timings, 'config', get_config)
+    episodes_future = executor.submit(import_source, 'episodes', pipeline.import_episodes
+                                      , ep_file_source, ep_prefix, config_future)
+    atoms_future = executor.submit(import_source, 'atoms', pipeline.import_atoms
+                                   , atom_file_source, atom_prefix, config_future)
+
+  config, episodes, atoms = (config_future.result(), episodes_future.result()
+                             , atoms_future.result())
+  log_event("sources_loaded", seconds=round(time.perf_counter() - started, 2), **timings)
+  return config, episodes, atoms
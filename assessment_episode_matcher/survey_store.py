@@ -0,0 +1,277 @@
+"""
+  Parsed-survey store.
+  Keeps the SurveyData-derived columns of the NADA prep (get_surveydata_expanded +
+  expand_drug_info) as parquet, keyed by the assessment's version (SLK, RowKey, Timestamp).
+  A run then only parses the JSON of the assessments that are new or have changed
+  since they were stored; the rest are joined in from the store.
+  The AOD columns depend on the config (drug categories): the store records the config version
+  it was parsed with, and is started afresh when a run's config version is different.
+"""
+import json
+import logging
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+from assessment_episode_matcher.data_prep import expand_survey_fields
+from assessment_episode_matcher.exporters.main import DataExporter, ParquetExporter, AzureBlobExporter
+from assessment_episode_matcher.importers.main import FileSource, LocalFileSource, BlobFileSource
+from assessment_episode_matcher.aod_warnings import AODWarnings, warning_fields
+from assessment_episode_matcher.configs.matcher_config import MatcherConfig
+from assessment_episode_matcher.utils.df_ops_base import drop_fields_by_regex
+from assessment_episode_matcher.utils.fromstr import clean_and_parse_json
+
+store_key = ['SLK', 'RowKey', 'Timestamp']
+assessment_key = ['SLK', 'RowKey']
+warnings_column = '_AODWarnings'
+# the SurveyData fields an assessment has with a null value: in a parse, the column is there
+# even if every row's value is null (a stored all-null column is told apart from an absent one)
+null_fields_column = '_NullFields'
+
+
+def _to_json(value) -> str:
+  return json.dumps(value, default=lambda v: v.item() if isinstance(v, np.generic) else str(v))
+
+
+def _from_json(value):
+  # a row without the field (stored as null) -> NaN, as json_normalize gives for a missing key
+  if not isinstance(value, str):
+    return np.nan
+  return json.loads(value)
+
+
+def _surveydata_fields(survey_data) -> list[str]:
+  """
+    The columns the assessment's SurveyData gives in a parse (json_normalize, max_level=1).
+  """
+  survey = clean_and_parse_json(survey_data) if isinstance(survey_data, str) else None
+  if not isinstance(survey, dict):
+    return []
+  return [f"{k}.{sub}" if isinstance(v, dict) else k
+          for k, v in survey.items() for sub in (v if isinstance(v, dict) else [None])]
+
+
+def get_json_columns(df:pd.DataFrame) -> list[str]:
+  """
+    Object columns holding anything other than strings (multiselect lists, dicts, bools,
+    numbers mixed with text) can't go into parquet as they are: these are stored as JSON text.
+  """
+  json_cols = []
+  for col in df.columns[df.dtypes == object]:
+    values = df[col].dropna()
+    if not values.map(type).eq(str).all():
+      json_cols.append(col)
+  return json_cols
+
+
+def get_mixed_json_columns(df:pd.DataFrame) -> list[str]:
+  """
+    Only the object columns parquet can't hold as they are: lists/dicts, or a mix of value types.
+    (dates, Timestamps etc. stay as they are)
+  """
+  json_cols = []
+  for col in df.columns[df.dtypes == object]:
+    value_types = set(df[col].dropna().map(type))
+    if len(value_types) > 1 or value_types & {list, dict}:
+      json_cols.append(col)
+  return json_cols
+
+
+def encode_for_store(derived:pd.DataFrame, json_cols:list[str]) -> pd.DataFrame:
+  df = derived.copy()
+  for col in json_cols:
+    if col in df.columns:
+      # NaN (the row didn't have the field) is stored as null, an explicit None as 'null'
+      is_missing = df[col].isna() & df[col].map(lambda v: v is not None)
+      df[col] = df[col].map(_to_json).where(~is_missing, None)
+  df.attrs['json_columns'] = json_cols
+  return df
+
+
+def decode_from_store(stored:pd.DataFrame, json_cols:list[str]) -> pd.DataFrame:
+  df = stored.copy()
+  for col in json_cols:
+    if col in df.columns:
+      df[col] = df[col].map(_from_json).infer_objects()
+  return df
+
+
+class ParsedSurveyStore(object):
+  """
+    file_source/exporter: where the store is read from and written to (local folder or blob)
+    load_path: the store's path for file_source, data_name: its name for the exporter
+  """
+
+  def __init__(self, file_source:FileSource, exporter:DataExporter
+               , load_path:str, data_name:str) -> None:
+    self.file_source = file_source
+    self.exporter = exporter
+    self.load_path = load_path
+    self.data_name = data_name
+    self._stored:Optional[pd.DataFrame] = None
+    self._pending:list[pd.DataFrame] = []
+    self.config_version:Optional[str] = None
+    self.num_hits = 0
+    self.num_parsed = 0
+
+  @property
+  def json_columns(self) -> list[str]:
+    cols = list(self.stored.attrs.get('json_columns', []))
+    for pending in self._pending:
+      cols.extend(c for c in pending.attrs['json_columns'] if c not in cols)
+    return cols
+
+  @property
+  def stored(self) -> pd.DataFrame:
+    if self._stored is None:
+      try:
+        self._stored = self.file_source.load_parquet_file_to_df(self.load_path)
+        logging.info(f"Loaded {len(self._stored)} parsed surveys from {self.load_path}")
+      except (FileNotFoundError, ValueError) as e:
+        logging.info(f"No parsed-survey store yet at {self.load_path} ({e})")
+        self._stored = pd.DataFrame(columns=store_key)
+    return self._stored
+
+  def _use_config(self, config:MatcherConfig):
+    """
+      Drops what was parsed with another config version (the stored file is replaced on save()).
+    """
+    version = MatcherConfig.of(config).version_hash
+    if version == self.config_version:
+      return
+    stored_version = self.stored.attrs.get('config_version')
+    if stored_version != version and not self.stored.empty:
+      logging.info(f"Parsed-survey store: parsed with config {stored_version}, not {version}"
+                   ". Starting afresh.")
+      self._stored = pd.DataFrame(columns=store_key)
+    self._pending = []
+    self.config_version = version
+
+  def _get_stored_rows(self, keys:pd.DataFrame) -> pd.DataFrame:
+    """
+      The stored rows for the (SLK, RowKey, Timestamp) keys, in the order/index of keys
+      (inner: keys not in the store are left out).
+    """
+    stored = self.stored
+    if stored.empty:
+      return pd.DataFrame(columns=stored.columns)
+    hits = keys.astype(str).assign(_pos=np.arange(len(keys))) \
+               .merge(stored, on=store_key, how='inner')
+    hits.index = keys.index[hits.pop('_pos').to_numpy()]
+    return hits
+
+  def expand(self, df:pd.DataFrame, config:MatcherConfig
+             , ensure_columns:Optional[list[str]]=None) -> tuple[pd.DataFrame, AODWarnings]:
+    """
+      Same result as data_prep.expand_survey_fields, parsing only the assessments not in the store.
+      Newly parsed assessments are kept to be written by save().
+    """
+    if 'Timestamp' not in df.columns:
+      logging.warning("No Timestamp column: can't use the parsed-survey store, parsing all.")
+      return expand_survey_fields(df, config, ensure_columns)
+    self._use_config(config)
+
+    hits = self._get_stored_rows(df[store_key])
+    misses = df[~df.index.isin(hits.index)]
+
+    parent_cols = [c for c in df.columns if c != 'SurveyData']
+    warnings_aod = AODWarnings()
+    parts = []
+    if not hits.empty:
+      stored_warnings = hits.pop(warnings_column)
+      null_fields = hits.pop(null_fields_column) if null_fields_column in hits.columns \
+                      else pd.Series([], dtype=object)
+      hits = decode_from_store(hits.drop(columns=store_key), self.json_columns)
+      # columns no assessment in this lot has (a value for, or a null field) wouldn't be
+      # in a fresh parse of it either
+      present = set(hits.columns[hits.notna().any().to_numpy()])
+      present.update(f for fields in null_fields.dropna().map(json.loads) for f in fields)
+      hits = hits[[c for c in hits.columns if c in present]]
+      parents = drop_fields_by_regex(df.loc[hits.index, parent_cols], regex='Comment|Note|ITSP')
+      parts.append(parents.join(hits))
+      for (slk, rowkey), row_warnings in zip(parents[assessment_key].to_numpy()
+                                              , stored_warnings.map(json.loads)):
+        for w in row_warnings:
+          warnings_aod.add(slk, rowkey, *w)
+
+    if not misses.empty:
+      parsed, parsed_warnings = expand_survey_fields(misses, config)
+      warnings_aod.extend(parsed_warnings)
+      parts.append(parsed)
+      self._add_pending(parsed, parent_cols, parsed_warnings, misses['SurveyData'])
+
+    self.num_hits += len(hits)
+    self.num_parsed += len(misses)
+    logging.info(f"Parsed-survey store: {len(hits)} from store, {len(misses)} parsed.")
+
+    if not parts:
+      return expand_survey_fields(df, config, ensure_columns)
+    result = pd.concat(parts) if len(parts) > 1 else parts[0]
+    result = result.loc[df.index[df.index.isin(result.index)]]
+    if ensure_columns:
+      missing = [c for c in ensure_columns if c not in result.columns]
+      result = result.reindex(columns=[*result.columns, *missing])
+    return result, warnings_aod
+
+  def _add_pending(self, parsed:pd.DataFrame, parent_cols:list[str]
+                   , parsed_warnings:AODWarnings, survey_data:pd.Series):
+    derived = parsed.drop(columns=[c for c in parent_cols if c in parsed.columns])
+    keys = parsed[store_key].astype(str)
+
+    positions = {c: i for i, c in enumerate(derived.columns)}
+    is_null = derived.isna().to_numpy()
+    null_fields = [_to_json([f for f in _surveydata_fields(data)
+                             if f in positions and row_is_null[positions[f]]])
+                   for data, row_is_null in zip(survey_data.loc[derived.index], is_null)]
+
+    # warnings that can be tied to an assessment are stored with it
+    by_assessment:dict[tuple, list] = {}
+    for slk, rowkey, *w in zip(*(parsed_warnings.columns[f] for f in warning_fields)):
+      by_assessment.setdefault((slk, rowkey), []).append(w)
+    row_warnings = [_to_json(by_assessment.get((slk, rowkey), []))
+                    for slk, rowkey in parsed[assessment_key].to_numpy()]
+
+    json_cols = get_json_columns(derived)
+    pending = pd.concat([keys, encode_for_store(derived, json_cols)], axis=1)
+    pending[warnings_column] = row_warnings
+    pending[null_fields_column] = null_fields
+    pending.attrs['json_columns'] = json_cols
+    self._pending.append(pending)
+
+  def save(self):
+    """
+      Writes the store with the newly parsed assessments added
+      (replacing the earlier versions of changed assessments).
+    """
+    if not self._pending:
+      logging.debug("Parsed-survey store: nothing new to save.")
+      return
+    json_cols = self.json_columns
+    stored = self.stored
+    # a column that is JSON in one lot has to be JSON in all of them
+    frames = []
+    for frame in [stored, *self._pending]:
+      frame_json = frame.attrs.get('json_columns', [])
+      to_encode = [c for c in json_cols if c in frame.columns and c not in frame_json]
+      frames.append(encode_for_store(frame, to_encode) if to_encode else frame)
+
+    combined = pd.concat(frames, ignore_index=True) \
+                 .drop_duplicates(subset=assessment_key, keep='last')
+    combined.attrs['json_columns'] = json_cols
+    combined.attrs['config_version'] = self.config_version
+    self.exporter.export_dataframe(data_name=self.data_name, data=combined)
+    logging.info(f"Saved {len(combined)} parsed surveys to {self.data_name}")
+    self._stored = combined
+    self._pending = []
+
+
+def get_local_survey_store(folder:str, name:str="parsed_surveys") -> ParsedSurveyStore:
+  exporter = ParquetExporter({"location": f"{folder.rstrip('/')}/"})
+  return ParsedSurveyStore(LocalFileSource(folder), exporter
+                           , load_path=f"{name}.parquet", data_name=name)
+
+
+def get_blob_survey_store(container_name:str
+                          , blob_url:str="NADA/parsed_surveys.parquet") -> ParsedSurveyStore:
+  return ParsedSurveyStore(BlobFileSource(container_name), AzureBlobExporter(container_name)
+                           , load_path=blob_url, data_name=blob_url)
@@ -6,12 +6,15 @@ from assessment_episode_matcher import project_directory
 from assessment_episode_matcher.importers.main import BlobFileSource, FileSource
 from assessment_episode_matcher.setup.bootstrap import Bootstrap
 from assessment_episode_matcher.utils.environment import ConfigKeys
+from assessment_episode_matcher.setup.log_management import log_event
 from assessment_episode_matcher.utils.fromstr import get_date_from_str
 from assessment_episode_matcher.matching import main as match_helper
 from assessment_episode_matcher.matching.errors import process_errors_warnings
 
-from assessment_episode_matcher.importers import episodes as EpisodesImporter
-from assessment_episode_matcher.importers import assessments as ATOMsImporter
+from assessment_episode_matcher.configs import load_matcher_config
+from assessment_episode_matcher.dataset_cache import dataset_cache as host_dataset_cache
+from assessment_episode_matcher.source_loader import load_sources
+from assessment_episode_matcher.matched_handoff import write_matched
 from assessment_episode_matcher.exporters import main as  ExporterTypes #import LocalFileExporter as DataExporter
 # from assessment_episode_matcher.exporters.main import AzureBlobExporter as AuditExporter
 import assessment_episode_matcher.utils.df_ops_base as utdf
@@ -54,70 +57,66 @@ def main3():
     reporting_start, reporting_end = get_date_from_str (reporting_start_str,"%Y%m%d") \
                                       , get_date_from_str (reporting_end_str,"%Y%m%d")
 
-    ep_file_source:FileSource = BlobFileSource(container_name=container
-                                            , folder_path=ep_folder)
-
-    episode_df, ep_cache_to_path = EpisodesImporter.import_data(
-                            reporting_start_str, reporting_end_str
-                            , ep_file_source
-                            , prefix=ep_folder, suffix="AllPrograms")
-    if not utdf.has_data(episode_df):
-      logging.error("No episodes")
-      return json.dumps({"result":"no episode data"})
-    #TODO:
-    if ep_cache_to_path:
-      if ep_cache_to_path[-3:] =='csv':
-         ep_cache_to_path = f"{ep_cache_to_path[:-3]}parquet"
-         
-      exp = ExporterTypes.AzureBlobExporter(container_name=ep_file_source.container_name) #
-      exp.export_dataframe(data_name=ep_cache_to_path, data=episode_df)   
-                        # func.HttpResponse(body=json.dumps({"result":"no episode data"}),
-                        #         mimetype="application/json", status_code=200)
+    # the config, episodes and ATOMs are loaded concurrently (source_loader);
+    # on a warm host, the config and the prepared episodes/ATOMs of an earlier request are reused
+    # (a copy of each config version is kept locally, used if the container's can't be read)
+    def get_config():
+      return load_matcher_config(container, cache=host_dataset_cache
+                                 , local_folder=os.path.join(project_directory, "data", "configs"))
+
+    # the episode/ATOM caches are uploaded in the background as soon as they are ready,
+    # the matched assessments after matching; all awaited before returning
+    uploads = ExporterTypes.BackgroundExporter(
+                    ExporterTypes.AzureBlobExporter(container_name=container))
+    try:
+      ep_file_source:FileSource = BlobFileSource(container_name=container
+                                              , folder_path=ep_folder)
+      atom_file_source:FileSource = BlobFileSource(container_name=container
+                                              , folder_path=asmt_folder)
+      config, episode_df, atoms_df = load_sources(reporting_start, reporting_end
+                                                  , ep_file_source, atom_file_source, get_config
+                                                  , cache_exporter=uploads
+                                                  , ep_prefix=ep_folder, atom_prefix=asmt_folder
+                                                  , dataset_cache=host_dataset_cache)
+      if not utdf.has_data(episode_df):
+        logging.error("No episodes")
+        return json.dumps({"result":"no episode data"})
+      if not utdf.has_data(atoms_df):
+        logging.error("No ATOMs")
+        return json.dumps({"result":"no ATOM data"})
+
+      a_df, e_df, inperiod_atomslk_notin_ep, inperiod_epslk_notin_atom = \
+        match_helper.get_data_for_matching2(episode_df, atoms_df
+                                          , reporting_start, reporting_end, slack_for_matching=7)    
+      if not utdf.has_data(a_df) or not utdf.has_data(e_df):
+          log_event("no_data_to_match", logging.WARNING
+                    , atoms_shape=a_df.shape, episodes_shape=e_df.shape)
+          return None    
+    
+      final_good, ew = match_helper.match_and_get_issues(e_df, a_df
+                                            , inperiod_atomslk_notin_ep
+                                            , inperiod_epslk_notin_atom, slack_for_matching
+                                            , reporting_start, reporting_end, config)
 
+      warning_asmt_ids  = final_good.SLK_RowKey.unique()
     
-    atom_file_source:FileSource = BlobFileSource(container_name=container
-                                            , folder_path=asmt_folder)
-    atoms_df, atom_cache_to_path = ATOMsImporter.import_data(
-                            reporting_start_str, reporting_end_str
-                            , atom_file_source
-                            , prefix=asmt_folder, suffix="AllPrograms"
-                            , purpose=Purpose.NADA, refresh=True)
+      ae = ExporterTypes.AzureBlobExporter(container_name=atom_file_source.container_name
+                             ,config={'location' : 'errors_warnings'})
+
+      process_errors_warnings(ew, warning_asmt_ids, dk.client_id.value
+                              , period_start=reporting_start
+                              , period_end=reporting_end
+                              , audit_exporter=ae)
     
-    if atom_cache_to_path:
-      exp =  ExporterTypes.AzureBlobExporter(container_name=atom_file_source.container_name) #
-      exp.export_dataframe(data_name=atom_cache_to_path, data=atoms_df)    
-                            # , prefix="MDS", suffix="AllPrograms")
-    if not utdf.has_data(atoms_df):
-      logging.error("No ATOMs")
-      return json.dumps({"result":"no ATOM data"})
-
-    a_df, e_df, inperiod_atomslk_notin_ep, inperiod_epslk_notin_atom = \
-      match_helper.get_data_for_matching2(episode_df, atoms_df
-                                        , reporting_start, reporting_end, slack_for_matching=7)    
-    if not utdf.has_data(a_df) or not utdf.has_data(e_df):
-        print("No data to match. Ending")
-        return None    
-   
-    final_good, ew = match_helper.match_and_get_issues(e_df, a_df
-                                          , inperiod_atomslk_notin_ep
-                                          , inperiod_epslk_notin_atom, slack_for_matching)
-
-    warning_asmt_ids  = final_good.SLK_RowKey.unique()
-   
-    ae = ExporterTypes.AzureBlobExporter(container_name=atom_file_source.container_name
-                           ,config={'location' : 'errors_warnings'})
-
-    process_errors_warnings(ew, warning_asmt_ids, dk.client_id.value
-                            , period_start=reporting_start
-                            , period_end=reporting_end
-                            , audit_exporter=ae)
-  
 
-    df_reindexed = final_good.reset_index(drop=True)
+      df_reindexed = final_good.reset_index(drop=True)
 
-    exp = ExporterTypes.AzureBlobExporter(container_name=atom_file_source.container_name) #
-    exp.export_csv(data_name=f"NADA/{reporting_start_str}-{reporting_end_str}_reindexed.csv", data=df_reindexed)
-    # exp.export_data(data_name=f"NADA/{reporting_start_str}-{reporting_end_str}_reindexed.parquet", data=df_reindexed)      
+      # typed parquet + manifest, read by nada.get_matched_assessments
+      # (csv_exporter=uploads, csv_suffix=".csv" for the human-readable copy)
+      write_matched(df_reindexed, uploads, f"NADA/{reporting_start_str}-{reporting_end_str}_reindexed"
+                    , suffix=".parquet")
+    finally:
+      uploads.flush()
 
     #   # logging.info("Result object", json.dumps(result))
        
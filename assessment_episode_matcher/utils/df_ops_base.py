@@ -1,23 +1,83 @@
 
 import logging
 import datetime
+import weakref
+from collections import namedtuple
+from functools import partial
+import numpy as np
 import pandas as pd
 
 
 
 
-def safe_convert_to_int_strs(df1: pd.DataFrame, float_columns):
-    df2 = df1.copy()
+def safe_convert_to_int_strs(df1: pd.DataFrame, float_columns) -> pd.DataFrame:
+    """
+    Float columns -> int strings ("3.0" -> "3", NaN -> "").
+    Converts all the columns as one block (truncates like astype(int)).
+    """
+    float_columns = list(dict.fromkeys(float_columns))
     df = df1.copy()
+    if not float_columns:
+        return df
 
-    df2[float_columns] = df[float_columns].astype(str).replace('nan', '')
-    # df2[float_columns] = df2[float_columns].replace('nan', '')
+    block = df[float_columns]
+    missing = block.isna()
+    int_strs = block.fillna(0).astype('int64').astype(str).mask(missing, '')
+    df[float_columns] = int_strs
+    return df
 
-    for col in float_columns:
-        mask = ~df[col].isna()
-        df2.loc[mask, col] = df.loc[mask, col].astype(int).astype(str)
 
-    return df2
+class KeyIndex(object):
+    """
+    Hash index of a frame's key column:
+    uniques - the distinct key values (a pd.Index), codes - each row's position in uniques.
+    """
+
+    def __init__(self, df: pd.DataFrame, key: str):
+        self.key = key
+        # (missing keys get a code too: they match missing keys on the other side, as isin does)
+        self.codes, self.uniques = pd.factorize(df[key], use_na_sentinel=False)
+
+    def contains(self, values: pd.Index) -> np.ndarray:
+        return self.uniques.get_indexer(values) >= 0
+
+
+# (id(frame), key) -> (weakref to the frame, the key column's values, KeyIndex)
+_key_indexes: dict[tuple[int, str], tuple[weakref.ref, object, KeyIndex]] = {}
+
+
+def get_key_index(df: pd.DataFrame, key: str) -> KeyIndex:
+    """
+    The KeyIndex of df[key], built once per frame and key column:
+    rebuilt if the column has been replaced since.
+    """
+    values = df[key].values
+    cache_key = (id(df), key)
+    cached = _key_indexes.get(cache_key)
+    if cached and cached[0]() is df and cached[1] is values:
+        return cached[2]
+
+    key_index = KeyIndex(df, key)
+    frame_ref = weakref.ref(df, lambda _: _key_indexes.pop(cache_key, None))
+    _key_indexes[cache_key] = (frame_ref, values, key_index)
+    return key_index
+
+
+KeyMasks = namedtuple('KeyMasks', ['left_only', 'right_only', 'left_in_both', 'right_in_both'])
+
+
+def get_key_masks(left: pd.DataFrame, right: pd.DataFrame, key: str) -> KeyMasks:
+    """
+    Anti-/semi-join of left and right on key, as row masks of each frame:
+      left_only / right_only : key not in the other frame
+      left_in_both / right_in_both : key in both frames
+    Only the distinct keys are looked up in the other frame's (cached) KeyIndex.
+    """
+    left_index = get_key_index(left, key)
+    right_index = get_key_index(right, key)
+    left_in_both = right_index.contains(left_index.uniques)[left_index.codes]
+    right_in_both = left_index.contains(right_index.uniques)[right_index.codes]
+    return KeyMasks(~left_in_both, ~right_in_both, left_in_both, right_in_both)
 
 
 def get_delta_by_key(df1: pd.DataFrame
@@ -38,41 +98,48 @@ def get_delta_by_key(df1: pd.DataFrame
         - The first DataFrame contains rows from df1 that do not have matching keys in df2.
         - The second DataFrame (empty if common is False) contains rows from df1 with keys that are common to both DataFrames.
     """    
-    df1_keys = set(df1[key])
-    df2_keys = set(df2[key])
-    common_keys = df1_keys.intersection(df2_keys)
-    
-    mask = df1[key].isin(common_keys)
-    not_in_df2 = df1[~mask]
+    masks = get_key_masks(df1, df2, key)
+    not_in_df2 = df1[masks.left_only]
     
     if common:
-        return not_in_df2, df1[mask]
+        return not_in_df2, df1[masks.left_in_both]
         
     return not_in_df2, pd.DataFrame()
 
 
 def filter_out_common(df1: pd.DataFrame, df2: pd.DataFrame, key: str) -> pd.DataFrame:
-    df1_keys = set(df1[key])
-    df2_keys = set(df2[key])
-    common_keys = df1_keys.intersection(df2_keys)
-    filtered_df = df1[~df1[key].isin(common_keys)]
-    return filtered_df
+    return df1[get_key_masks(df1, df2, key).left_only]
 
 
 def has_data(df: pd.DataFrame | None) -> bool:
     return not (df is None or df.empty)
 
 
-def get_dupes_by_key(df: pd.DataFrame, key: str):
+def none_to_nan(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parquet gives None for missing text/date values, pandas' own frames have NaN.
+    (in place; the object columns stay object)
+    """
+    for col in df.columns[df.dtypes == object]:
+        values = df[col].to_numpy(dtype=object, copy=True)
+        values[pd.isna(values)] = np.nan
+        df[col] = values
+    return df
+
 
-    counts = df.groupby(key)[key].value_counts()
-    if counts.empty:
+def get_dupes_by_key(df: pd.DataFrame, key: str):
+    """
+    Rows whose key value occurs more than once (all of them), None if there are none.
+    Missing keys are never duplicates.
+    """
+    if not has_data(df):
         return None
 
-    duplicates = counts[counts > 1].index.tolist()
-    if not duplicates:
+    codes, _ = pd.factorize(df[key])
+    is_dupe = pd.Series(codes).duplicated(keep=False).to_numpy() & (codes >= 0)
+    if not is_dupe.any():
         return None
-    return df[df[key].isin(duplicates)]
+    return df[is_dupe]
 
 
 from datetime import date
@@ -119,48 +186,56 @@ def get_firststart_lastend(first_dt_series: pd.Series, last_dt_series: pd.Series
     return first_start, last_end
 
 
-def to_num_yn_none(x) -> str | None:
-    if x == 'No':
-        return '0'
-    elif not pd.isna(x):
-        return '1'
-    else:
-        return None
+def codes_from_mapping(series: pd.Series, mapping: dict, other=None) -> pd.Series:
+    """
+    Categorical answer -> code via a lookup table (one hash lookup for the column).
+    Answers not in the table get `other`; missing answers stay None.
+    """
+    codes = series.map(mapping)
+    unmapped = codes.isna().to_numpy() & series.notna().to_numpy()
+    codes = np.where(unmapped, other, codes.to_numpy(dtype=object))
+    return pd.Series(np.where(series.notna(), codes, None), index=series.index, dtype=object)
 
 
-def to_num_bool_none(x: bool | None) -> str | None:
-    if pd.isna(x):
-        return None
-    if x == True:
-        return '1'
-    return '0'
+def codes_from_bool(series: pd.Series) -> pd.Series:
+    """
+    True -> '1', anything else -> '0', missing -> None.
+    A bool column can't have missing values, so it skips the null check.
+    """
+    codes = np.where(series.eq(True), '1', '0').astype(object)
+    if not pd.api.types.is_bool_dtype(series):
+        codes[series.isna().to_numpy()] = None
+    return pd.Series(codes, index=series.index, dtype=object)
+
 
+# transform names (as used in data_config.nada_field_transforms) -> vectorized transformer
+field_transformers = {
+    'yes_no': partial(codes_from_mapping, mapping={'No': '0'}, other='1'),
+    'bool': codes_from_bool,
+}
 
-def transform_multiple(df1: pd.DataFrame, fields: list[str], transformer_fn) -> pd.DataFrame:
+
+def transform_fields(df1: pd.DataFrame, field_transforms: dict[str, str]) -> pd.DataFrame:
+    """
+    field_transforms: field name -> name of its transform in field_transformers.
+    All the fields present in df are transformed and written back in one go.
+    """
     df = df1.copy()
     # "None of [Index(['Past4WkBeenArrested', 'Past4WkHaveYouViolenceAbusive'], dtype='object')] are in the [columns]"
-    fields_indf = [f for f in fields if f in df.columns]
+    fields_indf = {f: t for f, t in field_transforms.items() if f in df.columns}
     if not fields_indf:
-        logging.info(f"transform_multiple: fields {fields} not in df columns {df.columns}")
+        logging.info("transform_fields: fields %s not in df columns %s", list(field_transforms), df.columns)
         return df
-    # if len(fields_indf) !=  len(df.columns):
-    #   fields_noindf = [f for f in fields if f not in df.columns]
-    #   logging.error(f"fields {fields_noindf} not in df columns {df.columns}")
 
-    df[fields_indf] = df[fields_indf].apply(
-        lambda field_series: field_series.apply(transformer_fn))
+    transformed = {field: field_transformers[transform](df[field])
+                   for field, transform in fields_indf.items()}
+    df[list(transformed)] = pd.DataFrame(transformed, index=df.index)
     return df
 
 
-
 def prescribe_fields(matched_df, final_fields):
-  df_final = pd.DataFrame(columns=final_fields)
-
-  for column in final_fields:
-      if column in matched_df.columns:
-          df_final[column] = matched_df[column]  # Or use another default value
-      else:
-          df_final[column] =""
+  # fields not in matched_df are added as blanks
+  df_final = matched_df.reindex(columns=final_fields, fill_value="")
   return df_final
   
 
@@ -114,6 +114,15 @@ def date_str_format(date_string, infmt='%Y-%m-%d', outfmt='%d%m%Y'):
     return date_object.strftime(outfmt)
 
 
+def date_series_format(date_strings:pd.Series, infmt='%Y-%m-%d', outfmt='%d%m%Y') -> pd.Series:
+    """
+    Column-wise version of date_str_format: parses the whole Series in one go.
+    Raises ValueError if any of the strings doesn't match infmt.
+    """
+    date_objects = pd.to_datetime(date_strings, format=infmt)
+    return date_objects.dt.strftime(outfmt)
+
+
 def date_to_str(date_obj: date|pd.Series, str_fmt='yyyymmdd') -> str|pd.Series:
     """
     Convert a single date object or a Series of dates to a formatted string or a Series of formatted strings.
@@ -158,7 +167,7 @@ def define_all_categories(df:pd.DataFrame):
                         )
                         for field in question_list_for_categories]
   
-  logging.debug(f"category_nametypes: {category_nametypes}")
+  logging.debug("category_nametypes: %s", category_nametypes)
 
   df1 = df.copy()  
   # Field elements must be 2- or 3-tuples, got ''Yes - Completely safe''
@@ -229,7 +238,7 @@ def fix_numerics(df1: pd.DataFrame):
   df = df1.copy()
   
   numeric_fields = [k for k, v in data_types.items() if v == 'numeric' and k in df.columns]
-  logging.debug(f"numeric_fields: {numeric_fields}")
+  logging.debug("numeric_fields: %s", numeric_fields)
   df[numeric_fields] = df[numeric_fields].apply(pd.to_numeric, errors='coerce') # ignore ?
 
   # range_fields = [k for k, v in data_types.items() if v == 'range']
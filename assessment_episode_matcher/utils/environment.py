@@ -15,6 +15,13 @@ class ConfigKeys(Enum):
   SURVEY_TABLE_NAME =  'SURVEY_TABLE_NAME'
   MATCHING_NDAYS_SLACK = 'MATCHING_NDAYS_SLACK'
   AZURE_BLOB_CONTAINER = 'AZURE_BLOB_CONTAINER'
+  DATASET_CACHE_MAX_MB = 'DATASET_CACHE_MAX_MB'
+  DATASET_CACHE_TTL_SECONDS = 'DATASET_CACHE_TTL_SECONDS'
+  PROFILE_STAGES = 'PROFILE_STAGES'
+  PROFILER = 'PROFILER'
+  PROFILE_TOP_N = 'PROFILE_TOP_N'
+  PROFILE_DIR = 'PROFILE_DIR'
+  NADA_PREP_WORKERS = 'NADA_PREP_WORKERS'
   
 class ConfigManager:
     _instance = None
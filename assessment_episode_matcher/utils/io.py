@@ -7,7 +7,6 @@ import pandas as pd
 from assessment_episode_matcher.importers.main import FileSource
 from assessment_episode_matcher.utils.dtypes import convert_float_to_datetime
 import assessment_episode_matcher.utils.df_ops_base as utdf
-from assessment_episode_matcher.azutil.helper import get_results
 
 # from filters import get_outfilename_for_filters
 
@@ -92,6 +91,8 @@ def read_parquet_to_df(file_path:Path) -> pd.DataFrame:
 
 def get_from_source(table:str, start_date:int, end_date:int
                   , filters:dict|None={}):#, add_to_cache:bool=False):
+  # (the Azure Tables SDK is only imported when the table backend is used)
+  from assessment_episode_matcher.azutil.helper import get_results
   results = get_results(table, start_date, end_date, filters)
   if not results:
     logging.info("Zero results returned from get_results (backend)")
@@ -144,7 +145,8 @@ def refresh_dataset(df1:pd.DataFrame, df2:pd.DataFrame):
 
   merged_updated = utdf.update(df1, df2, on=key_columns)
   if not merged_updated:
-     logging.info(f"Nothing to merge - no change. New df:\n {df2} ")
+     logging.info("Nothing to merge - no change.")
+     logging.debug("New df:\n %s", df2)
      return None
   merged_len = len(merged_updated)
   logging.info(f" Original len() df: {len(df1)} Merged df length {merged_len}.")
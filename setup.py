@@ -23,6 +23,9 @@ setup(
       
     packages=find_packages(),
     install_requires=get_requirements(),
+    extras_require={
+        'duckdb': ['duckdb'],
+    },
     python_requires='>=3.10',
 
     # long_description=long_description, 
@@ -0,0 +1,90 @@
+import json
+from datetime import date, timedelta
+import pandas as pd
+import pytest
+
+
+def _survey(i:int) -> dict:
+    """SurveyData for the i-th synthetic assessment (mix of old/new drug structures)"""
+    survey = {
+        'SDSIsAODUseOutOfControl': i % 4,
+        'SDSDoYouWishToStop': (i + 1) % 4,
+        'K10Q01': (i % 5) + 1,
+        'Past4WkMentalHealth': i % 11,
+        'Past4WkQualityOfLifeScore': (i * 3) % 11,
+        'Past4WkBeenArrested': ['No', 'Yes', 'Yes - please provide details'][i % 3],
+        'Past4WkAodRisks': [['Homeless'], ['At risk of eviction', 'Violence / Assault'], []][i % 3],
+        'PrimaryCaregiver': ['Yes - primary caregiver: children under 5 years old'] if i % 2 else ['No'],
+        'Past4WkEngagedInOtheractivities': {'Paid Work': {'Days': str(i % 20)}} if i % 3 == 0 else {},
+        'ITSPNotes': 'dropped',
+    }
+    if i % 5 == 4:
+        survey['Past4WkHaveYouViolenceAbusive'] = 'No'
+    if i % 2:
+        survey['PDCSubstanceOrGambling'] = 'Ethanol'
+        survey['DrugsOfConcernDetails'] = [
+            {'DrugsOfConcern': 'Ethanol', 'DaysInLast28': str(i % 28),
+             'Units': 'standard drinks', 'HowMuchPerOccasion': '5-6'},
+            {'DrugsOfConcern': 'Caffeine', 'DaysInLast28': '2', 'Units': 'cups',
+             'HowMuchPerOccasion': 'Other'},
+        ]
+    else:
+        survey['PDC'] = [{'PDCSubstanceOrGambling': 'Cannabinoids', 'PDCDaysInLast28': str(i % 28),
+                          'PDCHowMuchPerOccasion': str(i % 7), 'PDCUnits': 'grams'}]
+        survey['ODC'] = [{'OtherSubstancesConcernGambling': 'Nicotine', 'DaysInLast28': '28',
+                          'HowMuchPerOccasion': '10', 'Units': ''}]
+    return survey
+
+
+@pytest.fixture
+def nada_config():
+    return {
+        "drug_categories": {
+            "Alcohol": ["Ethanol"],
+            "Cannabis": ["Cannabinoids", "Cannabis"],
+            "Nicotine": ["Nicotine"],
+        }
+    }
+
+
+@pytest.fixture
+def matched_assessments():
+    """Matched (reindexed) assessments, all str as read back from the matching stage"""
+    n = 23
+    return pd.DataFrame({
+        'SLK': [f"SLK{(i * 7) % 9:02d}" for i in range(n)],
+        'RowKey': [f"rk{i:03d}" for i in range(n)],
+        'Program': ['TSS'] * n,
+        'Staff': ['staff1'] * n,
+        'AssessmentDate': [f"2024-0{1 + i % 3}-{10 + i % 17:02d}" for i in range(n)],
+        'SurveyData': [json.dumps(_survey(i)) for i in range(n)],
+        'Timestamp': [f"2024-04-0{1 + i % 5} 02:48:44.{i:06d}+00:00" for i in range(n)],
+        'ESTABLISHMENT IDENTIFIER': ['820002000'] * n,
+        'PMSEpisodeID': [str(5000 + i // 2) for i in range(n)],
+        'PMSPersonID': [str(40 + i % 9) for i in range(n)],
+        'PDCCode': [str(i % 3 + 1) for i in range(n)],
+    })
+
+
+@pytest.fixture
+def matching_inputs():
+    """Episodes and ATOMs (dates as datetime.date), as the importers hand them to matching"""
+    eps, asmts = [], []
+    for c in range(12):
+        slk = f"CLNT{c:02d}0101199{c % 2}1"
+        program = ['TSS', 'ARCA'][c % 2]
+        start = date(2024, 1, 1) + timedelta(days=7 * c)
+        eps.append(dict(SLK=slk, Program=program, PMSEpisodeID=f"E{c:03d}", PMSPersonID=f"P{c:03d}",
+                        CommencementDate=start, EndDate=start + timedelta(days=60)))
+        # the last assessment may fall after the episode end; some are in the other program
+        for i, offset in enumerate([0, 28, 59 + (c % 4) * 3]):
+            asmt_program = program if (c + i) % 5 else ['TSS', 'ARCA'][(c + 1) % 2]
+            asmt_date = start + timedelta(days=offset - (c % 3))
+            asmts.append(dict(SLK=slk, RowKey=f"{asmt_program}_INAS_{asmt_date:%Y%m%d}"
+                              , Program=asmt_program, AssessmentDate=asmt_date, Staff='staff1'))
+    # a client with assessments only, and one with episodes only
+    asmts.append(dict(SLK='ONLYASMT0101', RowKey='TSS_INAS_20240201', Program='TSS',
+                      AssessmentDate=date(2024, 2, 1), Staff='staff1'))
+    eps.append(dict(SLK='ONLYEPSD0101', Program='TSS', PMSEpisodeID='E900', PMSPersonID='P900',
+                    CommencementDate=date(2024, 2, 1), EndDate=date(2024, 3, 1)))
+    return pd.DataFrame(eps), pd.DataFrame(asmts)
@@ -0,0 +1,40 @@
+import pandas as pd
+from assessment_episode_matcher.aod_warnings import AODWarnings
+from assessment_episode_matcher.azutil.file_types import BlobCSVFilePrepper
+from assessment_episode_matcher.mytypes import AODWarning, CSVTypeObject
+
+
+def _warnings():
+    return [
+        AODWarning('SLK1', 'rk1', drug_name='Kava', field_name='DrugsOfConcern'),
+        AODWarning('SLK1', 'rk1', drug_name='DrugsOfConcern', field_name='HowMuchPerOccasion'
+                   , field_value='Other'),
+        AODWarning('SLK2', 'rk2', drug_name='Kava', field_name='DrugsOfConcern'),
+        AODWarning('SLK3', 'rk3', drug_name='', field_name='structure', field_value=None),
+    ]
+
+
+def test_csv_same_as_per_row_writer():
+    warnings = AODWarnings(_warnings())
+    header = ["SLK", "RowKey", "drug_name", "field_name", "field_value"]
+    per_row = BlobCSVFilePrepper().get_file_for_blob(CSVTypeObject(header=header, rows=_warnings()))
+
+    assert warnings.to_csv() == per_row
+    assert list(warnings) == _warnings()
+    assert warnings.to_arrow().num_rows == len(warnings) == 4
+
+
+def test_extend_masked_and_summary():
+    df = pd.DataFrame({'SLK': ['A', 'B', 'C'], 'RowKey': ['1', '2', '3']
+                       , 'Units': ['', 'cups', '']})
+    warnings = AODWarnings(_warnings())
+    warnings.extend_masked(df, df['Units'] == '', field_name='Units'
+                           , drug_name=pd.Series(['Kava', 'Tea', 'Coffee']))
+
+    frame = warnings.to_frame()
+    assert frame.tail(2)[['SLK', 'drug_name', 'field_name']].values.tolist() \
+              == [['A', 'Kava', 'Units'], ['C', 'Coffee', 'Units']]
+
+    summary = warnings.summary()
+    assert summary.iloc[0].tolist() == ['Kava', 'DrugsOfConcern', 2]
+    assert summary['count'].sum() == len(warnings) == 6
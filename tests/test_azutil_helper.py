@@ -127,4 +127,36 @@ def test_get_clinical_assessment():
         
         assert result is not None
         assert result.AssessmentType == 'ClinicalAssessment'
-        assert result.id == '2'
\ No newline at end of file
+        assert result.id == '2'
+
+
+def _by_partition(select_fields, filter_template, query_params):
+    # each client has one entity; the partition queries only see their own client's
+    entities = [{'PartitionKey': f"SLK{i}", 'RowKey': str(i)} for i in range(5)]
+    return [e for e in entities if f"'{e['PartitionKey']}'" in filter_template
+            or filter_template.startswith("PartitionKey ge")]
+
+
+def test_get_results_queries_each_client_partition(mock_table_query):
+    mock_table_query.query_table.side_effect = _by_partition
+
+    results = get_results('ATOM', 20240101, 20240331
+                          , filters={'lists': {'Program': ['P1'], 'PartitionKey': ['SLK1', 'SLK3']}})
+
+    filters = [c[1]['filter_template'] for c in mock_table_query.query_table.call_args_list]
+    assert sorted(f.split(' and ')[0] for f in filters) == ["(PartitionKey eq 'SLK1')"
+                                                          , "(PartitionKey eq 'SLK3')"]
+    assert all("(Program eq 'P1')" in f for f in filters)
+    assert sorted(r['PartitionKey'] for r in results) == ['SLK1', 'SLK3']
+
+
+def test_get_results_range_scan_for_many_clients(mock_table_query):
+    mock_table_query.query_table.side_effect = _by_partition
+
+    results = get_results('ATOM', 20240101, 20240331, max_partition_queries=1
+                          , filters={'lists': {'PartitionKey': ['SLK3', 'SLK1']}})
+
+    assert mock_table_query.query_table.call_count == 1
+    filter_str = mock_table_query.query_table.call_args[1]['filter_template']
+    assert filter_str.startswith("PartitionKey ge 'SLK1' and PartitionKey le 'SLK3'")
+    assert sorted(r['PartitionKey'] for r in results) == ['SLK1', 'SLK3']
@@ -0,0 +1,72 @@
+from datetime import date, timedelta
+import pandas as pd
+from assessment_episode_matcher.batch import run_periods, get_period_str, get_covering_period, \
+    load_covering_data
+from assessment_episode_matcher.exporters.main import CSVExporter
+from assessment_episode_matcher.importers.main import LocalFileSource
+from assessment_episode_matcher.pipeline import get_nada_pipeline
+
+SLACK = 7
+QUARTERS = [(date(2024, 1, 1), date(2024, 3, 31)), (date(2024, 4, 1), date(2024, 6, 30))]
+CONFIG = {'EstablishmentID_Program': {'EST1': 'TSS', 'EST2': 'ARCA'}
+          , 'purpose_programs': {'NADA': ['TSS', 'ARCA']}}
+
+
+def _write_sources(folder, period, episodes, asmts):
+    """
+    The period's MDS extract (episodes open in it) and ATOM extract: from the start of
+    its earliest episode (less the slack), as the earlier ATOMs set the Stage numbering.
+    """
+    start, end = period
+    p_str = get_period_str(period)
+    eps = episodes[(episodes['CommencementDate'] <= end) & (episodes['EndDate'] >= start)]
+    pd.DataFrame({
+        'ESTABLISHMENT IDENTIFIER': eps['Program'].map({'TSS': 'EST1', 'ARCA': 'EST2'}),
+        'EPISODE ID': eps['PMSEpisodeID'], 'PERSON ID': eps['PMSPersonID'], 'SLK': eps['SLK'],
+        'START DATE': [f"{d:%d%m%Y}" for d in eps['CommencementDate']],
+        'END DATE': [f"{d:%d%m%Y}" for d in eps['EndDate']],
+    }).to_csv(folder / "MDS" / f"MDS_{p_str}_AllPrograms.csv", index=False)
+    asmts_start = eps['CommencementDate'].min() - timedelta(days=SLACK)
+    extract = asmts[(asmts['AssessmentDate'] >= asmts_start) & (asmts['AssessmentDate'] <= end)]
+    extract.reset_index(drop=True).to_parquet(folder / "ATOM" / f"ATOM_{p_str}_AllPrograms.parquet")
+
+
+def _audit_files(folder):
+    return {f.name: f.read_text() for f in sorted(folder.iterdir())}
+
+
+def test_batch_periods_same_as_each_period_alone(tmp_path, matching_inputs):
+    episodes, asmts = matching_inputs
+    for sub in ["MDS", "ATOM", "NADA", "batch", "alone"]:
+        (tmp_path / sub).mkdir()
+    for period in [*QUARTERS, get_covering_period(QUARTERS)]:
+        _write_sources(tmp_path, period, episodes, asmts)
+    ep_source, atom_source = LocalFileSource(str(tmp_path / "MDS")), LocalFileSource(str(tmp_path / "ATOM"))
+
+    def get_audit_exporter(p_str):
+        (tmp_path / "batch" / p_str).mkdir()
+        return CSVExporter({'location': f"{tmp_path}/batch/{p_str}/"})
+
+    covering_eps, covering_atoms = load_covering_data(QUARTERS, CONFIG, ep_source, atom_source)
+    results = run_periods(QUARTERS, covering_eps, covering_atoms, CONFIG, SLACK
+                          , CSVExporter({'location': f"{tmp_path}/"}), get_audit_exporter
+                          , targets=['audit', 'reindexed'], max_workers=2)
+
+    assert list(results) == [get_period_str(q) for q in QUARTERS]
+    for quarter in QUARTERS:
+        p_str = get_period_str(quarter)
+        batch_reindexed = pd.read_csv(tmp_path / "NADA" / f"{p_str}_reindexed.csv", dtype=str)
+
+        # the pipeline for the quarter on its own, from the quarter's own extracts
+        (tmp_path / "alone" / p_str).mkdir()
+        alone = get_nada_pipeline(CONFIG, ep_source, atom_source
+                                  , CSVExporter({'location': f"{tmp_path}/"})
+                                  , CSVExporter({'location': f"{tmp_path}/alone/{p_str}/"})) \
+                  .run({'reporting_start': quarter[0], 'reporting_end': quarter[1]
+                        , 'slack_for_matching': SLACK}, targets=['audit', 'reindexed'])
+
+        assert len(alone['atoms']) < len(covering_atoms)
+        pd.testing.assert_frame_equal(results[p_str]['reindexed'], alone['reindexed'])
+        pd.testing.assert_frame_equal(
+            pd.read_csv(tmp_path / "NADA" / f"{p_str}_reindexed.csv", dtype=str), batch_reindexed)
+        assert _audit_files(tmp_path / "batch" / p_str) == _audit_files(tmp_path / "alone" / p_str)
@@ -0,0 +1,160 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+from assessment_episode_matcher.client_index import get_local_client_index
+from assessment_episode_matcher.pipeline import Pipeline, Stage, matching_stages, client_index_stage
+from assessment_episode_matcher.importers import assessments as ATOMsImporter
+from assessment_episode_matcher.importers.main import LocalFileSource
+from assessment_episode_matcher.mytypes import Purpose
+
+
+def _artifacts():
+    slks = [f"SLK{i % 7:02d}" for i in range(40)]
+    atoms = pd.DataFrame({'SLK': slks, 'RowKey': [str(i) for i in range(40)]
+                          , 'Program': ['TSS', 'EURO'] * 20
+                          , 'AssessmentDate': pd.date_range('2024-01-01', periods=40, freq='2D')
+                          , 'PDC': [[{'PDCSubstanceOrGambling': 'Ethanol'}] if i % 3 else np.nan
+                                    for i in range(40)]}
+                         , index=range(100, 140))
+    episodes = pd.DataFrame({'SLK': ['SLK01', 'SLK03', None], 'PMSEpisodeID': ['e1', 'e3', 'ex']})
+    no_slk = pd.DataFrame({'x': [1]})
+    return {'atoms': atoms, 'episodes': episodes, 'no_slk': no_slk}
+
+
+def test_lookup_client_returns_each_artifacts_rows(tmp_path):
+    store = get_local_client_index(str(tmp_path), num_partitions=4)
+    artifacts = _artifacts()
+    store.write(artifacts)
+
+    reader = get_local_client_index(str(tmp_path), num_partitions=4)
+    found = reader.lookup_client('SLK03')
+
+    assert list(found) == ['atoms', 'episodes', 'no_slk']
+    atoms = artifacts['atoms']
+    pd.testing.assert_frame_equal(found['atoms'], atoms[atoms['SLK'] == 'SLK03'], check_dtype=False)
+    assert found['episodes']['PMSEpisodeID'].tolist() == ['e3']
+    assert found['no_slk'].empty
+    assert all(f.empty for f in reader.lookup_client('NOSUCHSLK').values())
+
+
+def _rewritten_artifacts():
+    # another run: SLK03's rows are elsewhere in its partition, with other RowKeys
+    atoms = _artifacts()['atoms'].iloc[5:]
+    return {'atoms': atoms.assign(RowKey=[f"new{i}" for i in range(len(atoms))])}
+
+
+def test_lookup_after_another_run_rewrote_the_index(tmp_path):
+    reader = get_local_client_index(str(tmp_path), num_partitions=4)
+    get_local_client_index(str(tmp_path), num_partitions=4).write(_artifacts())
+    assert not reader.lookup_client('SLK03')['atoms'].empty
+
+    rewritten = _rewritten_artifacts()
+    get_local_client_index(str(tmp_path), num_partitions=4).write(rewritten)
+    atoms = rewritten['atoms']
+    pd.testing.assert_frame_equal(reader.lookup_client('SLK03')['atoms']
+                                  , atoms[atoms['SLK'] == 'SLK03'], check_dtype=False)
+
+
+def test_stale_index_not_applied_to_rewritten_partitions(tmp_path):
+    get_local_client_index(str(tmp_path), num_partitions=4).write(_artifacts()
+                                                                  , period=('20240101', '20240331'))
+    index_file = tmp_path / "client_index_index.parquet"
+    first_index = index_file.read_bytes()
+    # another run has written its partitions, but not yet its index
+    get_local_client_index(str(tmp_path), num_partitions=4).write(_rewritten_artifacts())
+    index_file.write_bytes(first_index)
+
+    reader = get_local_client_index(str(tmp_path), num_partitions=4)
+    with pytest.raises(ValueError):
+        reader.lookup_client('SLK03')
+    rows, missing = reader.lookup_for_period(['SLK03'], '20240101', '20240331', artifact='atoms')
+    assert rows.empty and missing == ['SLK03']
+
+
+class NoFiles:
+    def __getattr__(self, name):
+        pytest.fail("the ATOM files should not be read")
+
+
+CONFIG = {'purpose_programs': {'NADA': ['TSS']}}
+
+
+@pytest.fixture
+def source_queries(monkeypatch):
+    """The source (table) queries made, each answered with one ATOM per SLK asked for"""
+    queries = []
+
+    def get_from_source(table, start_date, end_date, filters):
+        slks = filters['lists']['PartitionKey']
+        queries.append((start_date, end_date, list(slks)))
+        return pd.DataFrame({'PartitionKey': slks, 'RowKey': [f"db{i}" for i in range(len(slks))]
+                             , 'Program': 'TSS', 'AssessmentDate': [float(start_date)] * len(slks)})
+    monkeypatch.setattr(ATOMsImporter.io, 'get_from_source', get_from_source)
+    return queries
+
+
+def _import_atoms(store, start, end, slks, file_source=None):
+    return ATOMsImporter.import_data(start, end, file_source or NoFiles()
+                                     , prefix='ATOM', suffix='AllPrograms'
+                                     , purpose=Purpose.NADA, config=CONFIG
+                                     , only_for_slks=slks, client_index=store)
+
+
+def test_import_atoms_for_slks_from_client_index(tmp_path, source_queries):
+    store = get_local_client_index(str(tmp_path), num_partitions=4)
+    store.write(_artifacts(), period=('20240101', '20240331'))
+
+    atoms, to_cache = _import_atoms(store, '20240101', '20240331', ['SLK01', 'SLK02'])
+    assert to_cache is None
+    assert sorted(atoms['SLK'].unique()) == ['SLK01', 'SLK02']
+    assert set(atoms['Program']) == {'TSS'}
+    assert source_queries == []
+
+    # a shorter period inside the indexed one: only its ATOMs
+    atoms, _ = _import_atoms(store, '20240101', '20240131', ['SLK01'])
+    assert atoms['AssessmentDate'].max() <= pd.Timestamp('2024-01-31')
+    assert source_queries == []
+
+
+def test_import_atoms_clients_not_in_client_index_from_source(tmp_path, source_queries):
+    store = get_local_client_index(str(tmp_path), num_partitions=4)
+    store.write(_artifacts(), period=('20240101', '20240331'))
+
+    atoms, to_cache = _import_atoms(store, '20240101', '20240331', ['SLK01', 'NEWSLK'])
+    assert to_cache is None
+    assert source_queries == [(20240101, 20240331, ['NEWSLK'])]
+    assert sorted(atoms['SLK'].unique()) == ['NEWSLK', 'SLK01']
+    assert atoms.loc[atoms['SLK'] == 'NEWSLK', 'RowKey'].tolist() == ['db0']
+
+
+def test_client_index_of_another_period_not_used(tmp_path, source_queries):
+    store = get_local_client_index(str(tmp_path), num_partitions=4)
+    store.write(_artifacts(), period=('20240101', '20240331'))
+
+    no_files = tmp_path / "ATOM"
+    no_files.mkdir()
+    atoms, _ = _import_atoms(store, '20250101', '20250331', ['SLK01'], LocalFileSource(str(no_files)))
+    assert source_queries == [(20250101, 20250331, ['SLK01'])]
+    assert atoms['RowKey'].tolist() == ['db0']
+
+    store.write(_artifacts())  # (no period recorded)
+    _import_atoms(store, '20240101', '20240331', ['SLK01'], LocalFileSource(str(no_files)))
+    assert len(source_queries) == 2
+
+
+def test_pipeline_run_writes_client_index(tmp_path, matching_inputs):
+    episodes, asmts = matching_inputs
+    params = {'reporting_start': date(2024, 1, 1), 'reporting_end': date(2024, 6, 30)
+              , 'slack_for_matching': 7}
+    sources = [Stage('episodes', lambda: {'episodes': episodes}, outputs=['episodes'], cache=False),
+               Stage('atoms', lambda: {'atoms': asmts}, outputs=['atoms'], cache=False)]
+    store = get_local_client_index(str(tmp_path))
+    out = Pipeline([*sources, *matching_stages({}), client_index_stage(store)]).run(params)
+
+    final_good = out['final_good']
+    slk = final_good['SLK'].iloc[0]
+    found = get_local_client_index(str(tmp_path)).lookup_client(slk)
+    pd.testing.assert_frame_equal(found['final_good'], final_good[final_good['SLK'] == slk]
+                                  , check_dtype=False)
+    assert found['episodes']['SLK'].tolist() == episodes[episodes['SLK'] == slk]['SLK'].tolist()
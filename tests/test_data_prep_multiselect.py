@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+import pytest
+from assessment_episode_matcher.data_prep import multiselect_to_nadafields
+from assessment_episode_matcher.utils.base import check_for_string
+
+OPTIONS = {'ATOPRiskEviction': "At risk of eviction",
+           'ATOPHomeless': "Homeless",
+           'PaidWorkDays': 'Days'}
+
+
+@pytest.mark.parametrize("answers", [
+    [["Homeless"], ["At risk of eviction", "Homeless"], [], ["Other"]],
+    [["Homeless"], None, np.nan, []],
+    [{'Days': 3}, {'Days': 12}, None],
+    [{'Days': '4'}, {'Other': 1}, ["Homeless"], "Homeless"],
+    [np.nan, np.nan],
+])
+def test_multiselect_matches_check_for_string(answers):
+    s = pd.Series(answers, index=range(10, 10 + len(answers)), dtype=object)
+    result = multiselect_to_nadafields(s, OPTIONS)
+
+    for nadafield, search_str in OPTIONS.items():
+        expected = s.apply(lambda x: check_for_string(x, search_str))
+        pd.testing.assert_series_equal(result[nadafield], expected, check_names=False)
@@ -0,0 +1,60 @@
+import pandas as pd
+from assessment_episode_matcher.dataset_cache import DatasetCache, estimate_size, load_versioned
+from assessment_episode_matcher.importers.main import LocalFileSource
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _frame(n):
+    return pd.DataFrame({'SLK': [f"SLK{i:08d}" for i in range(n)]})
+
+
+def test_lru_eviction_by_size_ttl_and_stats():
+    clock = FakeClock()
+    size = estimate_size(_frame(100))
+    cache = DatasetCache(max_bytes=int(size * 2.5), ttl_seconds=60, clock=clock)
+
+    cache.put('a', _frame(100))
+    cache.put('b', _frame(100))
+    assert cache.get('a') is not None      # 'b' is now the least recently used
+    cache.put('c', _frame(100))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+
+    clock.now = 61
+    assert cache.get('a') is None
+    assert cache.get_stats() == {'hits': 3, 'misses': 2, 'evictions': 1, 'expirations': 1
+                                 , 'entries': 1, 'bytes': size}
+
+
+def test_cached_copy_is_not_changed_by_callers():
+    cache = DatasetCache(max_bytes=10**7, ttl_seconds=60)
+    first = cache.get_or_load('k', lambda: (_frame(3), None))
+    first[0]['SLK'] = 'changed'
+    assert cache.get('k')[0]['SLK'].tolist() == ['SLK00000000', 'SLK00000001', 'SLK00000002']
+
+
+def test_keyed_by_file_version(tmp_path):
+    cache = DatasetCache(max_bytes=10**7, ttl_seconds=60)
+    source = LocalFileSource(str(tmp_path))
+    path = tmp_path / "MDS_20240101-20240331_AllPrograms.csv"
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return pd.read_csv(path)
+
+    path.write_text("SLK\nA\n")
+    load_versioned(cache, source, path.name, loader)
+    load_versioned(cache, source, path.name, loader)
+    assert len(loads) == 1
+
+    path.write_text("SLK\nA\nB\n")
+    assert len(load_versioned(cache, source, path.name, loader)) == 2
+    assert len(loads) == 2
@@ -0,0 +1,26 @@
+from datetime import date
+import pandas as pd
+from assessment_episode_matcher.matching.date_checks import get_assessment_boundary_issues, \
+    date_boundary_validators
+
+
+def test_boundary_issues_nearest_episode_and_rule_order():
+    unmatched = pd.DataFrame({
+        'SLK_RowKey': ['B_1', 'A_1', 'A_1', 'C_1', 'D_1'],
+        'AssessmentDate': [date(2024, 3, 5), date(2024, 1, 20), date(2024, 1, 20)
+                           , date(2024, 2, 25), date(2024, 1, 28)],
+        'CommencementDate': [date(2024, 1, 1), date(2024, 2, 1), date(2024, 1, 25)
+                             , date(2024, 1, 1), date(2024, 2, 1)],
+        'EndDate': [date(2024, 3, 1), date(2024, 3, 1), date(2024, 2, 20)
+                    , date(2024, 2, 1), date(2024, 3, 1)],
+    }, index=[10, 11, 12, 13, 14])
+
+    ew = get_assessment_boundary_issues(unmatched, date_boundary_validators(limit_days=7))
+
+    # A_1: the episode starting 5 days after it (not 12), before-start warnings first
+    assert ew['SLK_RowKey'].tolist() == ['A_1', 'D_1', 'B_1', 'C_1']
+    assert ew['days_from_start'].tolist() == [-5, -4, 64, 55]
+    assert ew['min_days'].tolist() == [5, 4, 4, 24]
+    assert ew['issue_level'].tolist() == ['WARNING', 'WARNING', 'WARNING', 'ERROR']
+    assert set(ew['issue_type']) == {'DATE_MISMATCH'}
+    assert ew.index.tolist() == [0, 1, 2, 3]
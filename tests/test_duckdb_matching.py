@@ -0,0 +1,49 @@
+from datetime import date
+import pandas as pd
+import pytest
+from assessment_episode_matcher.configs.constants import MatchingConstants
+from assessment_episode_matcher.matching.main import get_data_for_matching2, match_and_get_issues
+from assessment_episode_matcher.matching.incremental import ew_names
+
+pytest.importorskip("duckdb")
+
+PERIOD = (date(2024, 1, 1), date(2024, 6, 30))
+SLACK = 7
+
+
+@pytest.mark.parametrize("slack", [0, SLACK])
+def test_duckdb_backend_same_as_pandas(matching_inputs, slack):
+    episodes, asmts = matching_inputs
+    # overlapping episodes: a tie (multi-match error) and a nearer-by-slack episode
+    extra = episodes.iloc[[0, 3]].assign(PMSEpisodeID=['E800', 'E803'])
+    extra.loc[extra.index[1], 'CommencementDate'] += pd.Timedelta(days=30)
+    episodes = pd.concat([episodes, extra], ignore_index=True)
+    a_df, e_df, atomslk_notin_ep, epslk_notin_atom = get_data_for_matching2(
+        episodes, asmts, *PERIOD, slack_for_matching=SLACK)
+    inputs = (e_df, a_df, atomslk_notin_ep, epslk_notin_atom)
+
+    good_pd, ew_pd = match_and_get_issues(*inputs, slack, *PERIOD)
+    good_db, ew_db = match_and_get_issues(*inputs, slack, *PERIOD
+                        , config={MatchingConstants.MATCHING_BACKEND: 'duckdb'})
+
+    pd.testing.assert_frame_equal(good_db, good_pd)
+    for name in ew_names:
+      if ew_pd[name] is None or ew_db[name] is None:
+        assert ew_pd[name] is ew_db[name], name
+        continue
+      pd.testing.assert_frame_equal(ew_db[name], ew_pd[name], obj=name)
+
+
+@pytest.mark.parametrize("asmts_kept", ['none', 'other_clients'])
+def test_duckdb_backend_no_common_keys(matching_inputs, asmts_kept):
+    episodes, asmts = matching_inputs
+    a_df, e_df, atomslk_notin_ep, epslk_notin_atom = get_data_for_matching2(
+        episodes, asmts, *PERIOD, slack_for_matching=SLACK)
+    # no assessments, or only assessments of clients with no episodes
+    a_df = a_df.iloc[:0] if asmts_kept == 'none' else a_df.assign(SLK=a_df['SLK'] + "X")
+    inputs = (e_df, a_df, atomslk_notin_ep, epslk_notin_atom)
+
+    good_pd, _ = match_and_get_issues(*inputs, SLACK, *PERIOD)
+    good_db, _ = match_and_get_issues(*inputs, SLACK, *PERIOD
+                        , config={MatchingConstants.MATCHING_BACKEND: 'duckdb'})
+    pd.testing.assert_frame_equal(good_db, good_pd)
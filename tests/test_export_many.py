@@ -0,0 +1,44 @@
+import os
+import pandas as pd
+from assessment_episode_matcher.exporters.main import CSVExporter, ParquetExporter, DeferredExporter
+from assessment_episode_matcher.matching.errors import write_validation_results
+
+
+def _frame(n):
+    return pd.DataFrame({'SLK': [f"SLK{i:08d}" for i in range(n)], 'n': range(n)})
+
+
+def test_export_many_writes_all_and_reports_sizes(tmp_path):
+    exporter = ParquetExporter({'location': f"{tmp_path}/"})
+    items = {f"part{i}": _frame(10 * (i + 1)) for i in range(5)}
+
+    results = exporter.export_many(items, max_workers=3)
+
+    assert list(results) == list(items)
+    for name, data in items.items():
+        path = tmp_path / f"{name}.parquet"
+        assert results[name].num_rows == len(data)
+        assert results[name].num_bytes == os.path.getsize(path)
+        assert results[name].write_seconds >= 0
+        pd.testing.assert_frame_equal(pd.read_parquet(path), data)
+
+
+def test_deferred_exporter_flushes_together(tmp_path):
+    uploads = DeferredExporter(CSVExporter({'location': f"{tmp_path}/"}))
+    uploads.export_dataframe("a", _frame(3))
+    uploads.export_dataframe("b", _frame(4))
+    assert not list(tmp_path.iterdir())
+
+    results = uploads.flush()
+
+    assert sorted(results) == ["a", "b"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.csv", "b.csv"]
+    assert uploads.flush() == {}
+
+
+def test_write_validation_results_skips_empty(tmp_path):
+    exporter = CSVExporter({'location': f"{tmp_path}/"})
+    results = write_validation_results({'dates_ew': _frame(2), 'asmt_key_errors': pd.DataFrame()}
+                                       , exporter)
+    assert list(results) == ["dates_ew.csv"]
+    assert (tmp_path / "dates_ew.csv.csv").exists()
@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+from assessment_episode_matcher.utils.df_ops_base import transform_fields
+
+
+def test_transform_fields_yes_no_and_bool():
+    df = pd.DataFrame({
+        'Past4WkBeenArrested': ['No', 'Yes', np.nan, 'Once'],
+        'ATOPHomeless': [True, False, None, True],
+        'PrimaryCaregiver_0-5': [True, False, False, True],
+        'Untouched': ['No', 'Yes', None, 'No'],
+    })
+    transforms = {'Past4WkBeenArrested': 'yes_no', 'ATOPHomeless': 'bool',
+                  'PrimaryCaregiver_0-5': 'bool', 'NotInFrame': 'bool'}
+
+    result = transform_fields(df, transforms)
+
+    assert result['Past4WkBeenArrested'].tolist() == ['0', '1', None, '1']
+    assert result['ATOPHomeless'].tolist() == ['1', '0', None, '1']
+    assert result['PrimaryCaregiver_0-5'].tolist() == ['1', '0', '0', '1']
+    assert result['Untouched'].tolist() == df['Untouched'].tolist()
+    assert 'NotInFrame' not in result.columns
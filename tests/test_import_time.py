@@ -0,0 +1,40 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import pytest
+
+# cumulative import time of the matching module itself (excludes interpreter start-up);
+# the cloud SDKs (azure, duckdb) must not be part of it
+IMPORT_BUDGET_MS = 1500
+
+_script = """
+import json, sys
+import assessment_episode_matcher.matching.main
+print(json.dumps(sorted(m for m in sys.modules if m.split('.')[0] in ('azure', 'duckdb'))))
+"""
+
+
+def _import_matching_main():
+    # a fresh interpreter, so nothing is already imported
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _script]
+                          , capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout), proc.stderr
+
+
+def test_matching_main_imports_no_cloud_backends():
+    cloud_modules, _ = _import_matching_main()
+    assert cloud_modules == []
+
+
+# wall-clock budget: only meaningful on a quiet machine, so opt-in (RUN_BENCHMARKS=1)
+@pytest.mark.skipif(not os.environ.get("RUN_BENCHMARKS"), reason="set RUN_BENCHMARKS=1 to run")
+def test_matching_main_import_time_within_budget():
+    _, importtime = _import_matching_main()
+    cumulative_us = [int(m.group(1)) for m in re.finditer(
+                      r"\|\s*(\d+)\s*\|\s*assessment_episode_matcher\.matching\.main$"
+                      , importtime, re.MULTILINE)]
+    assert cumulative_us, "no -X importtime line for matching.main"
+    import_ms = cumulative_us[0] / 1000
+    assert import_ms < IMPORT_BUDGET_MS, f"matching.main imported in {import_ms:.0f}ms"
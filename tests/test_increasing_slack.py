@@ -0,0 +1,53 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+from assessment_episode_matcher.matching.main import get_data_for_matching2, match_and_get_issues
+from assessment_episode_matcher.mytypes import IssueType
+from assessment_episode_matcher.utils.df_ops_base import get_dupes_by_key
+
+PERIOD = (date(2024, 1, 1), date(2024, 6, 30))
+SLACK = 7
+
+
+def _match(episode_dates, asmt_date):
+    """one TSS client: its episodes (start, end) E1, E2, ... and one assessment"""
+    episodes = pd.DataFrame([dict(SLK='SLK1', Program='TSS', PMSEpisodeID=f"E{i}", PMSPersonID='P1'
+                                  , CommencementDate=start, EndDate=end)
+                             for i, (start, end) in enumerate(episode_dates, start=1)])
+    asmts = pd.DataFrame([dict(SLK='SLK1', RowKey='TSS_INAS', Program='TSS'
+                               , AssessmentDate=asmt_date, Staff='staff1')])
+    a_df, e_df, atomslk_notin_ep, epslk_notin_atom = get_data_for_matching2(
+        episodes, asmts, *PERIOD, slack_for_matching=SLACK)
+    return match_and_get_issues(e_df, a_df, atomslk_notin_ep, epslk_notin_atom, SLACK, *PERIOD)
+
+
+def _multi_matches(ew):
+    dates_ew = ew['dates_ewdf']
+    if dates_ew.empty:
+        return []
+    multi = dates_ew[dates_ew['issue_type'] == IssueType.ASMT_MATCHED_MULTI.name]
+    return multi[['SLK_RowKey', 'PMSEpisodeID', 'issue_level']].values.tolist()
+
+
+def test_matched_to_two_episodes_at_the_same_slack():
+    # overlapping episodes: the assessment is in both
+    good, ew = _match([(date(2024, 2, 1), date(2024, 3, 1)), (date(2024, 2, 10), date(2024, 4, 1))]
+                      , date(2024, 2, 15))
+
+    assert _multi_matches(ew) == [['SLK1_TSS_INAS', 'E1', 'ERROR'], ['SLK1_TSS_INAS', 'E2', 'ERROR']]
+    assert good[['SLK_RowKey', 'PMSEpisodeID']].values.tolist() == [['SLK1_TSS_INAS', 'E1']]
+
+
+def test_matched_to_the_nearer_episode_at_a_smaller_slack():
+    # 1 day after E1 ends, 2 days before E2 starts: only E1's match (slack 1) counts
+    good, ew = _match([(date(2024, 2, 1), date(2024, 3, 1)), (date(2024, 3, 4), date(2024, 4, 1))]
+                      , date(2024, 3, 2))
+
+    assert _multi_matches(ew) == []
+    assert good[['SLK_RowKey', 'PMSEpisodeID']].values.tolist() == [['SLK1_TSS_INAS', 'E1']]
+
+
+def test_dupes_by_key_all_rows_of_repeated_keys():
+    df = pd.DataFrame({'k': ['a', 'b', 'a', np.nan, np.nan, 'c'], 'v': range(6)})
+    assert get_dupes_by_key(df, 'k')['v'].tolist() == [0, 2]
+    assert get_dupes_by_key(df[df['k'] != 'a'], 'k') is None
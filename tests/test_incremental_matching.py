@@ -0,0 +1,103 @@
+from datetime import date, timedelta
+import pandas as pd
+import pytest
+from assessment_episode_matcher.matching.main import get_data_for_matching2, match_and_get_issues
+from assessment_episode_matcher.matching.incremental import match_and_get_issues_incremental, \
+    get_local_match_state_store, client_fingerprints, ew_names
+
+PERIOD = (date(2024, 1, 1), date(2024, 6, 30))
+SLACK = 7
+
+
+def _prepared(episodes, asmts):
+    a_df, e_df, atomslk_notin_ep, epslk_notin_atom = get_data_for_matching2(
+        episodes, asmts, *PERIOD, slack_for_matching=SLACK)
+    return e_df, a_df, atomslk_notin_ep, epslk_notin_atom
+
+
+def _rows(df, columns):
+    """order-independent comparison (columns aligned to the full run's, NaN/None alike)"""
+    if df.empty:
+        return []
+    df = df.reindex(columns=columns).astype(object)
+    df = df.where(df.notna(), None).astype(str)
+    return sorted(map(tuple, df.to_numpy().tolist()))
+
+
+def _assert_same_results(incremental, full):
+    (good_i, ew_i), (good_f, ew_f) = incremental, full
+    assert _rows(good_i, good_f.columns) == _rows(good_f, good_f.columns)
+    for name in ew_names:
+        assert _rows(ew_i[name], ew_f[name].columns) == _rows(ew_f[name], ew_f[name].columns), name
+
+
+def test_incremental_matches_full_run(tmp_path, matching_inputs):
+    episodes, asmts = matching_inputs
+    store = get_local_match_state_store(str(tmp_path))
+
+    inputs = _prepared(episodes, asmts)
+    first = match_and_get_issues_incremental(*inputs, SLACK, *PERIOD, state_store=store)
+    _assert_same_results(first, match_and_get_issues(*inputs, SLACK, *PERIOD))
+
+    # next run: a client's assessment moved, another client gained an assessment
+    asmts = asmts.copy()
+    asmts.loc[4, 'AssessmentDate'] += timedelta(days=20)
+    new_asmt = asmts.iloc[[10]].assign(RowKey='TSS_INAS_20240320', AssessmentDate=date(2024, 3, 20))
+    asmts = pd.concat([asmts, new_asmt], ignore_index=True)
+    inputs2 = _prepared(episodes, asmts)
+
+    changed = client_fingerprints(list(inputs2)).ne(client_fingerprints(list(inputs)))
+    assert set(changed[changed].index) == {asmts.loc[4, 'SLK'], asmts.loc[10, 'SLK']}
+
+    second = match_and_get_issues_incremental(*inputs2, SLACK, *PERIOD, state_store=store)
+    _assert_same_results(second, match_and_get_issues(*inputs2, SLACK, *PERIOD))
+
+
+@pytest.mark.parametrize("subset_size", [1, 2, 5])
+def test_client_results_independent_of_other_clients(matching_inputs, subset_size):
+    inputs = _prepared(*matching_inputs)
+    full_good, full_ew = match_and_get_issues(*inputs, SLACK, *PERIOD)
+
+    slks = sorted(set(inputs[0].SLK) | set(inputs[1].SLK))[:subset_size]
+    subset = [df[df.SLK.isin(slks)] for df in inputs]
+    good, ew = match_and_get_issues(*subset, SLACK, *PERIOD)
+
+    _assert_same_results((good, ew), (full_good[full_good.SLK.isin(slks)],
+                                      {n: df[df.SLK.isin(slks)] if 'SLK' in df.columns else df
+                                       for n, df in full_ew.items()}))
+
+
+def _episode(slk, program, start, end, ep_id):
+    return dict(SLK=slk, Program=program, PMSEpisodeID=ep_id, PMSPersonID=f"P{ep_id}"
+                , CommencementDate=start, EndDate=end)
+
+
+def _asmt(slk, program, asmt_date):
+    return dict(SLK=slk, RowKey=f"{program}_INAS_{asmt_date:%Y%m%d}", Program=program
+                , AssessmentDate=asmt_date, Staff='staff1')
+
+
+def _match(episodes, asmts):
+    return match_and_get_issues(*_prepared(pd.DataFrame(episodes), pd.DataFrame(asmts))
+                                , SLACK, *PERIOD)
+
+
+def test_matched_with_more_slack_when_nothing_matches_with_less():
+    # 3 days before the episode: no assessment in the run matches with a slack of 0-2 days
+    good, _ = _match([_episode('SLK1', 'TSS', date(2024, 2, 1), date(2024, 3, 1), 'E1')]
+                     , [_asmt('SLK1', 'TSS', date(2024, 1, 29))])
+    assert good[['SLK', 'PMSEpisodeID']].values.tolist() == [['SLK1', 'E1']]
+
+
+def test_matched_on_slk_only_when_nothing_matches_on_slk_and_program():
+    good, _ = _match([_episode('SLK1', 'TSS', date(2024, 2, 1), date(2024, 3, 1), 'E1')]
+                     , [_asmt('SLK1', 'ARCA', date(2024, 2, 10))])
+    assert good[['SLK', 'PMSEpisodeID', 'Program']].values.tolist() == [['SLK1', 'E1', 'TSS']]
+
+
+def test_client_without_episode_reported_when_the_rest_matched():
+    good, ew = _match([_episode('SLK1', 'TSS', date(2024, 2, 1), date(2024, 3, 1), 'E1')]
+                      , [_asmt('SLK1', 'TSS', date(2024, 2, 10))
+                         , _asmt('NOEPSLK', 'TSS', date(2024, 2, 12))])
+    assert good['SLK'].tolist() == ['SLK1']
+    assert ew['slk_onlyinass'][['SLK', 'RowKey']].values.tolist() == [['NOEPSLK', 'TSS_INAS_20240212']]
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+from assessment_episode_matcher.utils.df_ops_base import get_key_masks, get_key_index, \
+    get_delta_by_key
+
+
+def test_key_masks_match_set_based_deltas():
+    left = pd.DataFrame({'SLK': ['A', 'B', 'B', 'C', None], 'n': range(5)})
+    right = pd.DataFrame({'SLK': ['B', 'D', 'D', None]})
+
+    masks = get_key_masks(left, right, 'SLK')
+
+    assert masks.left_only.tolist() == [True, False, False, True, False]
+    assert masks.right_only.tolist() == [False, True, True, False]
+    assert np.array_equal(masks.left_in_both, ~masks.left_only)
+    assert np.array_equal(masks.right_in_both, ~masks.right_only)
+    # same rows as isin
+    not_in_right, in_both = get_delta_by_key(left, right, 'SLK', common=True)
+    pd.testing.assert_frame_equal(not_in_right, left[~left.SLK.isin(right.SLK)])
+    pd.testing.assert_frame_equal(in_both, left[left.SLK.isin(right.SLK)])
+
+
+def test_key_index_reused_until_column_replaced():
+    df = pd.DataFrame({'SLK': ['A', 'B', 'A']})
+    first = get_key_index(df, 'SLK')
+    assert get_key_index(df, 'SLK') is first
+
+    df['SLK'] = ['C', 'C', 'C']
+    rebuilt = get_key_index(df, 'SLK')
+    assert rebuilt is not first
+    assert list(rebuilt.uniques) == ['C']
@@ -0,0 +1,59 @@
+import os
+import logging
+import time
+import pytest
+from assessment_episode_matcher.setup.log_management import configure_logging, stop_logging \
+                                                            , lazy, log_event
+
+# average cost of one emitted (queued) record, and of one call below the level
+EMITTED_BUDGET_US = 200
+DISABLED_BUDGET_US = 20
+
+
+@pytest.fixture
+def root_logging():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    stop_logging()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def test_queued_to_file_and_lazy_payloads(tmp_path, root_logging):
+    configure_logging(tmp_path, __name__, "test", level=logging.INFO)
+    computed = []
+
+    def payload():
+        computed.append(1)
+        return "big payload"
+
+    logging.debug("skipped: %s", lazy(payload))
+    logging.info("kept: %s", lazy(payload))
+    log_event("matched", rows=3)
+    stop_logging()
+
+    text = "".join(p.read_text() for p in tmp_path.glob("*-test.log"))
+    assert computed == [1]
+    assert "kept: big payload" in text and "skipped" not in text
+    assert "matched rows=3" in text
+
+
+# wall-clock budgets: only meaningful on a quiet machine, so opt-in (RUN_BENCHMARKS=1)
+@pytest.mark.skipif(not os.environ.get("RUN_BENCHMARKS"), reason="set RUN_BENCHMARKS=1 to run")
+def test_logging_overhead_within_budget(tmp_path, root_logging):
+    configure_logging(tmp_path, __name__, "bench", level=logging.INFO)
+    n = 2000
+
+    start = time.perf_counter()
+    for i in range(n):
+        logging.info("row %d", i)
+    emitted_us = (time.perf_counter() - start) / n * 1e6
+
+    start = time.perf_counter()
+    for i in range(n):
+        logging.debug("payload: %s", lazy(sum, range(10_000)))
+    disabled_us = (time.perf_counter() - start) / n * 1e6
+
+    assert emitted_us < EMITTED_BUDGET_US, f"{emitted_us:.1f}us per emitted record"
+    assert disabled_us < DISABLED_BUDGET_US, f"{disabled_us:.2f}us per call below the level"
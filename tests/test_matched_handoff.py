@@ -0,0 +1,88 @@
+import io
+import json
+import pandas as pd
+from assessment_episode_matcher import nada
+from assessment_episode_matcher.azutil import az_blob_query
+from assessment_episode_matcher.exporters.main import ParquetExporter
+from assessment_episode_matcher.importers.main import LocalFileSource
+from assessment_episode_matcher.matched_handoff import write_matched, read_matched, as_exported_text
+from assessment_episode_matcher.nada import generate_nada_export, get_nada_input_columns
+
+
+def _typed_matched(matched_assessments):
+    """As the matching step hands them on: typed, with columns the export doesn't use"""
+    df = matched_assessments.copy()
+    n = len(df)
+    df['AssessmentDate'] = pd.to_datetime(df['AssessmentDate']).dt.date
+    df['PMSPersonID'] = df['PMSPersonID'].astype(int)
+    df['days_from_start'] = [i * 1.5 for i in range(n)]
+    df['matched_on'] = [[f"E{i}", i] if i % 2 else "SLK" for i in range(n)]
+    df['Comment'] = [f"note {i}, \"quoted\"" for i in range(n)]
+    return df
+
+
+def test_round_trip_with_manifest(tmp_path, matched_assessments):
+    df = _typed_matched(matched_assessments)
+    manifest = write_matched(df, ParquetExporter({'location': f"{tmp_path}/"}), "p_reindexed")
+
+    written = json.loads((tmp_path / "p_reindexed.manifest.json").read_text())
+    assert written['data'] == "p_reindexed.parquet" and written['num_rows'] == len(df)
+    assert written['json_columns'] == manifest['json_columns'] == ['matched_on']
+
+    source = LocalFileSource(str(tmp_path))
+    pd.testing.assert_frame_equal(read_matched(source, "p_reindexed"), df)
+    subset = read_matched(source, "p_reindexed", columns=['SLK', 'SurveyData', 'not_there'])
+    assert list(subset.columns) == ['SLK', 'SurveyData']
+    assert read_matched(source, "other_reindexed") is None
+
+
+def test_nada_columns_same_survey_txt_as_csv(tmp_path, matched_assessments, nada_config):
+    df = _typed_matched(matched_assessments)
+    write_matched(df, ParquetExporter({'location': f"{tmp_path}/"}), "p_reindexed")
+
+    from_csv = pd.read_csv(io.StringIO(df.to_csv(index=False)), dtype=str)
+    handed_off = as_exported_text(read_matched(LocalFileSource(str(tmp_path)), "p_reindexed"
+                                               , columns=get_nada_input_columns()))
+    assert 'Comment' not in handed_off.columns
+
+    expected, expected_warnings = generate_nada_export(from_csv, nada_config)
+    nada, warnings = generate_nada_export(handed_off, nada_config)
+    pd.testing.assert_frame_equal(nada, expected)
+    assert warnings.to_csv() == expected_warnings.to_csv()
+
+
+def test_blob_handoff_read_from_its_folder(monkeypatch, tmp_path, matched_assessments):
+    (tmp_path / "NADA").mkdir()
+    df = _typed_matched(matched_assessments)
+    write_matched(df, ParquetExporter({'location': f"{tmp_path}/"}), "NADA/20240101-20240331_reindexed")
+    requested = []
+
+    class FakeBlobQuery:
+        def load_data(self, container_name, blob_url):
+            requested.append(blob_url)
+            path = tmp_path / blob_url
+            return io.BytesIO(path.read_bytes()) if path.exists() else None
+
+    monkeypatch.setattr(az_blob_query, 'AzureBlobQuery', FakeBlobQuery)
+    handed_off, fname = nada.get_matched_assessments("atom-matching", "20240101", "20240331")
+
+    assert requested == ["NADA/20240101-20240331_reindexed.manifest.json"
+                         , "NADA/20240101-20240331_reindexed.parquet"]
+    assert fname == "NADA/20240101-20240331_reindexed.parquet"
+    assert len(handed_off) == len(df)
+
+
+def test_na_strings_handed_off_as_missing(tmp_path, matched_assessments, nada_config):
+    df = _typed_matched(matched_assessments)
+    df.loc[[1, 4], 'PDCCode'] = ["NA", "null"]
+    df.loc[[2, 5], 'Staff'] = ["n/a", "None"]
+    write_matched(df, ParquetExporter({'location': f"{tmp_path}/"}), "p_reindexed")
+
+    from_csv = pd.read_csv(io.StringIO(df.to_csv(index=False)), dtype=str)
+    handed_off = as_exported_text(read_matched(LocalFileSource(str(tmp_path)), "p_reindexed"
+                                               , columns=get_nada_input_columns()))
+    pd.testing.assert_frame_equal(handed_off[['PDCCode', 'Staff']], from_csv[['PDCCode', 'Staff']])
+
+    expected, _ = generate_nada_export(from_csv, nada_config)
+    nada_export, _ = generate_nada_export(handed_off, nada_config)
+    pd.testing.assert_frame_equal(nada_export, expected)
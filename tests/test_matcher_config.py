@@ -0,0 +1,46 @@
+import json
+import pandas as pd
+import pytest
+from assessment_episode_matcher import project_directory
+from assessment_episode_matcher.configs.constants import MatchingConstants
+from assessment_episode_matcher.configs.matcher_config import MatcherConfig, load_local_config
+from assessment_episode_matcher.importers.aod import get_drug_category
+
+
+def _config():
+    with open(project_directory / "configuration.json") as file:
+        return json.load(file)
+
+
+def test_lookups_same_as_raw_config():
+    raw = _config()
+    config = MatcherConfig.of(raw)
+
+    drugs = [s for substances in raw['drug_categories'].values() for s in substances] + ['Kava', '']
+    assert [config.get_drug_category(d) for d in drugs] \
+              == [get_drug_category(d, raw['drug_categories']) for d in drugs]
+
+    ids = pd.Series([*raw['EstablishmentID_Program'], 'unknown', None])
+    ids.index = ids.index + 5
+    pd.testing.assert_series_equal(config.map_programs(ids), ids.map(raw['EstablishmentID_Program']))
+    assert config.program_filters('NADA') == {'Program': raw['purpose_programs']['NADA']}
+    assert config['version_number'] == raw['version_number']
+
+
+def test_built_once_per_version_and_read_only():
+    config = MatcherConfig.of(_config())
+    assert MatcherConfig.of(_config()) is config
+    assert MatcherConfig.of(config) is config
+    with pytest.raises(AttributeError):
+        config.matching_backend = 'duckdb'
+
+    assert MatcherConfig.of({MatchingConstants.MATCHING_BACKEND: 'duckdb'}).matching_backend == 'duckdb'
+    assert MatcherConfig.of({'get_nearest_slk': 1}).get_nearest_slk
+    with pytest.raises(ValueError):
+        MatcherConfig.of({'drug_categories': {'Alcohol': 'Ethanol'}})
+
+
+def test_saved_locally(tmp_path):
+    config = MatcherConfig.of(_config())
+    config.save_local(str(tmp_path))
+    assert load_local_config(str(tmp_path)) is config
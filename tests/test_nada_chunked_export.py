@@ -0,0 +1,49 @@
+import pytest
+import pandas as pd
+from assessment_episode_matcher.exporters.config.NADAbase import nada_final_fields
+from assessment_episode_matcher.nada import generate_nada_export, generate_nada_export_chunked
+from assessment_episode_matcher.exporters.main import LocalCSVChunkWriter, LocalFileExporter
+
+
+def test_chunked_export_matches_full_export(tmp_path, matched_assessments, nada_config):
+    full, full_warnings = generate_nada_export(matched_assessments, nada_config)
+
+    out_file = tmp_path / "surveytxt.csv"
+    with LocalCSVChunkWriter(str(out_file)) as writer:
+        warnings = generate_nada_export_chunked(matched_assessments, nada_config
+                                                , writer, chunk_size=5)
+
+    assert writer.num_chunks == 5
+    assert writer.num_rows == len(full)
+    with open(out_file, newline='') as f:
+        assert f.read() == full.to_csv(index=False)
+    assert sorted(w.to_list() for w in warnings) == sorted(w.to_list() for w in full_warnings)
+
+
+def test_local_exporter_csv_writer(tmp_path, matched_assessments, nada_config):
+    exp = LocalFileExporter(config={'location': f"{tmp_path}/"})
+    with exp.open_csv_writer("surveytxt") as writer:
+        generate_nada_export_chunked(matched_assessments, nada_config, writer, chunk_size=100)
+
+    assert writer.num_chunks == 1
+    assert (tmp_path / "surveytxt.csv").read_text().startswith("AgencyCode,PMSEpisodeID")
+
+
+def test_empty_export_header_only(tmp_path, matched_assessments, nada_config):
+    out_file = tmp_path / "surveytxt.csv"
+    with LocalCSVChunkWriter(str(out_file)) as writer:
+        generate_nada_export_chunked(matched_assessments.iloc[:0], nada_config, writer, chunk_size=5)
+
+    assert writer.num_rows == 0
+    assert out_file.read_text() == pd.DataFrame(columns=nada_final_fields).to_csv(index=False)
+
+
+def test_aborted_export_leaves_no_file(tmp_path, matched_assessments, nada_config):
+    out_file = tmp_path / "surveytxt.csv"
+    with pytest.raises(ValueError):
+        with LocalCSVChunkWriter(str(out_file)) as writer:
+            generate_nada_export_chunked(matched_assessments, nada_config, writer, chunk_size=5)
+            raise ValueError("upload failed")
+
+    assert writer.num_chunks == 5
+    assert not out_file.exists()
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+from assessment_episode_matcher.exporters.NADAbase import generate_finaloutput_df
+from assessment_episode_matcher.exporters.config.NADAbase import nada_final_fields
+
+
+@pytest.fixture
+def prepped_nada_df():
+    """A slice of what prep_nada_fields hands to the final-output formatter"""
+    return pd.DataFrame({
+        'AgencyCode': ['12QQ03076', '13K034', '13K034', '820002000'],
+        'PMSEpisodeID': ['1001', '1002', '1003', '1004'],
+        'PMSPersonID': ['7', '88', np.nan, '12345'],
+        'AssessmentDate': ['2024-01-05', '2024-02-29', '2023-12-31', '2024-03-01'],
+        'PDCCode': ['3', np.nan, '101', '7'],
+        'SDSIsAODUseOutOfControl': [1.0, np.nan, 3.0, 0.0],
+        'SDSDoYouWishToStop': [2, 1, 0, 3],
+        'K10Q01': [1.0, 2.0, np.nan, 5.0],
+        'Alcohol_DaysInLast28': ['20', np.nan, '0', '28'],
+        'Alcohol_PerOccassionUse': ['6', np.nan, np.nan, '12'],
+        'Cannabis_DaysInLast28': [np.nan, '5', np.nan, np.nan],
+        'Alcohol_TypicalQtyStr': ['6.0; standard drinks', np.nan, '', '12.0; standard drinks'],
+        'Another Drug1': [np.nan, 'Caffeine', np.nan, np.nan],
+        'ATOPHomeless': ['1', '0', None, '0'],
+        'ATOPRiskEviction': ['0', '0', None, '1'],
+        'Past4WkBeenArrested': ['0', None, '1', '0'],
+        'Past4WkHaveYouViolenceAbusive': [None, None, None, None],
+        'Past4WkMentalHealth': [5.0, np.nan, 7.0, 10.0],
+        'Past4WkPhysicalHealth': [4, 6, 8, 9],
+        'PaidWorkDays': ['4', None, '12', None],
+        'Past4WkNumInjectingDays': [np.nan, 2.5, np.nan, 0.0],
+        'SLK': ['A', 'B', 'C', 'D'],
+    }, index=[10, 3, 7, 42])
+
+
+# survey.txt rows as written by the per-element (pre-vectorization) formatter
+EXPECTED_ROWS = [
+    '12QQ03076,1001,0007,,05012024,0003,1,,,2,,,,,,,,,,,,,,20,6,,,,,1,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,6.0; standard drinks,,,,,20,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,-1,,,,,,,,-1,,,,,4,,,,,,,,1,0,-1,-1,0,-1,,5,4,-1',
+    '13K034,1002,0088,,29022024,0nan,,,,1,,,,,,,,,5,,,,,,,,,,,2,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,5,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,Caffeine,,,,,,,,,,,,,,,,-1,,,,,,2,,-1,,,,,,,,,,,,,0,0,-1,-1,,-1,,-1,6,-1',
+    '13K034,1003,0nan,,31122023,0101,3,,,0,,,,,,,,,,,,,,0,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,0,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,-1,,,,,,,,-1,,,,,12,,,,,,,,,,-1,-1,1,-1,,7,8,-1',
+    '820002000,1004,12345,,01032024,0007,0,,,3,,,,,,,,,,,,,,28,12,,,,,5,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,12.0; standard drinks,,,,,28,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,-1,,,,,,0,,-1,,,,,,,,,,,,,0,1,-1,-1,0,-1,,10,9,-1',
+]
+
+
+def test_final_output_csv_unchanged(prepped_nada_df):
+    out = generate_finaloutput_df(prepped_nada_df)
+    lines = out.to_csv(index=False).splitlines()
+
+    assert lines[0] == ",".join(nada_final_fields)
+    assert lines[1:] == EXPECTED_ROWS
+
+
+def test_final_output_layout_and_dtypes(prepped_nada_df):
+    out = generate_finaloutput_df(prepped_nada_df)
+
+    assert list(out.columns) == nada_final_fields
+    assert list(out.index) == [10, 3, 7, 42]
+    # not-answered columns that were blank throughout are ints, as before
+    assert out['Past4WkQualityOfLifeScore'].dtype == 'int64'
+    assert out['SDSIsAODUseOutOfControl'].tolist() == ['1', '', '3', '0']
+    assert out['Past4WkNumInjectingDays'].tolist() == ['', '2', '', '0']
+
+
+def test_final_output_repeated_float_column(prepped_nada_df):
+    # Alcohol_DaysInLast28 appears twice in the layout; a float source column
+    # must be written the same way as its string equivalent
+    as_float = prepped_nada_df.assign(Alcohol_DaysInLast28=[20.0, np.nan, 0.0, 28.0])
+
+    out = generate_finaloutput_df(as_float)
+
+    assert out.to_csv(index=False).splitlines()[1:] == EXPECTED_ROWS
@@ -0,0 +1,46 @@
+import pandas as pd
+from assessment_episode_matcher import data_prep, nada
+from assessment_episode_matcher.data_prep import prep_process_pool
+from assessment_episode_matcher.exporters.main import LocalCSVChunkWriter
+from assessment_episode_matcher.nada import generate_nada_export
+
+
+def test_parallel_prep_same_survey_txt(monkeypatch, matched_assessments, nada_config):
+    full, full_warnings = generate_nada_export(matched_assessments, nada_config)
+
+    monkeypatch.setattr(data_prep, 'MIN_PREP_CHUNK_ROWS', 1)  # 23 rows -> 8 chunks of 3
+    nada, warnings = generate_nada_export(matched_assessments, nada_config, workers=2)
+
+    pd.testing.assert_frame_equal(nada, full)
+    assert sorted(w.to_list() for w in warnings) == sorted(w.to_list() for w in full_warnings)
+
+
+def test_column_union_in_chunk_order(matched_assessments, nada_config):
+    expanded, _ = data_prep.expand_and_derive_parallel(matched_assessments, nada_config
+                                                       , workers=2, chunk_size=4)
+    again, _ = data_prep.expand_and_derive_parallel(matched_assessments, nada_config
+                                                    , workers=3, chunk_size=4)
+    serial, _ = data_prep.expand_and_derive(matched_assessments, nada_config)
+
+    assert list(expanded.columns) == list(again.columns)
+    assert sorted(expanded.columns) == sorted(serial.columns)
+    assert list(expanded.index) == list(serial.index)
+
+
+def test_chunked_export_one_pool(monkeypatch, tmp_path, matched_assessments, nada_config):
+    full, _ = generate_nada_export(matched_assessments, nada_config)
+    pools = []
+
+    def counted_pool(workers):
+        pools.append(workers)
+        return prep_process_pool(workers)
+
+    monkeypatch.setattr(data_prep, 'MIN_PREP_CHUNK_ROWS', 1)
+    monkeypatch.setattr(nada, 'prep_process_pool', counted_pool)
+    out_file = tmp_path / "surveytxt.csv"
+    with LocalCSVChunkWriter(str(out_file)) as writer:
+        nada.generate_nada_export_chunked(matched_assessments, nada_config
+                                          , writer, chunk_size=8, workers=2)
+
+    assert pools == [2] and writer.num_chunks == 3
+    assert out_file.read_text() == full.to_csv(index=False)
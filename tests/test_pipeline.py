@@ -0,0 +1,95 @@
+from datetime import date
+import pandas as pd
+from assessment_episode_matcher.exporters.main import CSVExporter
+from assessment_episode_matcher.pipeline import Pipeline, Stage, matching_stages, \
+    get_local_stage_cache, output_stages
+from assessment_episode_matcher.matching.main import get_data_for_matching2, match_and_get_issues
+from assessment_episode_matcher.matching.incremental import ew_names
+
+
+def _toy_pipeline(cache, calls):
+    def stage(name, func):
+        def counted(**kwargs):
+            calls.append(name)
+            return func(**kwargs)
+        return counted
+
+    return Pipeline([
+        Stage('src', stage('src', lambda: {'raw': pd.DataFrame({'v': [1, 2, 3]})})
+              , outputs=['raw'], cache=False),
+        Stage('scaled', stage('scaled', lambda raw, factor: {'scaled': raw * factor})
+              , outputs=['scaled'], inputs=['raw'], params=['factor']),
+        Stage('offset', stage('offset', lambda raw, offset: {'offset': raw + offset})
+              , outputs=['offset'], inputs=['raw'], params=['offset']),
+        Stage('total', stage('total', lambda scaled, offset: {'total': scaled + offset})
+              , outputs=['total'], inputs=['scaled', 'offset']),
+    ], cache=cache)
+
+
+def test_only_stages_downstream_of_a_changed_param_rerun(tmp_path):
+    calls = []
+    cache = get_local_stage_cache(str(tmp_path))
+
+    first = _toy_pipeline(cache, calls).run({'factor': 2, 'offset': 1})
+    assert first['total']['v'].tolist() == [4, 7, 10]
+
+    pipeline = _toy_pipeline(cache, calls)
+    calls.clear()
+    pipeline.run({'factor': 2, 'offset': 1})
+    assert calls == ['src']
+    assert set(pipeline.from_cache) == {'scaled', 'offset', 'total'}
+
+    calls.clear()
+    changed = pipeline.run({'factor': 2, 'offset': 5})
+    assert sorted(calls) == ['offset', 'src', 'total']
+    assert changed['total']['v'].tolist() == [8, 11, 14]
+
+    calls.clear()
+    pipeline.run({'factor': 2, 'offset': 1}, targets=['scaled'])
+    assert calls == ['src'] and pipeline.from_cache == ['scaled']
+
+
+def test_cached_matching_stages_same_as_direct_run(tmp_path, matching_inputs):
+    episodes, asmts = matching_inputs
+    params = {'reporting_start': date(2024, 1, 1), 'reporting_end': date(2024, 6, 30)
+              , 'slack_for_matching': 7}
+    sources = [Stage('episodes', lambda: {'episodes': episodes}, outputs=['episodes'], cache=False),
+               Stage('atoms', lambda: {'atoms': asmts}, outputs=['atoms'], cache=False)]
+    cache = get_local_stage_cache(str(tmp_path))
+
+    Pipeline([*sources, *matching_stages({})], cache).run(params)
+    pipeline = Pipeline([*sources, *matching_stages({})], cache)
+    cached = pipeline.run(params)
+    assert sorted(pipeline.ran) == ['atoms', 'episodes']
+
+    a_df, e_df, atomslk_notin_ep, epslk_notin_atom = get_data_for_matching2(
+        episodes, asmts, params['reporting_start'], params['reporting_end'], slack_for_matching=7)
+    final_good, ew = match_and_get_issues(e_df, a_df, atomslk_notin_ep, epslk_notin_atom, 7
+                                          , params['reporting_start'], params['reporting_end'])
+    pd.testing.assert_frame_equal(cached['final_good'], final_good)
+    for name in ew_names:
+      if ew[name] is not None and not ew[name].empty:
+        pd.testing.assert_frame_equal(cached[name], ew[name], obj=name)
+
+
+def test_exporting_stages_export_on_every_run(tmp_path, matching_inputs):
+    episodes, asmts = matching_inputs
+    params = {'reporting_start': date(2024, 1, 1), 'reporting_end': date(2024, 6, 30)
+              , 'slack_for_matching': 7}
+    sources = [Stage('episodes', lambda: {'episodes': episodes}, outputs=['episodes'], cache=False),
+               Stage('atoms', lambda: {'atoms': asmts}, outputs=['atoms'], cache=False)]
+    cache = get_local_stage_cache(str(tmp_path / "cache"))
+    (tmp_path / "cache").mkdir()
+
+    def run(out_dir):
+        (out_dir / "NADA").mkdir(parents=True)
+        exporter = CSVExporter({'location': f"{out_dir}/"})
+        pipeline = Pipeline([*sources, *matching_stages({})
+                             , *output_stages({}, exporter, exporter)], cache)
+        pipeline.run(params, targets=['reindexed'])
+        return pipeline
+
+    run(tmp_path / "first")
+    pipeline = run(tmp_path / "second")  # e.g. to another container
+    assert pipeline.from_cache == ['matching_data', 'matches']
+    assert (tmp_path / "second" / "NADA" / "20240101-20240630_reindexed.csv").exists()
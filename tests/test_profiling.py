@@ -0,0 +1,43 @@
+import logging
+import marshal
+import pstats
+import pytest
+from assessment_episode_matcher import profiling
+from assessment_episode_matcher.exporters.main import CSVExporter
+
+
+def _busy(n):
+    return sum(i * i for i in range(n))
+
+
+@profiling.profiled
+def slow_stage(n):
+    return _busy(n)
+
+
+@pytest.fixture
+def profiling_off():
+    yield
+    profiling.configure_profiling(stages="")
+
+
+def test_off_by_default_writes_nothing(tmp_path, profiling_off):
+    profiling.configure_profiling(stages="", profile_dir=str(tmp_path))
+    assert slow_stage(1000) == _busy(1000)
+    assert not list(tmp_path.iterdir())
+
+
+def test_profile_written_next_to_audit_outputs(tmp_path, profiling_off, caplog):
+    profiling.configure_profiling(stages="slow_stage", top_n=5)
+    with caplog.at_level(logging.INFO), profiling.profile_output(CSVExporter({'location': f"{tmp_path}/"})):
+        assert slow_stage(200_000) == _busy(200_000)
+
+    pstats_file, = tmp_path.glob("profile_test_profiling.slow_stage_*.pstats")
+    collapsed, = tmp_path.glob("profile_test_profiling.slow_stage_*.collapsed.txt")
+    assert any("_busy" in func[2] for func in marshal.loads(pstats_file.read_bytes()))
+    pstats.Stats(str(pstats_file))  # readable by the standard tools
+
+    lines = collapsed.read_text().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("slow_stage" in line and "_busy" in line for line in lines)
+    assert "Profile of test_profiling.slow_stage" in caplog.text
@@ -0,0 +1,67 @@
+import time
+import pytest
+import pandas as pd
+from assessment_episode_matcher import pipeline
+from assessment_episode_matcher.exporters.main import BackgroundExporter, ParquetExporter
+from assessment_episode_matcher.source_loader import load_sources
+
+SOURCE_SECONDS = 0.3
+
+
+def test_sources_loaded_concurrently(monkeypatch, tmp_path, matching_inputs):
+    episodes, atoms = matching_inputs
+    uploads = BackgroundExporter(ParquetExporter({'location': f"{tmp_path}/"}))
+
+    def fake_import(name, data):
+        def importer(start, end, file_source, prefix, config, cache_exporter, dataset_cache):
+            assert config == {'version_number': 3}
+            time.sleep(SOURCE_SECONDS)  # download + parse
+            cache_exporter.export_dataframe(f"{prefix}_cache", data)
+            return {name: data}
+        return importer
+
+    def get_config():
+        time.sleep(SOURCE_SECONDS / 3)
+        return {'version_number': 3}
+
+    monkeypatch.setattr(pipeline, 'import_episodes', fake_import('episodes', episodes))
+    monkeypatch.setattr(pipeline, 'import_atoms', fake_import('atoms', atoms))
+    start = time.perf_counter()
+    config, loaded_episodes, loaded_atoms = load_sources(None, None, None, None, get_config
+                                                         , cache_exporter=uploads)
+    seconds = time.perf_counter() - start
+    results = uploads.flush()
+
+    assert config == {'version_number': 3}
+    assert loaded_episodes is episodes and loaded_atoms is atoms
+    assert seconds < 2 * SOURCE_SECONDS
+    assert sorted(results) == ['ATOM_cache', 'MDS_cache']
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "MDS_cache.parquet"), episodes)
+
+
+def test_background_file_written_after_frames(tmp_path):
+    class SlowExporter(ParquetExporter):
+        def export_dataframe(self, data_name, data):
+            time.sleep(0.1)
+            super().export_dataframe(data_name, data)
+
+    uploads = BackgroundExporter(SlowExporter({'location': f"{tmp_path}/"}))
+    uploads.export_dataframe("data", pd.DataFrame({'a': [1, 2]}))
+    uploads.export_bytes("data.manifest.json", b"{}")
+    uploads.flush()
+
+    data, manifest = tmp_path / "data.parquet", tmp_path / "data.manifest.json"
+    assert manifest.stat().st_mtime_ns >= data.stat().st_mtime_ns
+
+
+def test_background_file_not_written_after_failed_frame(tmp_path):
+    class FailingExporter(ParquetExporter):
+        def export_dataframe(self, data_name, data):
+            raise OSError("upload failed")
+
+    uploads = BackgroundExporter(FailingExporter({'location': f"{tmp_path}/"}))
+    uploads.export_dataframe("data", pd.DataFrame({'a': [1, 2]}))
+    uploads.export_bytes("data.manifest.json", b"{}")
+    with pytest.raises(OSError):
+        uploads.flush()
+    assert not (tmp_path / "data.manifest.json").exists()
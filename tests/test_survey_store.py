@@ -0,0 +1,77 @@
+import json
+import pandas as pd
+from assessment_episode_matcher.data_prep import expand_survey_fields
+from assessment_episode_matcher.nada import generate_nada_export
+from assessment_episode_matcher.survey_store import get_local_survey_store
+
+
+def _export(df, config, store=None):
+    nada, warnings = generate_nada_export(df.copy(), config, survey_store=store)
+    return nada.to_csv(index=False), sorted(w.to_list() for w in warnings)
+
+
+def test_store_matches_full_parse(tmp_path, matched_assessments, nada_config):
+    expected = _export(matched_assessments, nada_config)
+
+    first_run = get_local_survey_store(str(tmp_path))
+    assert _export(matched_assessments, nada_config, first_run) == expected
+    assert first_run.num_parsed == len(matched_assessments)
+    first_run.save()
+
+    # a later run: one assessment changed (new Timestamp), the rest come from the store
+    changed = matched_assessments.copy()
+    changed.loc[3, 'Timestamp'] = "2024-06-01 00:00:00.000000+00:00"
+    second_run = get_local_survey_store(str(tmp_path))
+    assert _export(changed, nada_config, second_run) == _export(changed, nada_config)
+    assert (second_run.num_hits, second_run.num_parsed) == (len(changed) - 1, 1)
+
+    second_run.save()
+    stored = pd.read_parquet(tmp_path / "parsed_surveys.parquet")
+    assert len(stored) == len(matched_assessments)
+    assert stored.loc[stored.RowKey == 'rk003', 'Timestamp'].item() == changed.loc[3, 'Timestamp']
+
+
+def test_store_subset_of_stored(tmp_path, matched_assessments, nada_config):
+    store = get_local_survey_store(str(tmp_path))
+    _export(matched_assessments, nada_config, store)
+    store.save()
+
+    subset = matched_assessments.iloc[::4]
+    store = get_local_survey_store(str(tmp_path))
+    assert _export(subset, nada_config, store) == _export(subset, nada_config)
+    assert store.num_parsed == 0
+
+
+def test_store_reparsed_for_another_config(tmp_path, matched_assessments, nada_config):
+    store = get_local_survey_store(str(tmp_path))
+    _export(matched_assessments, nada_config, store)
+    store.save()
+
+    # Caffeine gets a category: its AOD columns/warnings change
+    new_config = {'drug_categories': {**nada_config['drug_categories'], 'Caffeine': ['Caffeine']}}
+    store = get_local_survey_store(str(tmp_path))
+    assert _export(matched_assessments, new_config, store) == _export(matched_assessments, new_config)
+    assert store.num_parsed == len(matched_assessments)
+    store.save()
+
+    store = get_local_survey_store(str(tmp_path))
+    _export(matched_assessments, new_config, store)
+    assert store.num_parsed == 0
+
+
+def test_store_keeps_fields_present_but_null(tmp_path, matched_assessments, nada_config):
+    df = matched_assessments.copy()
+    # rows 0-3 have the field, null; rows 5-8 don't have it
+    for i in range(4):
+        survey = json.loads(df.loc[i, 'SurveyData'])
+        df.loc[i, 'SurveyData'] = json.dumps({**survey, 'Past4WkHaveYouViolenceAbusive': None})
+    store = get_local_survey_store(str(tmp_path))
+    store.expand(df, nada_config)
+    store.save()
+
+    for rows in [df.iloc[:4], df.iloc[5:9], df.iloc[2:7]]:
+        store = get_local_survey_store(str(tmp_path))
+        from_store, _ = store.expand(rows, nada_config)
+        parsed, _ = expand_survey_fields(rows, nada_config)
+        assert store.num_parsed == 0
+        assert sorted(from_store.columns) == sorted(parsed.columns)
@@ -0,0 +1,69 @@
+import importlib.util
+from pathlib import Path
+import pytest
+
+# nada/ is not a package (nada.py is the module of that name): load the script by path
+_spec = importlib.util.spec_from_file_location(
+    "validation_results_reviewer"
+    , Path(__file__).parent.parent / "assessment_episode_matcher" / "nada" / "validation_results_reviewer.py")
+reviewer = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(reviewer)
+
+SURVEY_ROWS = ["AG1,E1,P1,0,01012024", "AG1,E1,P1,1,01022024"
+               , "AG1,E2,P2,0,05012024", "AG1,E3,P3,0,07012024"]
+VALIDATION_LOG = """Validation started
+SURVEY.txt: Invalid Value 99 for Agency AG1 on Row 3, Column 12
+SURVEY.txt: Missing Field 0 for Agency AG1 on Row 1, Column 7
+SURVEY.txt: Invalid Value 98 for Agency AG1 on Row 1, Column 13
+SURVEY.txt: Invalid Value 97 for Agency AG1 on Row 1, Column 14
+SURVEY.txt: Invalid Value 5 for Agency AG1 on Row 2, Column 12
+Validation finished
+"""
+
+
+@pytest.fixture
+def survey_file(tmp_path):
+    path = tmp_path / "surveytxt.csv"
+    path.write_text("\n".join(SURVEY_ROWS) + "\n")
+    return str(path)
+
+
+def _log_file(tmp_path, text):
+    path = tmp_path / "validation_errors.txt"
+    path.write_text(text)
+    return str(path)
+
+
+def test_report_error_counts_in_survey_row_order(tmp_path, survey_file):
+    report = reviewer.generate_report(survey_file, _log_file(tmp_path, VALIDATION_LOG))
+
+    assert report == {
+        "total_rows": 4,
+        "unique_assessments_with_errors": 3,
+        "error_percentage": 75.0,
+        "error_counts": {
+            "Missing Field": (1, "Missing Field E1 for Agency AG1 on Row 1, Column 7"),
+            "Invalid Value": (3, "Invalid Value E1 for Agency AG1 on Row 1, Column 13"),
+        },
+    }
+    assert list(report["error_counts"]) == ["Missing Field", "Invalid Value"]
+
+
+def test_log_parsed_a_line_at_a_time(tmp_path, survey_file):
+    log_file = _log_file(tmp_path, VALIDATION_LOG)
+
+    errors = reviewer.parse_validation_errors(log_file, chunk_lines=1)
+    assert errors['row'].tolist() == [3, 1, 1, 1, 2]
+    assert errors['value'].tolist() == ['99', '0', '98', '97', '5']
+    assert reviewer.generate_report(survey_file, log_file, chunk_lines=1) \
+            == reviewer.generate_report(survey_file, log_file)
+
+
+def test_empty_log(tmp_path, survey_file):
+    log_file = _log_file(tmp_path, "")
+
+    errors = reviewer.parse_validation_errors(log_file)
+    assert errors.empty and list(errors.columns) == ['row', 'error_type', 'value', 'agency', 'column']
+    assert reviewer.generate_report(survey_file, log_file) == {
+        "total_rows": 4, "unique_assessments_with_errors": 0
+        , "error_percentage": 0.0, "error_counts": {}}